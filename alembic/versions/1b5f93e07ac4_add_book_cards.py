@@ -0,0 +1,63 @@
+"""Add book cards
+
+Revision ID: 1b5f93e07ac4
+Revises: e4d82f61c3a9
+Create Date: 2026-10-17 15:08:19.664203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b5f93e07ac4'
+down_revision: Union[str, None] = 'e4d82f61c3a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_cards',
+        sa.Column('id', sa.Integer(), sa.ForeignKey('books.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('publication_date', sa.Date(), nullable=False),
+        sa.Column('available_copies', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('author_names', postgresql.ARRAY(sa.String()), nullable=False, server_default='{}'),
+        sa.Column('genre_names', postgresql.ARRAY(sa.String()), nullable=False, server_default='{}'),
+    )
+    op.create_index('ix_book_cards_title_id', 'book_cards', ['title', 'id'])
+    op.create_index('ix_book_cards_publication_date_id', 'book_cards', ['publication_date', 'id'])
+    op.create_index(
+        'ix_book_cards_available_id', 'book_cards', ['id'],
+        postgresql_where=sa.text('available_copies > 0'),
+    )
+    # Заполнение карточек для существующих книг
+    op.execute(
+        """
+        INSERT INTO book_cards (id, title, description, publication_date, available_copies, version, author_names, genre_names)
+        SELECT
+            books.id, books.title, books.description, books.publication_date,
+            coalesce(books.available_copies, 0), books.version,
+            coalesce((
+                SELECT array_agg(authors.name ORDER BY authors.name)
+                FROM book_author JOIN authors ON authors.id = book_author.author_id
+                WHERE book_author.book_id = books.id
+            ), '{}'),
+            coalesce((
+                SELECT array_agg(genres.name ORDER BY genres.name)
+                FROM book_genre JOIN genres ON genres.id = book_genre.genre_id
+                WHERE book_genre.book_id = books.id
+            ), '{}')
+        FROM books
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('book_cards')
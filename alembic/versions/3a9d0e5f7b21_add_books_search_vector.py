@@ -0,0 +1,42 @@
+"""Add books search vector
+
+Revision ID: 3a9d0e5f7b21
+Revises: 8f2b6c1d4e7a
+Create Date: 2026-10-17 11:14:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d0e5f7b21'
+down_revision: Union[str, None] = '8f2b6c1d4e7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # Заполнение вектора для существующих книг
+    op.execute(
+        """
+        UPDATE books SET search_vector =
+            setweight(to_tsvector('simple'::regconfig, coalesce(books.title, '')), 'A')
+            || setweight(to_tsvector('simple'::regconfig, coalesce((
+                SELECT string_agg(authors.name, ' ')
+                FROM authors JOIN book_author ON book_author.author_id = authors.id
+                WHERE book_author.book_id = books.id
+            ), '')), 'B')
+            || setweight(to_tsvector('simple'::regconfig, coalesce(books.description, '')), 'C')
+        """
+    )
+    op.create_index('ix_books_search_vector', 'books', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_vector')
@@ -0,0 +1,37 @@
+"""Add reader active loan count
+
+Revision ID: 4e7b1c9a0f62
+Revises: 9d6a2f4c8e13
+Create Date: 2026-10-17 17:02:11.482037
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7b1c9a0f62'
+down_revision: Union[str, None] = '9d6a2f4c8e13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('readers', sa.Column('active_loan_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        """
+        UPDATE readers SET active_loan_count = counts.n
+        FROM (
+            SELECT reader_id, count(*) AS n FROM loans
+            WHERE return_date IS NULL
+            GROUP BY reader_id
+        ) AS counts
+        WHERE readers.id = counts.reader_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('readers', 'active_loan_count')
@@ -0,0 +1,106 @@
+"""Partition loans by loan date and add loans archive
+
+Revision ID: 7c3e5a9f1d24
+Revises: b2f0c8d63a17
+Create Date: 2026-10-17 18:36:05.172493
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a9f1d24'
+down_revision: Union[str, None] = 'b2f0c8d63a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOAN_COLUMNS = "id, book_id, reader_id, loan_date, due_date, return_date, fine"
+
+
+def upgrade() -> None:
+    # Старая таблица переименовывается, последовательность id переходит к новой таблице
+    op.drop_index('ix_loans_active_due_date_id', table_name='loans')
+    op.drop_index('ix_loans_id', table_name='loans')
+    op.execute("ALTER TABLE loans RENAME TO loans_unpartitioned")
+    op.execute("ALTER TABLE loans_unpartitioned RENAME CONSTRAINT loans_pkey TO loans_unpartitioned_pkey")
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE loans (
+            id INTEGER NOT NULL DEFAULT nextval('loans_id_seq'),
+            book_id INTEGER REFERENCES books (id),
+            reader_id INTEGER REFERENCES readers (id),
+            loan_date DATE NOT NULL,
+            due_date DATE,
+            return_date DATE,
+            fine NUMERIC(10, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (id, loan_date)
+        ) PARTITION BY RANGE (loan_date)
+        """
+    )
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY loans.id")
+
+    # Годовые секции от самого раннего займа до следующего года и секция по умолчанию
+    first = op.get_bind().execute(sa.text("SELECT min(loan_date) FROM loans_unpartitioned")).scalar()
+    current = date.today().year
+    for year in range((first or date.today()).year, current + 2):
+        op.execute(
+            f"CREATE TABLE loans_y{year} PARTITION OF loans "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+    op.execute("CREATE TABLE loans_default PARTITION OF loans DEFAULT")
+
+    op.execute(f"INSERT INTO loans ({LOAN_COLUMNS}) SELECT {LOAN_COLUMNS} FROM loans_unpartitioned")
+    op.drop_table('loans_unpartitioned')
+    op.create_index('ix_loans_id', 'loans', ['id'])
+    op.create_index(
+        'ix_loans_active_due_date_id', 'loans', ['due_date', 'id'],
+        postgresql_where=sa.text('return_date IS NULL'),
+    )
+
+    op.create_table(
+        'loans_archive',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('book_id', sa.Integer(), nullable=True),
+        sa.Column('reader_id', sa.Integer(), nullable=True),
+        sa.Column('loan_date', sa.Date(), nullable=False),
+        sa.Column('due_date', sa.Date(), nullable=True),
+        sa.Column('return_date', sa.Date(), nullable=True),
+        sa.Column('fine', sa.Numeric(10, 2), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_loans_archive_reader_id', 'loans_archive', ['reader_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_loans_active_due_date_id', table_name='loans')
+    op.drop_index('ix_loans_id', table_name='loans')
+    op.execute("ALTER TABLE loans RENAME TO loans_partitioned")
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE loans (
+            id INTEGER NOT NULL DEFAULT nextval('loans_id_seq') PRIMARY KEY,
+            book_id INTEGER REFERENCES books (id),
+            reader_id INTEGER REFERENCES readers (id),
+            loan_date DATE NOT NULL,
+            due_date DATE,
+            return_date DATE,
+            fine NUMERIC(10, 2) NOT NULL DEFAULT 0
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE loans_id_seq OWNED BY loans.id")
+    op.execute(f"INSERT INTO loans ({LOAN_COLUMNS}) SELECT {LOAN_COLUMNS} FROM loans_partitioned")
+    op.execute(f"INSERT INTO loans ({LOAN_COLUMNS}) SELECT {LOAN_COLUMNS} FROM loans_archive")
+    op.execute("DROP TABLE loans_partitioned CASCADE")
+    op.drop_table('loans_archive')
+    op.create_index('ix_loans_id', 'loans', ['id'])
+    op.create_index(
+        'ix_loans_active_due_date_id', 'loans', ['due_date', 'id'],
+        postgresql_where=sa.text('return_date IS NULL'),
+    )
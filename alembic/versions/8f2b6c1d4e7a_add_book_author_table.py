@@ -0,0 +1,30 @@
+"""Add book_author table
+
+Revision ID: 8f2b6c1d4e7a
+Revises: 5c3843af2d16
+Create Date: 2026-10-17 10:02:11.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2b6c1d4e7a'
+down_revision: Union[str, None] = '5c3843af2d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_author',
+        sa.Column('book_id', sa.Integer(), sa.ForeignKey('books.id'), primary_key=True),
+        sa.Column('author_id', sa.Integer(), sa.ForeignKey('authors.id'), primary_key=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('book_author')
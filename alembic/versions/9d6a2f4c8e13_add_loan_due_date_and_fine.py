@@ -0,0 +1,50 @@
+"""Add loan due date and fine
+
+Revision ID: 9d6a2f4c8e13
+Revises: 1b5f93e07ac4
+Create Date: 2026-10-17 16:21:47.305918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d6a2f4c8e13'
+down_revision: Union[str, None] = '1b5f93e07ac4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('loans', sa.Column('due_date', sa.Date(), nullable=True))
+    op.add_column('loans', sa.Column('fine', sa.Numeric(10, 2), nullable=False, server_default='0'))
+    op.execute("UPDATE loans SET due_date = loan_date + 14")
+    # Раньше при выдаче в return_date записывался срок возврата. Дата в будущем не может быть
+    # датой фактического возврата: такие займы открыты, записанный срок переносится в due_date.
+    # Прошедшие даты не трогаются - они неотличимы от настоящих возвратов. Идентификаторы
+    # измененных займов сохраняются, чтобы откат восстановил только их.
+    op.create_table('loans_cleared_return_dates', sa.Column('loan_id', sa.Integer(), primary_key=True))
+    op.execute(
+        "INSERT INTO loans_cleared_return_dates (loan_id) "
+        "SELECT id FROM loans WHERE return_date > CURRENT_DATE"
+    )
+    op.execute("UPDATE loans SET due_date = return_date, return_date = NULL WHERE return_date > CURRENT_DATE")
+    op.create_index(
+        'ix_loans_active_due_date_id', 'loans', ['due_date', 'id'],
+        postgresql_where=sa.text('return_date IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_loans_active_due_date_id', table_name='loans')
+    # Срок возвращается в return_date только займам, открытым этой миграцией и еще не возвращенным
+    op.execute(
+        "UPDATE loans SET return_date = due_date "
+        "WHERE return_date IS NULL AND id IN (SELECT loan_id FROM loans_cleared_return_dates)"
+    )
+    op.drop_table('loans_cleared_return_dates')
+    op.drop_column('loans', 'fine')
+    op.drop_column('loans', 'due_date')
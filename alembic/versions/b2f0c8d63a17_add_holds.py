@@ -0,0 +1,44 @@
+"""Add holds
+
+Revision ID: b2f0c8d63a17
+Revises: 4e7b1c9a0f62
+Create Date: 2026-10-17 17:48:30.917254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2f0c8d63a17'
+down_revision: Union[str, None] = '4e7b1c9a0f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'holds',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('book_id', sa.Integer(), sa.ForeignKey('books.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('reader_id', sa.Integer(), sa.ForeignKey('readers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='waiting'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('ready_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_holds_id', 'holds', ['id'])
+    op.create_index(
+        'ix_holds_waiting_book_id_id', 'holds', ['book_id', 'id'],
+        postgresql_where=sa.text("status = 'waiting'"),
+    )
+    op.create_index(
+        'ix_holds_active_book_id_reader_id', 'holds', ['book_id', 'reader_id'], unique=True,
+        postgresql_where=sa.text("status IN ('waiting', 'ready')"),
+    )
+    op.create_index('ix_holds_reader_id_status', 'holds', ['reader_id', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_table('holds')
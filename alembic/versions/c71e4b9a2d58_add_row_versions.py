@@ -0,0 +1,30 @@
+"""Add row versions
+
+Revision ID: c71e4b9a2d58
+Revises: 3a9d0e5f7b21
+Create Date: 2026-10-17 12:40:05.337810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71e4b9a2d58'
+down_revision: Union[str, None] = '3a9d0e5f7b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('books', 'authors', 'genres', 'readers')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'version')
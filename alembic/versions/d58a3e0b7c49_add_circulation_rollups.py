@@ -0,0 +1,47 @@
+"""Add circulation rollups
+
+Revision ID: d58a3e0b7c49
+Revises: 7c3e5a9f1d24
+Create Date: 2026-10-17 19:14:52.640371
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd58a3e0b7c49'
+down_revision: Union[str, None] = '7c3e5a9f1d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_loan_daily',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('book_id', sa.Integer(), primary_key=True),
+        sa.Column('loans', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('returns', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_book_loan_daily_book_id_day', 'book_loan_daily', ['book_id', 'day'])
+    op.create_table(
+        'genre_loan_daily',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('genre_id', sa.Integer(), primary_key=True),
+        sa.Column('loans', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'reader_week_activity',
+        sa.Column('week', sa.Date(), primary_key=True),
+        sa.Column('reader_id', sa.Integer(), primary_key=True),
+    )
+    # Агрегаты по существующей истории заполняются командой python -m app.analytics
+
+
+def downgrade() -> None:
+    op.drop_table('reader_week_activity')
+    op.drop_table('genre_loan_daily')
+    op.drop_table('book_loan_daily')
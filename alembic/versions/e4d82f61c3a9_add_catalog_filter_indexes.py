@@ -0,0 +1,35 @@
+"""Add catalog filter indexes
+
+Revision ID: e4d82f61c3a9
+Revises: c71e4b9a2d58
+Create Date: 2026-10-17 13:52:48.120476
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4d82f61c3a9'
+down_revision: Union[str, None] = 'c71e4b9a2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_book_genre_genre_id_book_id', 'book_genre', ['genre_id', 'book_id'])
+    op.create_index('ix_book_author_author_id_book_id', 'book_author', ['author_id', 'book_id'])
+    op.create_index('ix_books_publication_date_id', 'books', ['publication_date', 'id'])
+    op.create_index(
+        'ix_books_available_id', 'books', ['id'],
+        postgresql_where=sa.text('available_copies > 0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_available_id', table_name='books')
+    op.drop_index('ix_books_publication_date_id', table_name='books')
+    op.drop_index('ix_book_author_author_id_book_id', table_name='book_author')
+    op.drop_index('ix_book_genre_genre_id_book_id', table_name='book_genre')
@@ -0,0 +1,34 @@
+"""Add hold expiry
+
+Revision ID: f3a6c0d9b215
+Revises: d58a3e0b7c49
+Create Date: 2026-10-17 21:05:13.482917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a6c0d9b215'
+down_revision: Union[str, None] = 'd58a3e0b7c49'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('holds', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    # Уже отложенные экземпляры ждут читателя столько же, сколько новые (HOLD_PICKUP_PERIOD)
+    op.execute("UPDATE holds SET expires_at = ready_at + INTERVAL '3 days' WHERE status = 'ready'")
+    op.create_index(
+        'ix_holds_ready_expires_at', 'holds', ['expires_at'],
+        postgresql_where=sa.text("status = 'ready'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_holds_ready_expires_at', table_name='holds')
+    op.execute("UPDATE holds SET status = 'cancelled' WHERE status = 'expired'")
+    op.drop_column('holds', 'expires_at')
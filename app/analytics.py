@@ -0,0 +1,171 @@
+import asyncio
+from collections import Counter
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import Date, cast, delete, func, literal, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import BookLoanDaily, GenreLoanDaily, Loan, LoanArchive, ReaderWeekActivity, book_genre
+from app.search import is_postgres
+
+# Размер диапазона дат, пересчитываемого одной задачей при восстановлении агрегатов
+# (кратен неделе, чтобы недельные агрегаты не делились между задачами)
+BACKFILL_CHUNK_DAYS = 28
+BACKFILL_WORKERS = 4
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+# INSERT с поддержкой ON CONFLICT для текущей СУБД (PostgreSQL или SQLite)
+def _insert(db: AsyncSession, model):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Loan rollups are not supported for the {dialect} dialect")
+
+
+async def _add_book_counts(db: AsyncSession, day: date, books: Counter, column: str):
+    for book_id, count in sorted(books.items()):
+        statement = _insert(db, BookLoanDaily).values(day=day, book_id=book_id, **{column: count})
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[BookLoanDaily.day, BookLoanDaily.book_id],
+            set_={column: getattr(BookLoanDaily, column) + getattr(statement.excluded, column)},
+        ))
+
+
+# Учет выдач в агрегатах в той же транзакции, что и выдача.
+# Строки агрегатов обновляются в порядке возрастания ключей, чтобы избежать взаимных блокировок.
+async def record_checkouts(db: AsyncSession, day: date, reader_id: int, books: Counter):
+    if not books:
+        return
+    await _add_book_counts(db, day, books, "loans")
+    for book_id, count in sorted(books.items()):
+        statement = _insert(db, GenreLoanDaily).from_select(
+            ["day", "genre_id", "loans"],
+            select(literal(day, Date), book_genre.c.genre_id, literal(count))
+            .where(book_genre.c.book_id == book_id)
+            .order_by(book_genre.c.genre_id),
+        )
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[GenreLoanDaily.day, GenreLoanDaily.genre_id],
+            set_={"loans": GenreLoanDaily.loans + statement.excluded.loans},
+        ))
+    await db.execute(
+        _insert(db, ReaderWeekActivity)
+        .values(week=week_start(day), reader_id=reader_id)
+        .on_conflict_do_nothing()
+    )
+
+
+# Учет возвратов в агрегатах
+async def record_returns(db: AsyncSession, day: date, books: Counter):
+    if books:
+        await _add_book_counts(db, day, books, "returns")
+
+
+# Начало недели для столбца даты в SQL
+def _week_expression(db: AsyncSession, column):
+    if is_postgres(db):
+        return cast(func.date_trunc("week", column), Date)
+    return func.date(column, "weekday 0", "-6 days")
+
+
+# Все займы, включая архивные
+def _all_loans():
+    columns = ["book_id", "reader_id", "loan_date", "return_date"]
+    return union_all(
+        select(*[getattr(Loan, column) for column in columns]),
+        select(*[getattr(LoanArchive, column) for column in columns]),
+    ).subquery("all_loans")
+
+
+# Пересчет агрегатов за диапазон дат [start, end) в отдельной транзакции
+async def _rebuild_range(session_factory, start: date, end: date):
+    loans = _all_loans()
+    async with session_factory() as db:
+        for model, column in ((BookLoanDaily, BookLoanDaily.day), (GenreLoanDaily, GenreLoanDaily.day), (ReaderWeekActivity, ReaderWeekActivity.week)):
+            await db.execute(delete(model).where(column >= start, column < end))
+
+        events = union_all(
+            select(loans.c.loan_date.label("day"), loans.c.book_id, literal(1).label("loans"), literal(0).label("returns"))
+            .where(loans.c.loan_date >= start, loans.c.loan_date < end),
+            select(loans.c.return_date.label("day"), loans.c.book_id, literal(0).label("loans"), literal(1).label("returns"))
+            .where(loans.c.return_date >= start, loans.c.return_date < end),
+        ).subquery("events")
+        await db.execute(_insert(db, BookLoanDaily).from_select(
+            ["day", "book_id", "loans", "returns"],
+            select(events.c.day, events.c.book_id, func.sum(events.c.loans), func.sum(events.c.returns))
+            .where(events.c.book_id.is_not(None))
+            .group_by(events.c.day, events.c.book_id),
+        ))
+        await db.execute(_insert(db, GenreLoanDaily).from_select(
+            ["day", "genre_id", "loans"],
+            select(loans.c.loan_date, book_genre.c.genre_id, func.count())
+            .join(book_genre, book_genre.c.book_id == loans.c.book_id)
+            .where(loans.c.loan_date >= start, loans.c.loan_date < end)
+            .group_by(loans.c.loan_date, book_genre.c.genre_id),
+        ))
+        week = _week_expression(db, loans.c.loan_date)
+        await db.execute(_insert(db, ReaderWeekActivity).from_select(
+            ["week", "reader_id"],
+            select(week, loans.c.reader_id)
+            .where(loans.c.loan_date >= start, loans.c.loan_date < end, loans.c.reader_id.is_not(None))
+            .group_by(week, loans.c.reader_id),
+        ))
+        await db.commit()
+
+
+def backfill_ranges(first: date, last: date, chunk_days: int = BACKFILL_CHUNK_DAYS) -> List[Tuple[date, date]]:
+    if chunk_days <= 0 or chunk_days % 7:
+        raise ValueError("chunk_days must be a positive multiple of 7")
+    start = week_start(first)
+    ranges = []
+    while start <= last:
+        ranges.append((start, start + timedelta(days=chunk_days)))
+        start += timedelta(days=chunk_days)
+    return ranges
+
+
+# Полное восстановление агрегатов по истории займов (включая архив).
+# Диапазоны дат пересчитываются параллельно в отдельных соединениях.
+# Выдачи, выполненные во время пересчета диапазона, могут быть не учтены:
+# запускать вне часов нагрузки.
+async def backfill(session_factory, workers: int = BACKFILL_WORKERS, chunk_days: int = BACKFILL_CHUNK_DAYS) -> dict:
+    loans = _all_loans()
+    async with session_factory() as db:
+        first, last = (await db.execute(
+            select(func.min(loans.c.loan_date), func.max(func.coalesce(loans.c.return_date, loans.c.loan_date)))
+        )).one()
+    if first is None:
+        return {"ranges": 0}
+    if isinstance(first, str):
+        first, last = date.fromisoformat(first), date.fromisoformat(last)
+
+    ranges = backfill_ranges(first, last, chunk_days)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(start: date, end: date):
+        async with semaphore:
+            await _rebuild_range(session_factory, start, end)
+
+    await asyncio.gather(*(run(start, end) for start, end in ranges))
+    return {"ranges": len(ranges), "from": ranges[0][0].isoformat(), "to": ranges[-1][1].isoformat()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database import SessionLocal, run_script
+
+    parser = argparse.ArgumentParser(description="Восстановление агрегатов выдач по истории займов")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--chunk-days", type=int, default=BACKFILL_CHUNK_DAYS)
+    args = parser.parse_args()
+    print(run_script(backfill(SessionLocal, args.workers, args.chunk_days)))
@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import job_lock
+from app.models import Loan, LoanArchive
+from app.search import is_postgres
+
+# Возвращенные займы старше этого срока переносятся в архив
+ARCHIVE_AFTER = timedelta(days=365)
+# Количество займов, переносимых за одну транзакцию
+BATCH_SIZE = 10_000
+# Интервал между фоновыми запусками архивации
+RUN_INTERVAL_SECONDS = 24 * 60 * 60
+# На сколько лет вперед заранее создаются годовые секции займов
+PARTITIONS_AHEAD = 1
+# Ключ advisory-блокировки архивации (одна архивация на все процессы)
+LOCK_KEY = 7_240_002
+
+ARCHIVE_COLUMNS = ["id", "book_id", "reader_id", "loan_date", "due_date", "return_date", "fine"]
+
+
+def partition_name(year: int) -> str:
+    return f"loans_y{year}"
+
+
+# Таблица займов секционирована миграцией 7c3e5a9f1d24 (только PostgreSQL);
+# таблица, созданная по моделям (Base.metadata.create_all), не секционирована
+async def loans_partitioned(db: AsyncSession) -> bool:
+    if not is_postgres(db):
+        return False
+    return await db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'loans'::regclass)"
+    ))
+
+
+# Создание годовых секций займов до года today + PARTITIONS_AHEAD,
+# чтобы новые займы не попадали в секцию по умолчанию
+async def ensure_partitions(db: AsyncSession, today: Optional[date] = None):
+    if not await loans_partitioned(db):
+        return
+    today = today or date.today()
+    for year in range(today.year, today.year + PARTITIONS_AHEAD + 1):
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(year)} PARTITION OF loans "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+    await db.commit()
+
+
+# Перенос одной пачки: в PostgreSQL - один оператор DELETE ... RETURNING внутри INSERT
+async def _archive_batch(db: AsyncSession, cutoff: date, batch_size: int) -> int:
+    batch = (
+        select(Loan.id, Loan.loan_date)
+        # Условие по loan_date позволяет не читать секции с более новыми займами
+        .where(Loan.loan_date < cutoff, Loan.return_date < cutoff)
+        .order_by(Loan.id)
+        .limit(batch_size)
+    )
+    columns = [getattr(Loan, column) for column in ARCHIVE_COLUMNS]
+    if is_postgres(db):
+        moved = (
+            delete(Loan)
+            .where(tuple_(Loan.id, Loan.loan_date).in_(batch))
+            .returning(*columns)
+            .cte("moved")
+        )
+        result = await db.execute(insert(LoanArchive).from_select(ARCHIVE_COLUMNS, select(moved)))
+        return result.rowcount
+
+    ids = list(await db.scalars(batch.with_only_columns(Loan.id)))
+    if ids:
+        await db.execute(insert(LoanArchive).from_select(ARCHIVE_COLUMNS, select(*columns).where(Loan.id.in_(ids))))
+        await db.execute(delete(Loan).where(Loan.id.in_(ids)).execution_options(synchronize_session=False))
+    return len(ids)
+
+
+# Перенос возвращенных займов, у которых дата возврата раньше cutoff, в архив пачками.
+# Если архивация уже идет в другом процессе, запуск пропускается.
+async def archive_loans(session_factory, cutoff: Optional[date] = None, batch_size: int = BATCH_SIZE) -> dict:
+    cutoff = cutoff or date.today() - ARCHIVE_AFTER
+    archived = 0
+    async with job_lock(session_factory, LOCK_KEY) as locked:
+        if not locked:
+            return {"cutoff": cutoff.isoformat(), "archived": 0, "skipped": "already running"}
+        async with session_factory() as db:
+            await ensure_partitions(db)
+            while True:
+                moved = await _archive_batch(db, cutoff, batch_size)
+                await db.commit()
+                archived += moved
+                if moved < batch_size:
+                    break
+    return {"cutoff": cutoff.isoformat(), "archived": archived}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.database import SessionLocal, run_script
+
+    parser = argparse.ArgumentParser(description="Перенос старых возвращенных займов в архив")
+    parser.add_argument("--cutoff", type=date.fromisoformat, help="архивировать займы, возвращенные до этой даты")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    print(run_script(archive_loans(SessionLocal, args.cutoff, args.batch_size)))
@@ -1,12 +1,17 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 
-from select import select
+from sqlalchemy.future import select
 
 from app.models import Reader
-from app.database import SessionLocal
+from app.database import get_db
+from app.config import settings
+from app.principals import PrincipalCache, watch_readers
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -20,7 +25,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Контекст для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 # Pydantic модели для аутентификации
 class Token(BaseModel):
@@ -45,16 +50,101 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Хеширование и проверка паролей в отдельном пуле потоков: bcrypt занимает сотни
+# миллисекунд и не должен блокировать цикл событий. Число операций в очереди
+# ограничено; при переполнении запрос отклоняется с 503.
+class PasswordHasher:
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    async def _run(self, function, *args):
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy, please retry", headers={"Retry-After": "1"})
+
+        def call():
+            started = time.perf_counter()
+            return function(*args), started, time.perf_counter()
+
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        submitted = time.perf_counter()
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self.wait_seconds += started - submitted
+        self.run_seconds += finished - started
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": settings.BCRYPT_ROUNDS,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.wait_seconds / self.completed * 1000 if self.completed else 0.0,
+            "avg_hash_ms": self.run_seconds / self.completed * 1000 if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hasher = PasswordHasher(pwd_context, settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
 # Функция для создания JWT токенов
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    to_encode.update({"exp": now + expires_delta, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Получение текущего пользователя по токену
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(SessionLocal)):
+# Кэш аутентифицированных пользователей; сбрасывается при изменении читателя
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+watch_readers(principal_cache)
+
+# Получение текущего пользователя по токену.
+# При попадании в кэш запросов к базе данных нет; при промахе используется сессия запроса
+# (соединение берется из пула только при первом запросе).
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -62,17 +152,38 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        id: int = payload.get("sub")
-        if id is None:
-            raise credentials_exception
-        token_data = TokenData(id=id, email=payload.get("email"))
     except JWTError:
         raise credentials_exception
-    user = await db.get(Reader, token_data.id)
-    if user is None:
+    sub, iat = payload.get("sub"), payload.get("iat")
+    if sub is None:
+        raise credentials_exception
+    sub = str(sub)
+    if principal_cache.is_revoked(sub, iat):
         raise credentials_exception
+
+    user = principal_cache.get(sub, iat)
+    if user is None:
+        try:
+            reader_id = int(sub)
+        except ValueError:
+            raise credentials_exception
+        reader = await db.get(Reader, reader_id)
+        if reader is None:
+            raise credentials_exception
+        user = User.model_validate(reader, from_attributes=True)
+        principal_cache.put(sub, iat, user, payload.get("exp"))
     return user
 
+# Отзыв токена (например, при выходе); действует до истечения срока токена
+def revoke_token(token: str):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    principal_cache.revoke_token(payload["sub"], payload.get("iat"), payload["exp"])
+
+# Отзыв всех выпущенных токенов читателя (смена пароля, блокировка)
+def revoke_reader_tokens(reader_id: int):
+    principal_cache.revoke_all(reader_id)
+
 # Функция для получения пользователя по email
-async def get_user_by_email(email: str, db: AsyncSession = Depends(SessionLocal)):
-    return await db.execute(select(Reader).filter(Reader.email == email)).scalars().first()
+async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(Reader).filter(Reader.email == email))
+    return result.scalars().first()
@@ -0,0 +1,278 @@
+import heapq
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Author, Book
+
+BOOK = 0
+AUTHOR = 1
+KINDS = {BOOK: "book", AUTHOR: "author"}
+
+# Максимальная длина ключа и количество слов, с которых начинается поиск внутри строки
+MAX_KEY_LENGTH = 64
+MAX_WORD_STARTS = 3
+# Ограничение на количество ключей в индексе (память остается ограниченной)
+MAX_KEYS = 4_000_000
+# Максимальное количество просматриваемых ключей на один запрос
+MAX_SCAN = 1000
+# Размер буфера одиночных изменений, после которого он вливается в основной массив
+MAX_PENDING = 4096
+
+NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+# Нормализация: без диакритики, без регистра, слова разделены одним пробелом
+def normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_WORD_RE.sub(" ", stripped.casefold()).strip()
+
+
+# Ключи строки: сама строка и ее окончания, начинающиеся с первых слов
+def keys_for(text: str) -> List[str]:
+    normalized = normalize(text)
+    if not normalized:
+        return []
+    words = normalized.split(" ")
+    keys = []
+    for i in range(min(len(words), MAX_WORD_STARTS)):
+        key = " ".join(words[i:])[:MAX_KEY_LENGTH]
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+# Позиция пары (ключ, ссылка) в отсортированном по ключам массиве или None
+def _find(keys: List[str], refs: array, key: str, ref: int) -> Optional[int]:
+    position = bisect_left(keys, key)
+    while position < len(keys) and keys[position] == key:
+        if refs[position] == ref:
+            return position
+        position += 1
+    return None
+
+
+# Пары массива, ключи которых начинаются с префикса (не больше MAX_SCAN)
+def _scan(keys: List[str], refs: array, prefix: str):
+    position = bisect_left(keys, prefix)
+    end = min(len(keys), position + MAX_SCAN)
+    while position < end and keys[position].startswith(prefix):
+        yield keys[position], refs[position]
+        position += 1
+
+
+# Префиксный индекс на отсортированном массиве ключей.
+# Ключи хранятся в одном отсортированном списке, ссылки на сущности - в параллельном
+# компактном массиве (id << 1 | тип), отображаемые строки - по одной копии на сущность.
+# Одиночные изменения не сдвигают большой массив: новые ключи попадают в маленький
+# отсортированный буфер, удаленные помечаются, и раз в MAX_PENDING изменений буфер
+# и пометки вливаются в массив одним проходом.
+class PrefixIndex:
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max_keys
+        self._keys: List[str] = []
+        self._refs = array("q")
+        self._pending_keys: List[str] = []
+        self._pending_refs = array("q")
+        self._removed: Set[Tuple[str, int]] = set()
+        self._texts: Dict[int, str] = {}
+        self._key_chars = 0
+        self.truncated = False
+        self.built_at: Optional[float] = None
+        self.updated_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self._texts)
+
+    # Количество действующих ключей с учетом буфера и удаленных
+    def _size(self) -> int:
+        return len(self._keys) + len(self._pending_keys) - len(self._removed)
+
+    # Построение индекса из полного набора строк одной сортировкой
+    def build(self, entries: Iterable[Tuple[int, int, str]]):
+        pairs = []
+        texts = {}
+        truncated = False
+        for kind, entity_id, text in entries:
+            keys = keys_for(text)
+            if len(pairs) + len(keys) > self.max_keys:
+                truncated = True
+                continue
+            ref = entity_id << 1 | kind
+            texts[ref] = text
+            pairs.extend((key, ref) for key in keys)
+        pairs.sort()
+        self._keys = [key for key, _ in pairs]
+        self._refs = array("q", (ref for _, ref in pairs))
+        self._pending_keys = []
+        self._pending_refs = array("q")
+        self._removed = set()
+        self._texts = texts
+        self._key_chars = sum(len(key) for key in self._keys)
+        self.truncated = truncated
+        self.built_at = self.updated_at = time.time()
+
+    # Слияние отсортированных новых пар и удаление помеченных пар основного массива
+    # за один проход: между точками изменений массив копируется срезами
+    def _merge(self, pairs: List[Tuple[str, int]], removed: Iterable[Tuple[str, int]]):
+        events = [(bisect_left(self._keys, key), 0, key, ref) for key, ref in pairs]
+        events.extend((_find(self._keys, self._refs, key, ref), 1, key, ref) for key, ref in removed)
+        events.sort(key=itemgetter(0, 1))
+        keys: List[str] = []
+        refs = array("q")
+        last = 0
+        for position, is_removed, key, ref in events:
+            keys.extend(self._keys[last:position])
+            refs.extend(self._refs[last:position])
+            if is_removed:
+                last = position + 1
+            else:
+                keys.append(key)
+                refs.append(ref)
+                last = position
+        keys.extend(self._keys[last:])
+        refs.extend(self._refs[last:])
+        self._keys = keys
+        self._refs = refs
+
+    # Перенос буфера и пометок об удалении в основной массив
+    def _compact(self):
+        if self._pending_keys or self._removed:
+            self._merge(list(zip(self._pending_keys, self._pending_refs)), self._removed)
+            self._pending_keys = []
+            self._pending_refs = array("q")
+            self._removed = set()
+
+    # Добавление одной строки: O(MAX_PENDING + log n) на ключ, слияние с массивом - раз в MAX_PENDING изменений
+    def add(self, kind: int, entity_id: int, text: str):
+        self.remove(kind, entity_id)
+        keys = keys_for(text)
+        if self._size() + len(keys) > self.max_keys:
+            self.truncated = True
+            return
+        ref = entity_id << 1 | kind
+        self._texts[ref] = text
+        for key in keys:
+            self._key_chars += len(key)
+            # Ключ, удаленный из основного массива, просто восстанавливается
+            if (key, ref) in self._removed:
+                self._removed.discard((key, ref))
+                continue
+            position = bisect_left(self._pending_keys, key)
+            self._pending_keys.insert(position, key)
+            self._pending_refs.insert(position, ref)
+        if len(self._pending_keys) + len(self._removed) >= MAX_PENDING:
+            self._compact()
+        self.updated_at = time.time()
+
+    # Добавление пачки строк одного типа (массовый импорт): новые ключи сортируются один раз
+    # и сливаются с индексом за линейный проход вместо вставки каждого ключа в середину списка
+    def add_many(self, kind: int, entries: Iterable[Tuple[int, str]]):
+        entries = list(entries)
+        self.remove_many(kind, [entity_id for entity_id, _ in entries])
+        pairs = []
+        for entity_id, text in entries:
+            keys = keys_for(text)
+            if self._size() + len(pairs) + len(keys) > self.max_keys:
+                self.truncated = True
+                continue
+            ref = entity_id << 1 | kind
+            self._texts[ref] = text
+            pairs.extend((key, ref) for key in keys)
+        if not pairs:
+            return
+        self._compact()
+        pairs.sort()
+        self._merge(pairs, ())
+        self._key_chars += sum(len(key) for key, _ in pairs)
+        self.updated_at = time.time()
+
+    def remove(self, kind: int, entity_id: int):
+        ref = entity_id << 1 | kind
+        text = self._texts.pop(ref, None)
+        if text is None:
+            return
+        for key in keys_for(text):
+            self._key_chars -= len(key)
+            position = _find(self._pending_keys, self._pending_refs, key, ref)
+            if position is not None:
+                del self._pending_keys[position]
+                del self._pending_refs[position]
+            else:
+                self._removed.add((key, ref))
+        if len(self._pending_keys) + len(self._removed) >= MAX_PENDING:
+            self._compact()
+        self.updated_at = time.time()
+
+    # Удаление пачки сущностей одного типа одним проходом по индексу
+    def remove_many(self, kind: int, entity_ids: Iterable[int]):
+        refs = {entity_id << 1 | kind for entity_id in entity_ids}
+        refs = {ref for ref in refs if self._texts.pop(ref, None) is not None}
+        if not refs:
+            return
+        self._compact()
+        kept = [(key, ref) for key, ref in zip(self._keys, self._refs) if ref not in refs]
+        self._keys = [key for key, _ in kept]
+        self._refs = array("q", (ref for _, ref in kept))
+        self._key_chars = sum(len(key) for key in self._keys)
+        self.updated_at = time.time()
+
+    # Подсказки по префиксу строки или любого из первых слов, в порядке ключей
+    def complete(self, prefix: str, limit: int = 10) -> List[dict]:
+        normalized = normalize(prefix)
+        if not normalized:
+            return []
+        results = []
+        seen = set()
+        matches = heapq.merge(
+            _scan(self._keys, self._refs, normalized),
+            _scan(self._pending_keys, self._pending_refs, normalized),
+            key=itemgetter(0),
+        )
+        for key, ref in islice(matches, MAX_SCAN):
+            if len(results) >= limit:
+                break
+            if ref in seen or (key, ref) in self._removed:
+                continue
+            seen.add(ref)
+            results.append({"type": KINDS[ref & 1], "id": ref >> 1, "text": self._texts[ref]})
+        return results
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "entities": len(self._texts),
+            "keys": self._size(),
+            "pending_changes": len(self._pending_keys) + len(self._removed),
+            "key_chars": self._key_chars,
+            "ref_bytes": self._refs.itemsize * (len(self._refs) + len(self._pending_refs)),
+            "truncated": self.truncated,
+            "built_at": self.built_at,
+            "age_seconds": now - self.built_at if self.built_at else None,
+            "last_update_seconds_ago": now - self.updated_at if self.updated_at else None,
+        }
+
+
+# Глобальный индекс подсказок
+autocomplete_index = PrefixIndex()
+
+
+# Построение индекса при старте одним потоковым проходом по книгам и авторам
+async def build_autocomplete_index(db: AsyncSession):
+    entries = []
+    books = await db.stream(select(Book.id, Book.title).execution_options(yield_per=5000))
+    async for book_id, title in books:
+        entries.append((BOOK, book_id, title))
+    authors = await db.stream(select(Author.id, Author.name).execution_options(yield_per=5000))
+    async for author_id, name in authors:
+        entries.append((AUTHOR, author_id, name))
+    autocomplete_index.build(entries)
@@ -0,0 +1,233 @@
+import csv
+import json
+from datetime import date
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, ValidationError, field_validator
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Author, Book, Genre, book_author, book_genre
+from app.search import index_books, is_postgres
+from app.cards import refresh_cards
+from app.autocomplete import BOOK, autocomplete_index
+
+# Количество строк, записываемых за одну транзакцию
+BATCH_SIZE = 2000
+
+# Максимальное количество ошибок, возвращаемых в отчете
+MAX_REPORTED_ERRORS = 1000
+
+# Порядок колонок CSV
+CSV_COLUMNS = ["title", "description", "publication_date", "available_copies", "author_ids", "genre_ids"]
+
+
+# Строка импорта книги
+class BookImportRow(BaseModel):
+    title: str
+    description: Optional[str] = None
+    publication_date: date
+    available_copies: int = 0
+    author_ids: List[int] = []
+    genre_ids: List[int] = []
+
+    # В CSV списки идентификаторов передаются через ";"
+    @field_validator("author_ids", "genre_ids", mode="before")
+    @classmethod
+    def split_ids(cls, value):
+        if isinstance(value, str):
+            return [item for item in value.replace(",", ";").split(";") if item.strip()]
+        return value
+
+
+# Разбиение потока байтов на строки без буферизации всего тела запроса
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+
+# Сборка записей из строк: (номер первой строки, текст записи, ошибка кодировки).
+# Строки декодируются по отдельности (байт \n не встречается внутри многобайтовых символов
+# UTF-8), поэтому неверная кодировка - ошибка одной записи, а не всего запроса.
+# Запись CSV занимает несколько строк, если поле в кавычках содержит перевод строки:
+# она завершена, когда число кавычек четное (экранированная кавычка "" его не меняет).
+async def iter_records(lines: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, str, Optional[str]]]:
+    parts: List[str] = []
+    first = quotes = 0
+    error = None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        try:
+            decoded = line.decode("utf-8")
+        except UnicodeDecodeError as e:
+            decoded = line.decode("utf-8", errors="replace")
+            error = error or f"Invalid UTF-8 at byte {e.start}"
+        if not parts:
+            first = line_no
+        parts.append(decoded)
+        if fmt == "csv":
+            quotes += decoded.count('"')
+            if quotes % 2:
+                continue
+        yield first, "\n".join(parts), error
+        parts, quotes, error = [], 0, None
+    if parts:
+        yield first, "\n".join(parts), error
+
+
+def _parse_csv(record: str) -> List[str]:
+    try:
+        return next(csv.reader([record], strict=True), [])
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV: {e}")
+
+
+# Разбор записи NDJSON или CSV в словарь
+def parse_line(line: str, fmt: str, header: Optional[List[str]]) -> dict:
+    if fmt == "csv":
+        values = _parse_csv(line)
+        return {key: value for key, value in zip(header, values) if value != "" or key == "title"}
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("Row must be a JSON object")
+    return data
+
+
+# Импорт книг из потока строк (байтов); возвращает отчет с ошибками по строкам.
+# Ошибки разбора, кодировки и проверки не прерывают импорт остальных строк.
+async def import_books(db: AsyncSession, lines: AsyncIterator[bytes], fmt: str = "ndjson") -> dict:
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    known_authors: Set[int] = set()
+    known_genres: Set[int] = set()
+    header = None
+    batch: List[Tuple[int, BookImportRow]] = []
+
+    async for line_no, record, error in iter_records(lines, fmt):
+        if not record.strip():
+            continue
+        if error:
+            _report_error(report, line_no, error)
+            if fmt == "csv" and header is None:
+                header = CSV_COLUMNS
+            continue
+        try:
+            if fmt == "csv" and header is None:
+                header = [column.strip() for column in _parse_csv(record)]
+                continue
+            batch.append((line_no, BookImportRow.model_validate(parse_line(record, fmt, header))))
+        except ValidationError as e:
+            _report_error(report, line_no, "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()))
+            continue
+        except ValueError as e:
+            _report_error(report, line_no, str(e))
+            continue
+        if len(batch) >= BATCH_SIZE:
+            await _write_batch(db, batch, known_authors, known_genres, report)
+            batch = []
+
+    if batch:
+        await _write_batch(db, batch, known_authors, known_genres, report)
+    return report
+
+
+def _report_error(report: dict, line_no: int, detail: str):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"line": line_no, "detail": detail})
+
+
+# Проверка существования идентификаторов одним запросом на пакет
+async def _resolve_ids(db: AsyncSession, column, ids: Set[int], known: Set[int]):
+    unknown = ids - known
+    if unknown:
+        result = await db.execute(select(column).where(column.in_(unknown)))
+        known.update(result.scalars())
+
+
+async def _write_batch(db: AsyncSession, batch, known_authors: Set[int], known_genres: Set[int], report: dict):
+    await _resolve_ids(db, Author.id, {i for _, row in batch for i in row.author_ids}, known_authors)
+    await _resolve_ids(db, Genre.id, {i for _, row in batch for i in row.genre_ids}, known_genres)
+
+    rows = []
+    for line_no, row in batch:
+        if not known_authors.issuperset(row.author_ids):
+            _report_error(report, line_no, "One or more authors not found")
+        elif not known_genres.issuperset(row.genre_ids):
+            _report_error(report, line_no, "One or more genres not found")
+        else:
+            rows.append(row)
+    if not rows:
+        return
+
+    if is_postgres(db):
+        book_ids = await _copy_books(db, rows)
+    else:
+        book_ids = await _insert_books(db, rows)
+
+    await index_books(db, book_ids)
+    await refresh_cards(db, book_ids)
+    await db.commit()
+    autocomplete_index.add_many(BOOK, [(book_id, row.title) for book_id, row in zip(book_ids, rows)])
+    report["inserted"] += len(rows)
+
+
+def _book_values(row: BookImportRow) -> Dict:
+    return {
+        "title": row.title,
+        "description": row.description,
+        "publication_date": row.publication_date,
+        "available_copies": row.available_copies,
+    }
+
+
+def _link_values(rows: List[BookImportRow], book_ids: List[int]):
+    authors = [(book_id, author_id) for book_id, row in zip(book_ids, rows) for author_id in set(row.author_ids)]
+    genres = [(book_id, genre_id) for book_id, row in zip(book_ids, rows) for genre_id in set(row.genre_ids)]
+    return authors, genres
+
+
+# Запись через COPY: идентификаторы заранее берутся из последовательности
+async def _copy_books(db: AsyncSession, rows: List[BookImportRow]) -> List[int]:
+    result = await db.execute(
+        text("SELECT nextval(pg_get_serial_sequence('books', 'id')) FROM generate_series(1, :n)"),
+        {"n": len(rows)},
+    )
+    book_ids = list(result.scalars())
+
+    connection = await db.connection()
+    raw = (await connection.get_raw_connection()).driver_connection
+    columns = ["id", "title", "description", "publication_date", "available_copies"]
+    await raw.copy_records_to_table(
+        "books",
+        columns=columns,
+        records=[(book_id, *_book_values(row).values()) for book_id, row in zip(book_ids, rows)],
+    )
+    authors, genres = _link_values(rows, book_ids)
+    if authors:
+        await raw.copy_records_to_table("book_author", columns=["book_id", "author_id"], records=authors)
+    if genres:
+        await raw.copy_records_to_table("book_genre", columns=["book_id", "genre_id"], records=genres)
+    return book_ids
+
+
+# Запись многострочными INSERT для остальных СУБД
+async def _insert_books(db: AsyncSession, rows: List[BookImportRow]) -> List[int]:
+    result = await db.execute(
+        insert(Book).returning(Book.id, sort_by_parameter_order=True),
+        [_book_values(row) for row in rows],
+    )
+    book_ids = list(result.scalars())
+    authors, genres = _link_values(rows, book_ids)
+    if authors:
+        await db.execute(insert(book_author), [{"book_id": b, "author_id": a} for b, a in authors])
+    if genres:
+        await db.execute(insert(book_genre), [{"book_id": b, "genre_id": g} for b, g in genres])
+    return book_ids
@@ -0,0 +1,114 @@
+from collections import defaultdict
+from typing import Iterable, List
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql import Select
+
+from app.models import Author, Book, BookCard, Genre, book_author, book_genre
+
+# Размер пакета при полной перестройке карточек
+REBUILD_BATCH_SIZE = 5000
+
+
+async def _resolve_ids(db: AsyncSession, book_ids) -> List[int]:
+    if isinstance(book_ids, Select):
+        return list(await db.scalars(book_ids))
+    return list(book_ids)
+
+
+# Пересборка карточек книг в текущей транзакции.
+# book_ids - список идентификаторов или подзапрос, возвращающий их.
+async def refresh_cards(db: AsyncSession, book_ids):
+    ids = await _resolve_ids(db, book_ids)
+    if not ids:
+        return
+    books = await db.execute(
+        select(Book.id, Book.title, Book.description, Book.publication_date, Book.available_copies, Book.version)
+        .where(Book.id.in_(ids))
+    )
+    authors = defaultdict(list)
+    for book_id, name in await db.execute(
+        select(book_author.c.book_id, Author.name)
+        .join(Author, Author.id == book_author.c.author_id)
+        .where(book_author.c.book_id.in_(ids))
+        .order_by(book_author.c.book_id, Author.name)
+    ):
+        authors[book_id].append(name)
+    genres = defaultdict(list)
+    for book_id, name in await db.execute(
+        select(book_genre.c.book_id, Genre.name)
+        .join(Genre, Genre.id == book_genre.c.genre_id)
+        .where(book_genre.c.book_id.in_(ids))
+        .order_by(book_genre.c.book_id, Genre.name)
+    ):
+        genres[book_id].append(name)
+
+    cards = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "description": row.description,
+            "publication_date": row.publication_date,
+            "available_copies": row.available_copies or 0,
+            "version": row.version,
+            "author_names": authors[row.id],
+            "genre_names": genres[row.id],
+        }
+        for row in books
+    ]
+    await db.execute(delete(BookCard).where(BookCard.id.in_(ids)).execution_options(synchronize_session=False))
+    if cards:
+        await db.execute(insert(BookCard.__table__), cards)
+
+
+# Перенос количества экземпляров и версии из books (после выдачи или возврата)
+async def sync_card_stock(db: AsyncSession, book_ids: Iterable[int]):
+    await db.execute(
+        update(BookCard)
+        .where(BookCard.id.in_(list(book_ids)))
+        .values(
+            available_copies=select(Book.available_copies).where(Book.id == BookCard.id).scalar_subquery(),
+            version=select(Book.version).where(Book.id == BookCard.id).scalar_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Удаление карточек перед удалением книг
+async def delete_cards(db: AsyncSession, book_ids: Iterable[int]):
+    await db.execute(
+        delete(BookCard).where(BookCard.id.in_(list(book_ids))).execution_options(synchronize_session=False)
+    )
+
+
+# Полная перестройка карточек пакетами по возрастанию id; каждый пакет - отдельная транзакция
+async def rebuild_cards(session_factory, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    last_id = 0
+    total = 0
+    async with session_factory() as db:
+        while True:
+            ids = list(await db.scalars(
+                select(Book.id).where(Book.id > last_id).order_by(Book.id).limit(batch_size)
+            ))
+            if not ids:
+                break
+            await refresh_cards(db, ids)
+            await db.commit()
+            total += len(ids)
+            last_id = ids[-1]
+        # Карточки удаленных книг
+        await db.execute(
+            delete(BookCard)
+            .where(~select(Book.id).where(Book.id == BookCard.id).exists())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    return total
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, run_script
+
+    print(f"Rebuilt {run_script(rebuild_cards(SessionLocal))} book cards")
@@ -0,0 +1,437 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.analytics import record_checkouts, record_returns
+from app.cards import sync_card_stock
+from app.database import job_lock
+from app.events import broker
+from app.models import Book, Hold, Loan, Reader
+from app.overdue import calculate_fines, cents_to_amount
+from app.queries import FULFILL_READY_HOLD, RESERVE_LOAN_SLOT, TAKE_COPY
+
+# Максимальное количество активных займов у читателя
+MAX_ACTIVE_LOANS = 5
+# Срок займа
+LOAN_PERIOD = timedelta(days=14)
+# Количество попыток при конфликте сериализации или взаимной блокировке
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.01
+# Размер пачки читателей при сверке счетчиков и максимальное число расхождений в отчете
+RECONCILE_BATCH_SIZE = 5000
+MAX_REPORTED_DRIFT = 1000
+
+# Статусы бронирований
+HOLD_WAITING = "waiting"
+HOLD_READY = "ready"
+HOLD_FULFILLED = "fulfilled"
+HOLD_CANCELLED = "cancelled"
+HOLD_EXPIRED = "expired"
+ACTIVE_HOLD_STATUSES = (HOLD_WAITING, HOLD_READY)
+# Срок, в течение которого отложенный экземпляр ждет читателя
+HOLD_PICKUP_PERIOD = timedelta(days=3)
+# Интервал между фоновыми проверками просроченных бронирований и ключ их advisory-блокировки
+HOLD_EXPIRY_INTERVAL_SECONDS = 60 * 60
+HOLD_EXPIRY_LOCK_KEY = 7_240_003
+
+# SQLSTATE ошибок, после которых транзакцию можно безопасно повторить
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+def is_retryable(error: DBAPIError) -> bool:
+    orig = error.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return sqlstate in RETRYABLE_SQLSTATES
+
+
+# Выполнение транзакции с ограниченным числом повторов при конфликтах
+async def run_with_retries(db: AsyncSession, operation, attempts: int = RETRY_ATTEMPTS):
+    for attempt in range(attempts):
+        try:
+            return await operation()
+        except DBAPIError as e:
+            await db.rollback()
+            if not is_retryable(e) or attempt == attempts - 1:
+                raise
+            await asyncio.sleep(RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random()))
+
+
+# Выяснение причины отказа в выдаче (только на неуспешном пути)
+async def _raise_checkout_error(db: AsyncSession, book_id: int, reader_id: int):
+    row = (await db.execute(select(
+        select(Book.available_copies).where(Book.id == book_id).scalar_subquery().label("available_copies"),
+        select(Reader.active_loan_count).where(Reader.id == reader_id).scalar_subquery().label("active_loans"),
+    ))).one()
+    if row.available_copies is None or row.available_copies < 1:
+        raise HTTPException(status_code=400, detail="Book is not available")
+    if row.active_loans is None:
+        raise HTTPException(status_code=404, detail="Reader not found")
+    if row.active_loans >= MAX_ACTIVE_LOANS:
+        raise HTTPException(status_code=400, detail="Reader has reached the maximum number of active loans")
+    raise HTTPException(status_code=409, detail="Checkout conflict, please retry")
+
+
+# Выдача книги: лимит займов проверяется условным увеличением счетчика читателя,
+# наличие экземпляра - готовым бронированием читателя или условным уменьшением
+# количества экземпляров книги (каждый UPDATE ... RETURNING блокирует одну строку),
+# затем вставка займа со сроком возврата и одна фиксация транзакции.
+# Порядок блокировок в операциях выдачи и возврата: читатели, книги, займы, бронирования.
+async def checkout(db: AsyncSession, book_id: int, reader_id: int) -> Loan:
+    async def attempt():
+        reader = await db.execute(RESERVE_LOAN_SLOT, {"reader_id": reader_id, "max_loans": MAX_ACTIVE_LOANS})
+        hold = book = None
+        if reader.first() is not None:
+            # Экземпляр, отложенный по бронированию, уже списан из фонда
+            hold = (await db.execute(
+                FULFILL_READY_HOLD,
+                {"h_book_id": book_id, "h_reader_id": reader_id, "ready": HOLD_READY, "fulfilled": HOLD_FULFILLED},
+            )).first()
+            if hold is None:
+                book = (await db.execute(TAKE_COPY, {"book_id": book_id})).first()
+        if hold is None and book is None:
+            await db.rollback()
+            await _raise_checkout_error(db, book_id, reader_id)
+
+        today = date.today()
+        # return_date задается явно: незаданный столбец после вставки не загружен,
+        # и его чтение при сериализации ответа потребовало бы ленивого запроса
+        loan = Loan(
+            book_id=book_id, reader_id=reader_id, loan_date=today, due_date=today + LOAN_PERIOD, return_date=None
+        )
+        db.add(loan)
+        await db.flush()
+        await record_checkouts(db, today, reader_id, Counter({book_id: 1}))
+        if book is not None:
+            await sync_card_stock(db, [book_id])
+        await db.commit()
+        return loan
+
+    return await run_with_retries(db, attempt)
+
+
+# Уменьшение или увеличение количества экземпляров нескольких книг одним executemany
+async def _adjust_stock(db: AsyncSession, deltas: dict):
+    books = Book.__table__
+    await db.execute(
+        update(books)
+        .where(books.c.id == bindparam("b_id"))
+        .values(available_copies=books.c.available_copies + bindparam("b_delta"), version=books.c.version + 1),
+        [{"b_id": book_id, "b_delta": delta} for book_id, delta in sorted(deltas.items())],
+    )
+
+
+# Передача вернувшихся экземпляров следующим ожидающим бронированиям (FIFO).
+# Возвращает экземпляры, оставшиеся для фонда, и бронирования, ставшие готовыми.
+async def _allocate_to_holds(db: AsyncSession, copies: Counter) -> Tuple[Counter, List[Hold]]:
+    remaining = Counter()
+    ready = []
+    now = datetime.utcnow()
+    for book_id, count in sorted(copies.items()):
+        holds = list(await db.scalars(
+            select(Hold)
+            .where(Hold.book_id == book_id, Hold.status == HOLD_WAITING)
+            .order_by(Hold.id)
+            .limit(count)
+            .with_for_update()
+        ))
+        for hold in holds:
+            hold.status = HOLD_READY
+            hold.ready_at = now
+            hold.expires_at = now + HOLD_PICKUP_PERIOD
+        ready.extend(holds)
+        if count > len(holds):
+            remaining[book_id] = count - len(holds)
+    return remaining, ready
+
+
+def hold_ready_event(hold: Hold) -> dict:
+    return {
+        "type": "hold_ready", "hold_id": hold.id, "book_id": hold.book_id,
+        "ready_at": hold.ready_at, "expires_at": hold.expires_at,
+    }
+
+
+def _notify_ready(holds: List[Hold]):
+    broker.publish_many((hold.reader_id, hold_ready_event(hold)) for hold in holds)
+
+
+# Бронирование книги, у которой нет свободных экземпляров
+async def place_hold(db: AsyncSession, book_id: int, reader_id: int) -> Tuple[Hold, int]:
+    copies = await db.scalar(select(Book.available_copies).where(Book.id == book_id).with_for_update())
+    if copies is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    if await db.scalar(select(Reader.id).where(Reader.id == reader_id)) is None:
+        raise HTTPException(status_code=404, detail="Reader not found")
+    if copies > 0:
+        raise HTTPException(status_code=400, detail="Book is available")
+    existing = await db.scalar(
+        select(Hold.id).where(Hold.book_id == book_id, Hold.reader_id == reader_id, Hold.status.in_(ACTIVE_HOLD_STATUSES))
+    )
+    if existing is not None:
+        raise HTTPException(status_code=400, detail="Hold already exists")
+
+    hold = Hold(book_id=book_id, reader_id=reader_id, status=HOLD_WAITING)
+    db.add(hold)
+    await db.flush()
+    position = await db.scalar(
+        select(func.count()).select_from(Hold).where(Hold.book_id == book_id, Hold.status == HOLD_WAITING, Hold.id <= hold.id)
+    )
+    await db.commit()
+    return hold, position
+
+
+# Отмена бронирования; отложенный экземпляр передается следующему в очереди или в фонд
+async def cancel_hold(db: AsyncSession, book_id: int, hold_id: int) -> Hold:
+    await db.execute(select(Book.id).where(Book.id == book_id).with_for_update())
+    hold = await db.scalar(
+        select(Hold).where(Hold.id == hold_id, Hold.book_id == book_id, Hold.status.in_(ACTIVE_HOLD_STATUSES)).with_for_update()
+    )
+    if hold is None:
+        raise HTTPException(status_code=404, detail="Hold not found")
+
+    was_ready = hold.status == HOLD_READY
+    hold.status = HOLD_CANCELLED
+    ready = []
+    if was_ready:
+        stock, ready = await _allocate_to_holds(db, Counter({book_id: 1}))
+        if stock:
+            await _adjust_stock(db, stock)
+        await db.flush()
+        if stock:
+            await sync_card_stock(db, [book_id])
+    await db.commit()
+    _notify_ready(ready)
+    return hold
+
+
+# Снятие готовых бронирований, не полученных до expires_at: как при отмене, экземпляр
+# передается следующему в очереди или возвращается в фонд. Если проверка уже идет
+# в другом процессе, запуск пропускается.
+async def expire_holds(session_factory, now: Optional[datetime] = None) -> dict:
+    now = now or datetime.utcnow()
+    async with job_lock(session_factory, HOLD_EXPIRY_LOCK_KEY) as locked:
+        if not locked:
+            return {"expired": 0, "skipped": "already running"}
+        async with session_factory() as db:
+            async def attempt():
+                overdue = (Hold.status == HOLD_READY, Hold.expires_at <= now)
+                book_ids = sorted(set(await db.scalars(select(Hold.book_id).where(*overdue))))
+                if not book_ids:
+                    return 0
+                await db.execute(select(Book.id).where(Book.id.in_(book_ids)).order_by(Book.id).with_for_update())
+                expired = list(await db.scalars(
+                    select(Hold).where(Hold.book_id.in_(book_ids), *overdue).order_by(Hold.id).with_for_update()
+                ))
+                for hold in expired:
+                    hold.status = HOLD_EXPIRED
+                stock, ready = await _allocate_to_holds(db, Counter(hold.book_id for hold in expired))
+                if stock:
+                    await _adjust_stock(db, stock)
+                await db.flush()
+                if stock:
+                    await sync_card_stock(db, list(stock))
+                await db.commit()
+                _notify_ready(ready)
+                return len(expired)
+
+            return {"expired": await run_with_retries(db, attempt)}
+
+
+# Пакетная выдача нескольких книг одному читателю в одной транзакции.
+# Строки книг блокируются в порядке возрастания id, чтобы избежать взаимных блокировок;
+# лимит займов проверяется один раз на весь пакет. Возвращает результат по каждой книге.
+async def checkout_batch(db: AsyncSession, reader_id: int, book_ids: List[int]) -> List[dict]:
+    async def attempt():
+        active = await db.scalar(select(Reader.active_loan_count).where(Reader.id == reader_id).with_for_update())
+        if active is None:
+            raise HTTPException(status_code=404, detail="Reader not found")
+        rows = await db.execute(
+            select(Book.id, Book.available_copies)
+            .where(Book.id.in_(sorted(set(book_ids))))
+            .order_by(Book.id)
+            .with_for_update()
+        )
+        stock = {book_id: copies or 0 for book_id, copies in rows}
+        ready = {
+            hold.book_id: hold
+            for hold in (await db.execute(
+                select(Hold)
+                .where(Hold.reader_id == reader_id, Hold.book_id.in_(list(stock)), Hold.status == HOLD_READY)
+                .order_by(Hold.id)
+                .with_for_update()
+            )).scalars()
+        }
+
+        today = date.today()
+        taken = Counter()
+        loaned = 0
+        results = []
+        for book_id in book_ids:
+            item = {"book_id": book_id, "loan": None, "error": None}
+            hold = ready.get(book_id)
+            if book_id not in stock:
+                item["error"] = "Book not found"
+            elif hold is None and stock[book_id] - taken[book_id] < 1:
+                item["error"] = "Book is not available"
+            elif active + loaned >= MAX_ACTIVE_LOANS:
+                item["error"] = "Reader has reached the maximum number of active loans"
+            else:
+                if hold is not None:
+                    hold.status = HOLD_FULFILLED
+                    del ready[book_id]
+                else:
+                    taken[book_id] += 1
+                loaned += 1
+                item["loan"] = Loan(
+                    book_id=book_id, reader_id=reader_id, loan_date=today, due_date=today + LOAN_PERIOD, return_date=None
+                )
+                db.add(item["loan"])
+            results.append(item)
+
+        if loaned:
+            await db.execute(
+                update(Reader)
+                .where(Reader.id == reader_id)
+                .values(active_loan_count=Reader.active_loan_count + loaned)
+                .execution_options(synchronize_session=False)
+            )
+            await record_checkouts(db, today, reader_id, Counter(item["loan"].book_id for item in results if item["loan"]))
+        if taken:
+            await _adjust_stock(db, {book_id: -count for book_id, count in taken.items()})
+        await db.flush()
+        if taken:
+            await sync_card_stock(db, list(taken))
+        await db.commit()
+        return results
+
+    return await run_with_retries(db, attempt)
+
+
+# Пакетный возврат займов в одной транзакции; строки читателей, книг и займов
+# блокируются в порядке возрастания id. Вернувшиеся экземпляры в первую очередь
+# откладываются для ожидающих бронирований, читатели получают уведомление после фиксации.
+async def return_batch(db: AsyncSession, loan_ids: List[int]) -> List[dict]:
+    async def attempt():
+        rows = (await db.execute(
+            select(Loan.id, Loan.reader_id, Loan.book_id).where(Loan.id.in_(set(loan_ids)))
+        )).all()
+        await db.execute(
+            select(Reader.id)
+            .where(Reader.id.in_(sorted({row.reader_id for row in rows})))
+            .order_by(Reader.id)
+            .with_for_update()
+        )
+        await db.execute(
+            select(Book.id)
+            .where(Book.id.in_(sorted({row.book_id for row in rows})))
+            .order_by(Book.id)
+            .with_for_update()
+        )
+        loans = {
+            loan.id: loan
+            for loan in (await db.execute(
+                select(Loan).where(Loan.id.in_(sorted(row.id for row in rows))).order_by(Loan.id).with_for_update()
+            )).scalars()
+        }
+
+        today = date.today()
+        returned = Counter()
+        released = Counter()
+        results = []
+        for loan_id in loan_ids:
+            loan = loans.get(loan_id)
+            item = {"loan_id": loan_id, "loan": None, "error": None}
+            if loan is None or loan.return_date is not None:
+                item["error"] = "Invalid loan ID or loan already returned"
+            else:
+                loan.return_date = today
+                returned[loan.book_id] += 1
+                released[loan.reader_id] += 1
+                item["loan"] = loan
+            results.append(item)
+
+        # Окончательный штраф за просрочку фиксируется при возврате
+        late = [item["loan"] for item in results if item["loan"] and item["loan"].due_date and item["loan"].due_date < today]
+        if late:
+            _, fines = calculate_fines([loan.due_date for loan in late], today)
+            for loan, fine in zip(late, fines):
+                loan.fine = cents_to_amount(fine)
+
+        holds = []
+        if returned:
+            readers = Reader.__table__
+            await db.execute(
+                update(readers)
+                .where(readers.c.id == bindparam("r_id"))
+                .values(active_loan_count=readers.c.active_loan_count - bindparam("r_count")),
+                [{"r_id": reader_id, "r_count": count} for reader_id, count in sorted(released.items())],
+            )
+            await record_returns(db, today, returned)
+            stock, holds = await _allocate_to_holds(db, returned)
+            if stock:
+                await _adjust_stock(db, stock)
+            await db.flush()
+            if stock:
+                await sync_card_stock(db, list(stock))
+        await db.commit()
+        _notify_ready(holds)
+        return results
+
+    return await run_with_retries(db, attempt)
+
+
+# Сверка счетчиков активных займов с таблицей займов. Читатели обрабатываются пачками;
+# строки пачки блокируются, чтобы параллельные выдачи не меняли займы во время пересчета.
+# Возвращает количество проверенных читателей и расхождения (не более MAX_REPORTED_DRIFT).
+async def reconcile_loan_counts(session_factory, batch_size: int = RECONCILE_BATCH_SIZE) -> dict:
+    report = {"readers": 0, "drifted": 0, "drift": []}
+    last_id = 0
+    async with session_factory() as db:
+        while True:
+            stored = dict((await db.execute(
+                select(Reader.id, Reader.active_loan_count)
+                .where(Reader.id > last_id)
+                .order_by(Reader.id)
+                .limit(batch_size)
+                .with_for_update()
+            )).all())
+            if not stored:
+                break
+            actual = dict((await db.execute(
+                select(Loan.reader_id, func.count())
+                .where(Loan.reader_id.in_(list(stored)), Loan.return_date.is_(None))
+                .group_by(Loan.reader_id)
+            )).all())
+            drift = [
+                {"reader_id": reader_id, "stored": count, "actual": actual.get(reader_id, 0)}
+                for reader_id, count in stored.items()
+                if count != actual.get(reader_id, 0)
+            ]
+            if drift:
+                readers = Reader.__table__
+                await db.execute(
+                    update(readers).where(readers.c.id == bindparam("r_id")).values(active_loan_count=bindparam("r_count")),
+                    [{"r_id": item["reader_id"], "r_count": item["actual"]} for item in drift],
+                )
+            await db.commit()
+            report["readers"] += len(stored)
+            report["drifted"] += len(drift)
+            report["drift"].extend(drift[:MAX_REPORTED_DRIFT - len(report["drift"])])
+            last_id = max(stored)
+    return report
+
+
+if __name__ == "__main__":
+    import json
+
+    from app.database import SessionLocal, run_script
+
+    print(json.dumps(run_script(reconcile_loan_counts(SessionLocal)), indent=2))
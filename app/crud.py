@@ -1,16 +1,26 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Reader, Book, Loan
-from app.auth import get_password_hash
+from sqlalchemy.orm import selectinload
+from app.models import Reader, Book, BookCard, Loan
+from app.auth import hash_password
 from fastapi import HTTPException
 from app.schemas import ReaderCreate, ReaderRead, BookCreate, BookRead
+from app.pagination import paginate
+from app.autocomplete import BOOK, autocomplete_index
+from app.cards import refresh_cards
+from app.circulation import checkout
+from app.queries import AUTHORS_BY_IDS, GENRES_BY_IDS, READER_ID_BY_EMAIL
+from app.search import index_books
+from typing import Optional
+
+# Авторы и жанры книги подгружаются пакетно, а не лениво для каждой книги
+BOOK_READ_OPTIONS = (selectinload(Book.authors), selectinload(Book.genres))
 
 # Создание нового читателя
 async def create_reader(reader: ReaderCreate, db: AsyncSession):
-    existing_reader = await db.execute(select(Reader).filter(Reader.email == reader.email))
-    if existing_reader.scalars().first():
+    if await db.scalar(READER_ID_BY_EMAIL, {"email": reader.email}) is not None:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(reader.password)
+    hashed_password = await hash_password(reader.password)
     new_reader = Reader(email=reader.email, hashed_password=hashed_password, name=reader.name)
     db.add(new_reader)
     await db.commit()
@@ -18,8 +28,8 @@ async def create_reader(reader: ReaderCreate, db: AsyncSession):
     return new_reader
 
 # Получение всех читателей
-async def get_readers(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Reader).offset(skip).limit(limit))
+async def get_readers(db: AsyncSession, skip: Optional[int] = None, limit: int = 10, cursor: Optional[str] = None):
+    result = await db.execute(paginate(select(Reader), [Reader.id], cursor, limit, skip))
     readers = result.scalars().all()
     return readers
 
@@ -30,48 +40,63 @@ async def get_reader_by_id(reader_id: int, db: AsyncSession):
         raise HTTPException(status_code=404, detail="Reader not found")
     return reader
 
-# Создание новой книги
+# Создание новой книги: связи проверяются, книга сразу попадает в поиск,
+# карточки и автодополнение
 async def create_book(book: BookCreate, db: AsyncSession):
-    new_book = Book(**book.dict())
+    authors = (await db.scalars(AUTHORS_BY_IDS, {"ids": book.author_ids})).all()
+    if len(authors) != len(book.author_ids):
+        raise HTTPException(status_code=400, detail="One or more authors not found")
+
+    genres = (await db.scalars(GENRES_BY_IDS, {"ids": book.genre_ids})).all()
+    if len(genres) != len(book.genre_ids):
+        raise HTTPException(status_code=400, detail="One or more genres not found")
+
+    new_book = Book(
+        title=book.title,
+        description=book.description,
+        publication_date=book.publication_date,
+        available_copies=book.available_copies,
+    )
+
+    new_book.authors.extend(authors)
+    new_book.genres.extend(genres)
+
     db.add(new_book)
+    await db.flush()
+    await index_books(db, [new_book.id])
+    await refresh_cards(db, [new_book.id])
     await db.commit()
-    await db.refresh(new_book)
+    autocomplete_index.add(BOOK, new_book.id, new_book.title)
+    # Пустые коллекции сбрасываются при flush, поэтому связи перечитываются явно
+    await db.refresh(new_book, attribute_names=["authors", "genres"])
     return new_book
 
 # Получение всех книг
-async def get_books(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Book).offset(skip).limit(limit))
+async def get_books(db: AsyncSession, skip: Optional[int] = None, limit: int = 10, cursor: Optional[str] = None):
+    query = select(Book).options(*BOOK_READ_OPTIONS)
+    result = await db.execute(paginate(query, [Book.id], cursor, limit, skip))
     books = result.scalars().all()
     return books
 
 # Получение книги по ID
 async def get_book_by_id(book_id: int, db: AsyncSession):
-    book = await db.get(Book, book_id)
+    book = await db.get(Book, book_id, options=BOOK_READ_OPTIONS)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     return book
 
-# Получение всех книг с возвращением модели BookRead
-async def get_books_read(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Book).offset(skip).limit(limit))
+# Получение всех книг с возвращением модели BookRead (из денормализованных карточек)
+async def get_books_read(db: AsyncSession, skip: Optional[int] = None, limit: int = 10, cursor: Optional[str] = None):
+    result = await db.execute(paginate(select(BookCard), [BookCard.id], cursor, limit, skip))
     books = result.scalars().all()
     return [BookRead.from_orm(book) for book in books]
 
 # Получение всех читателей с возвращением модели ReaderRead
-async def get_readers_read(db: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await db.execute(select(Reader).offset(skip).limit(limit))
+async def get_readers_read(db: AsyncSession, skip: Optional[int] = None, limit: int = 10, cursor: Optional[str] = None):
+    result = await db.execute(paginate(select(Reader), [Reader.id], cursor, limit, skip))
     readers = result.scalars().all()
     return [ReaderRead.from_orm(reader) for reader in readers]
 
 # Создание новой записи о займе
 async def create_loan(book_id: int, reader_id: int, db: AsyncSession):
-    # Проверка доступных экземпляров книги
-    book = await db.get(Book, book_id)
-    if not book or book.available_copies < 1:
-        raise HTTPException(status_code=400, detail="Book not available")
-    loan = Loan(book_id=book_id, reader_id=reader_id)
-    db.add(loan)
-    book.available_copies -= 1
-    await db.commit()
-    await db.refresh(loan)
-    return loan
+    return await checkout(db, book_id, reader_id)
@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Book
+
+
+# Строгий ETag ресурса по номеру версии строки
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+# Проверка совпадения ETag с заголовком If-None-Match / If-Match
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+# Текущая версия строки одним запросом по первичному ключу (None, если строки нет)
+async def current_version(db: AsyncSession, model, obj_id: int) -> Optional[int]:
+    return await db.scalar(select(model.version).where(model.id == obj_id))
+
+
+# Предусловие If-Match для изменяющих запросов
+def check_if_match(if_match: Optional[str], version: int):
+    if if_match is not None and not etag_matches(if_match, make_etag(version)):
+        raise HTTPException(status_code=412, detail="Precondition failed")
+
+
+# Увеличение версии книг, представление которых изменилось косвенно (например, при переименовании автора)
+async def bump_book_versions(db: AsyncSession, book_ids):
+    await db.execute(
+        update(Book)
+        .where(Book.id.in_(book_ids))
+        .values(version=Book.version + 1)
+        .execution_options(synchronize_session=False)
+    )
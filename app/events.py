@@ -0,0 +1,80 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, Set
+
+# Размер очереди одного подписчика; при переполнении старые события отбрасываются
+QUEUE_SIZE = 100
+# Интервал отправки комментария-пинга, чтобы прокси не закрывали соединение
+KEEPALIVE_SECONDS = 15
+
+
+# Рассылка событий читателям внутри процесса: у каждого подключения своя очередь.
+# События не переживают перезапуск и не передаются между процессами, поэтому клиент
+# при подключении получает текущее состояние (см. GET /readers/{reader_id}/events).
+class EventBroker:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, reader_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[reader_id].add(queue)
+        return queue
+
+    def unsubscribe(self, reader_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(reader_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[reader_id]
+
+    def publish(self, reader_id: int, event: dict):
+        for queue in self._subscribers.get(reader_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def publish_many(self, events: Iterable[tuple]):
+        for reader_id, event in events:
+            self.publish(reader_id, event)
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+# Глобальный брокер событий
+broker = EventBroker()
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+# Ключ события, по которому пропускаются повторы уже отправленных событий
+def event_key(event: dict) -> tuple:
+    return event["type"], event.get("hold_id")
+
+
+# Поток Server-Sent Events: начальные события, затем события из очереди подписчика.
+# Очередь создается до чтения начального состояния, чтобы не потерять события, опубликованные
+# между чтением и подключением; такие события, уже вошедшие в начальные, не повторяются.
+async def sse_stream(reader_id: int, queue: asyncio.Queue, initial: Iterable[dict], is_disconnected) -> AsyncIterator[str]:
+    sent = set()
+    try:
+        for event in initial:
+            sent.add(event_key(event))
+            yield format_sse(event)
+        while not await is_disconnected():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event_key(event) in sent:
+                sent.discard(event_key(event))
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(reader_id, queue)
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from typing import List
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.future import select
+from sqlalchemy.sql import Select
+
+from app.database import SessionLocal
+from app.models import BookCard
+from app.replicas import replica_router
+
+# Количество строк, читаемых из серверного курсора за одну выборку
+CHUNK_SIZE = 1000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# Запрос выгрузки книг из денормализованных карточек
+BOOKS_EXPORT_QUERY = select(
+    BookCard.id,
+    BookCard.title,
+    BookCard.description,
+    BookCard.publication_date,
+    BookCard.available_copies,
+    BookCard.authors.label("authors"),
+    BookCard.genres.label("genres"),
+).order_by(BookCard.id)
+
+
+def _format_ndjson(rows: List[dict], columns: List[str], header: bool) -> str:
+    return "".join(json.dumps({key: row[key] for key in columns}, default=str) + "\n" for row in rows)
+
+
+def _format_csv(rows: List[dict], columns: List[str], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow([";".join(row[key]) if isinstance(row[key], list) else row[key] for key in columns])
+    return buffer.getvalue()
+
+
+# Потоковое чтение результата запроса пачками в рамках одного снимка данных
+# (с реплики, если она доступна)
+async def stream_chunks(query: Select, chunk_size: int = CHUNK_SIZE):
+    async with SessionLocal(bind=replica_router.pick()) as session:
+        if session.get_bind().dialect.name == "postgresql":
+            # Вся выгрузка читается из одного согласованного снимка
+            await session.connection(
+                execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+            )
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.mappings().partitions(chunk_size):
+            yield partition
+
+
+# Ответ с потоковой выгрузкой в формате NDJSON или CSV
+def export_response(query: Select, columns: List[str], fmt: str, filename: str) -> StreamingResponse:
+    formatter = _format_csv if fmt == "csv" else _format_ndjson
+
+    async def body():
+        header = True
+        async for partition in stream_chunks(query):
+            yield formatter([dict(row) for row in partition], columns, header).encode()
+            header = False
+        if header and fmt == "csv":
+            yield formatter([], columns, True).encode()
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
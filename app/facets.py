@@ -0,0 +1,86 @@
+from datetime import date
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Integer, String, cast, exists, extract, func, literal_column, null, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Author, BookCard, Genre, book_author, book_genre
+
+FACETS = ("genre", "author", "year")
+
+
+# Зависимость с фильтрами каталога; возвращает список условий WHERE для карточек книг.
+# Внутри одного фильтра значения объединяются через ИЛИ, сами фильтры - через И.
+def book_filters(
+    genre_id: Optional[List[int]] = Query(None),
+    author_id: Optional[List[int]] = Query(None),
+    year_from: Optional[int] = Query(None, ge=1, le=9999),
+    year_to: Optional[int] = Query(None, ge=1, le=9999),
+    available: Optional[bool] = None,
+) -> list:
+    clauses = []
+    if genre_id:
+        clauses.append(exists().where(book_genre.c.book_id == BookCard.id, book_genre.c.genre_id.in_(genre_id)))
+    if author_id:
+        clauses.append(exists().where(book_author.c.book_id == BookCard.id, book_author.c.author_id.in_(author_id)))
+    # Границы по году задаются диапазоном дат, чтобы условие использовало индекс
+    if year_from is not None:
+        clauses.append(BookCard.publication_date >= date(year_from, 1, 1))
+    if year_to is not None:
+        clauses.append(BookCard.publication_date <= date(year_to, 12, 31))
+    if available is not None:
+        clauses.append(BookCard.available_copies > 0 if available else BookCard.available_copies <= 0)
+    return clauses
+
+
+# Разбор параметра facets=genre,author,year
+def parse_facets(facets: str) -> List[str]:
+    names = [name.strip() for name in facets.split(",") if name.strip()]
+    unknown = set(names) - set(FACETS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown facets: {', '.join(sorted(unknown))}")
+    return names
+
+
+# Подсчет фасетов одним сгруппированным запросом (UNION ALL по запрошенным фасетам)
+async def facet_counts(db: AsyncSession, clauses: list, facets: List[str]) -> Dict[str, list]:
+    matching = select(BookCard.id).where(*clauses)
+    parts = []
+    if "genre" in facets:
+        parts.append(
+            select(literal_column("'genre'", String).label("facet"), Genre.id.label("key"), Genre.name.label("name"), func.count().label("count"))
+            .select_from(book_genre)
+            .join(Genre, Genre.id == book_genre.c.genre_id)
+            .where(book_genre.c.book_id.in_(matching))
+            .group_by(Genre.id, Genre.name)
+        )
+    if "author" in facets:
+        parts.append(
+            select(literal_column("'author'", String).label("facet"), Author.id.label("key"), Author.name.label("name"), func.count().label("count"))
+            .select_from(book_author)
+            .join(Author, Author.id == book_author.c.author_id)
+            .where(book_author.c.book_id.in_(matching))
+            .group_by(Author.id, Author.name)
+        )
+    if "year" in facets:
+        year = cast(extract("year", BookCard.publication_date), Integer)
+        parts.append(
+            select(literal_column("'year'", String).label("facet"), year.label("key"), cast(null(), String).label("name"), func.count().label("count"))
+            .where(*clauses)
+            .group_by(year)
+        )
+
+    counts = {name: [] for name in facets}
+    if not parts:
+        return counts
+    result = await db.execute(union_all(*parts))
+    for row in result:
+        entry = {"id": row.key, "count": row.count} if row.facet != "year" else {"year": row.key, "count": row.count}
+        if row.name is not None:
+            entry["name"] = row.name
+        counts[row.facet].append(entry)
+    for entries in counts.values():
+        entries.sort(key=lambda entry: (-entry["count"], entry.get("id", entry.get("year"))))
+    return counts
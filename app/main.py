@@ -1,13 +1,64 @@
+import asyncio
+
 from fastapi import FastAPI
-from app.routers import books, authors, readers, loans, genres
-from app.database import init_db
+from app.routers import books, authors, readers, loans, genres, autocomplete, analytics, debug
+from app.database import engine, init_db, SessionLocal
+from app.autocomplete import build_autocomplete_index
+from app.overdue import RUN_INTERVAL_SECONDS as OVERDUE_INTERVAL, run_overdue
+from app.archive import RUN_INTERVAL_SECONDS as ARCHIVE_INTERVAL, archive_loans, ensure_partitions
+from app.circulation import HOLD_EXPIRY_INTERVAL_SECONDS, expire_holds
+from app.utils import run_periodically
+from app.auth import ALGORITHM, SECRET_KEY, password_hasher
+from app.config import settings
+from app.ratelimit import RateLimitMiddleware, make_backend
+from app.replicas import ReadYourWritesMiddleware, replica_router
 
 app = FastAPI()
 
+# Чтения клиента после его записи направляются на основной сервер
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Ограничение частоты запросов по читателю или IP-адресу
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limits=settings.RATE_LIMITS,
+        backend=make_backend(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_REDIS_URL),
+        secret_key=SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
 # Инициализация базы данных
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    async with SessionLocal() as db:
+        # Годовые секции займов создаются до приема запросов
+        await ensure_partitions(db)
+        # Индекс подсказок строится одним проходом по каталогу
+        await build_autocomplete_index(db)
+    # Фоновые задачи: пересчет просрочек и штрафов, перенос старых займов в архив,
+    # снятие бронирований, не полученных в срок
+    app.state.background_tasks = [
+        asyncio.create_task(run_periodically(lambda: run_overdue(SessionLocal), OVERDUE_INTERVAL, "Overdue run")),
+        asyncio.create_task(run_periodically(lambda: archive_loans(SessionLocal), ARCHIVE_INTERVAL, "Loan archiving")),
+        asyncio.create_task(run_periodically(lambda: expire_holds(SessionLocal), HOLD_EXPIRY_INTERVAL_SECONDS, "Hold expiry")),
+    ]
+    # Реплики используются только после первой проверки отставания
+    if replica_router.replicas:
+        await replica_router.check_lag()
+        app.state.background_tasks.append(asyncio.create_task(
+            run_periodically(replica_router.check_lag, settings.REPLICA_LAG_CHECK_SECONDS, "Replica lag check", verbose=False)
+        ))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in app.state.background_tasks:
+        task.cancel()
+    password_hasher.shutdown()
+    await engine.dispose()
+    for replica in replica_router.replicas:
+        await replica.dispose()
 
 # Регистрация роутеров
 app.include_router(books.router, prefix="/books", tags=["Books"])
@@ -15,6 +66,9 @@ app.include_router(authors.router, prefix="/authors", tags=["Authors"])
 app.include_router(readers.router, prefix="/readers", tags=["Readers"])
 app.include_router(loans.router, prefix="/loans", tags=["Loans"])
 app.include_router(genres.router, prefix="/genres", tags=["Genres"])
+app.include_router(autocomplete.router, prefix="/autocomplete", tags=["Autocomplete"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"])
 
 @app.get("/")
 def read_root():
@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, Date
-from sqlalchemy.orm import relationship, declarative_base
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, Date, DateTime, Text, Index, JSON, Numeric, func, text
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import relationship, declarative_base, deferred
 
 Base = declarative_base()
 
@@ -9,6 +12,18 @@ book_genre = Table(
     Base.metadata,
     Column("book_id", Integer, ForeignKey("books.id"), primary_key=True),
     Column("genre_id", Integer, ForeignKey("genres.id"), primary_key=True),
+    # Обратный индекс для фильтрации книг по жанру
+    Index("ix_book_genre_genre_id_book_id", "genre_id", "book_id"),
+)
+
+# Связь книги и автора
+book_author = Table(
+    "book_author",
+    Base.metadata,
+    Column("book_id", Integer, ForeignKey("books.id"), primary_key=True),
+    Column("author_id", Integer, ForeignKey("authors.id"), primary_key=True),
+    # Обратный индекс для фильтрации книг по автору
+    Index("ix_book_author_author_id_book_id", "author_id", "book_id"),
 )
 
 class Book(Base):
@@ -19,10 +34,52 @@ class Book(Base):
     description = Column(String, nullable=True)
     publication_date = Column(Date, nullable=False)
     available_copies = Column(Integer, default=0)
+    # Версия строки: увеличивается при каждом изменении и используется для ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Поисковый вектор (название, авторы, описание); на других СУБД не используется
+    search_vector = deferred(Column(Text().with_variant(TSVECTOR(), "postgresql"), nullable=True))
 
-    authors = relationship("Author", back_populates="books")
+    authors = relationship("Author", secondary=book_author, back_populates="books")
     genres = relationship("Genre", secondary=book_genre, back_populates="books")
 
+    __table_args__ = (
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_books_publication_date_id", "publication_date", "id"),
+        # Частичный индекс для фильтра по наличию экземпляров
+        Index(
+            "ix_books_available_id",
+            "id",
+            postgresql_where=text("available_copies > 0"),
+            sqlite_where=text("available_copies > 0"),
+        ),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+# Денормализованная карточка книги для чтения: имена авторов и жанров хранятся массивами.
+# Обновляется в той же транзакции, что и книга, авторы и жанры (см. app/cards.py).
+class BookCard(Base):
+    __tablename__ = "book_cards"
+
+    id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    title = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    publication_date = Column(Date, nullable=False)
+    available_copies = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=1)
+    authors = Column("author_names", JSON().with_variant(ARRAY(String), "postgresql"), nullable=False, default=list)
+    genres = Column("genre_names", JSON().with_variant(ARRAY(String), "postgresql"), nullable=False, default=list)
+
+    __table_args__ = (
+        Index("ix_book_cards_title_id", "title", "id"),
+        Index("ix_book_cards_publication_date_id", "publication_date", "id"),
+        Index(
+            "ix_book_cards_available_id",
+            "id",
+            postgresql_where=text("available_copies > 0"),
+            sqlite_where=text("available_copies > 0"),
+        ),
+    )
+
 class Author(Base):
     __tablename__ = "authors"
 
@@ -30,17 +87,25 @@ class Author(Base):
     name = Column(String, nullable=False)
     biography = Column(String, nullable=True)
     birth_date = Column(Date, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    books = relationship("Book", secondary=book_author, back_populates="authors")
 
-    books = relationship("Book", back_populates="authors")
+    __mapper_args__ = {"version_id_col": version}
 
 class Genre(Base):
     __tablename__ = "genres"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, unique=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     books = relationship("Book", secondary=book_genre, back_populates="genres")
 
+    __mapper_args__ = {"version_id_col": version}
+
+# Займы. В PostgreSQL миграция 7c3e5a9f1d24 секционирует таблицу по диапазонам loan_date
+# (по годам) с составным первичным ключом (id, loan_date); в модели ключ займа - id.
 class Loan(Base):
     __tablename__ = "loans"
 
@@ -48,11 +113,40 @@ class Loan(Base):
     book_id = Column(Integer, ForeignKey("books.id"))
     reader_id = Column(Integer, ForeignKey("readers.id"))
     loan_date = Column(Date, nullable=False)
+    due_date = Column(Date, nullable=True)
     return_date = Column(Date, nullable=True)
+    # Начисленный штраф за просрочку (пересчитывается app/overdue.py)
+    fine = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
 
     book = relationship("Book")
     reader = relationship("Reader")
 
+    __table_args__ = (
+        # Частичный индекс по невозвращенным займам для поиска просроченных
+        Index(
+            "ix_loans_active_due_date_id",
+            "due_date",
+            "id",
+            postgresql_where=text("return_date IS NULL"),
+            sqlite_where=text("return_date IS NULL"),
+        ),
+    )
+
+# Архив возвращенных займов старше срока хранения в основной таблице (см. app/archive.py)
+class LoanArchive(Base):
+    __tablename__ = "loans_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    book_id = Column(Integer, nullable=True)
+    reader_id = Column(Integer, nullable=True)
+    loan_date = Column(Date, nullable=False)
+    due_date = Column(Date, nullable=True)
+    return_date = Column(Date, nullable=True)
+    fine = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
+
+    # Единственный вторичный индекс: архив читается только по читателю и по id
+    __table_args__ = (Index("ix_loans_archive_reader_id", "reader_id"),)
+
 class Reader(Base):
     __tablename__ = "readers"
 
@@ -60,5 +154,78 @@ class Reader(Base):
     name = Column(String, nullable=False)
     email = Column(String, nullable=False, unique=True)
     hashed_password = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Количество невозвращенных займов; поддерживается app/circulation.py
+    active_loan_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     loans = relationship("Loan", back_populates="reader")
+
+    __mapper_args__ = {"version_id_col": version}
+
+# Очередь бронирований книги (FIFO по id): waiting - ожидает экземпляр,
+# ready - экземпляр отложен для читателя до expires_at, fulfilled - выдан, cancelled - отменено,
+# expired - читатель не забрал книгу в срок
+class Hold(Base):
+    __tablename__ = "holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    reader_id = Column(Integer, ForeignKey("readers.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default="waiting", server_default="waiting")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=func.now())
+    ready_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Следующее бронирование в очереди книги
+        Index(
+            "ix_holds_waiting_book_id_id",
+            "book_id",
+            "id",
+            postgresql_where=text("status = 'waiting'"),
+            sqlite_where=text("status = 'waiting'"),
+        ),
+        # Не более одного действующего бронирования книги у читателя
+        Index(
+            "ix_holds_active_book_id_reader_id",
+            "book_id",
+            "reader_id",
+            unique=True,
+            postgresql_where=text("status IN ('waiting', 'ready')"),
+            sqlite_where=text("status IN ('waiting', 'ready')"),
+        ),
+        Index("ix_holds_reader_id_status", "reader_id", "status"),
+        # Готовые бронирования с истекшим сроком получения
+        Index(
+            "ix_holds_ready_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'ready'"),
+            sqlite_where=text("status = 'ready'"),
+        ),
+    )
+
+# Дневные агрегаты выдач и возвратов по книгам (см. app/analytics.py)
+class BookLoanDaily(Base):
+    __tablename__ = "book_loan_daily"
+
+    day = Column(Date, primary_key=True)
+    book_id = Column(Integer, primary_key=True)
+    loans = Column(Integer, nullable=False, default=0, server_default="0")
+    returns = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (Index("ix_book_loan_daily_book_id_day", "book_id", "day"),)
+
+# Дневные агрегаты выдач по жанрам
+class GenreLoanDaily(Base):
+    __tablename__ = "genre_loan_daily"
+
+    day = Column(Date, primary_key=True)
+    genre_id = Column(Integer, primary_key=True)
+    loans = Column(Integer, nullable=False, default=0, server_default="0")
+
+# Читатели, бравшие книги на неделе (неделя начинается с понедельника)
+class ReaderWeekActivity(Base):
+    __tablename__ = "reader_week_activity"
+
+    week = Column(Date, primary_key=True)
+    reader_id = Column(Integer, primary_key=True)
@@ -0,0 +1,95 @@
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import job_lock
+from app.models import Loan
+from app.search import is_postgres
+
+# Штраф за день просрочки и максимальный штраф по одному займу (в копейках)
+FINE_PER_DAY_CENTS = 10_00
+MAX_FINE_CENTS = 500_00
+# Количество займов, обрабатываемых за одну транзакцию
+CHUNK_SIZE = 10_000
+# Интервал между фоновыми пересчетами
+RUN_INTERVAL_SECONDS = 24 * 60 * 60
+# Ключ advisory-блокировки пересчета (один пересчет на все процессы)
+LOCK_KEY = 7_240_001
+
+
+# Дни просрочки и штрафы (в копейках) для массива сроков возврата
+def calculate_fines(due_dates: Sequence[date], today: date):
+    days = (np.datetime64(today, "D") - np.array(due_dates, dtype="datetime64[D]")).astype(np.int64)
+    np.maximum(days, 0, out=days)
+    return days, np.minimum(days * FINE_PER_DAY_CENTS, MAX_FINE_CENTS)
+
+
+def cents_to_amount(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+# Условия выборки просроченных невозвращенных займов (используют частичный индекс)
+def overdue_clauses(today: date) -> list:
+    return [Loan.return_date.is_(None), Loan.due_date < today]
+
+
+# Пересчет штрафов одной пачки; записываются только изменившиеся значения
+async def _process_chunk(db: AsyncSession, rows: List, today: date) -> int:
+    ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+    current = np.fromiter((int(row.fine * 100) for row in rows), dtype=np.int64, count=len(rows))
+    _, fines = calculate_fines([row.due_date for row in rows], today)
+    changed = np.flatnonzero(fines != current)
+    if not len(changed):
+        return 0
+    if is_postgres(db):
+        # Один UPDATE ... FROM unnest на пачку вместо отдельного оператора на строку
+        await db.execute(
+            text(
+                "UPDATE loans SET fine = v.fine "
+                "FROM unnest(CAST(:ids AS integer[]), CAST(:fines AS numeric[])) AS v(id, fine) "
+                "WHERE loans.id = v.id"
+            ),
+            {"ids": ids[changed].tolist(), "fines": [cents_to_amount(fine) for fine in fines[changed]]},
+        )
+    else:
+        loans = Loan.__table__
+        await db.execute(
+            update(loans).where(loans.c.id == bindparam("l_id")).values(fine=bindparam("l_fine")),
+            [{"l_id": int(ids[i]), "l_fine": cents_to_amount(fines[i])} for i in changed],
+        )
+    return len(changed)
+
+
+# Пересчет штрафов по всем просроченным займам: пачки читаются keyset-пагинацией
+# по (due_date, id), каждая пачка записывается одним executemany и фиксируется отдельно.
+# Если пересчет уже идет в другом процессе, запуск пропускается.
+async def run_overdue(session_factory, today: Optional[date] = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    today = today or date.today()
+    report = {"overdue": 0, "updated": 0}
+    async with job_lock(session_factory, LOCK_KEY) as locked:
+        if not locked:
+            return {**report, "skipped": "already running"}
+        last: Optional[tuple] = None
+        async with session_factory() as db:
+            while True:
+                query = select(Loan.id, Loan.due_date, Loan.fine).where(*overdue_clauses(today))
+                if last is not None:
+                    query = query.where(tuple_(Loan.due_date, Loan.id) > last)
+                rows = (await db.execute(query.order_by(Loan.due_date, Loan.id).limit(chunk_size))).all()
+                if not rows:
+                    break
+                report["updated"] += await _process_chunk(db, rows, today)
+                await db.commit()
+                report["overdue"] += len(rows)
+                last = (rows[-1].due_date, rows[-1].id)
+    return report
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, run_script
+
+    print(run_script(run_overdue(SessionLocal)))
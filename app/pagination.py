@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import date
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Заголовок, в котором клиенту возвращается курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# Кодирование значений ключа сортировки в непрозрачный курсор
+def encode_cursor(values: List[Any]) -> str:
+    payload = [value.isoformat() if isinstance(value, date) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Значение курсора, приведенное к типу колонки; значение другого типа - ошибка
+def _cursor_value(value: Any, column) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is float and type(value) is int:
+        return float(value)
+    if type(value) is not python_type:
+        raise TypeError("cursor value type mismatch")
+    return value
+
+
+# Декодирование курсора с приведением значений к типам колонок сортировки
+def decode_cursor(cursor: str, columns) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor arity mismatch")
+        return [_cursor_value(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Применение keyset-пагинации к запросу.
+# columns - колонки сортировки, последней всегда должен идти первичный ключ.
+# Если передан skip, используется устаревший режим OFFSET.
+def paginate(query, columns, cursor: Optional[str] = None, limit: int = 10, skip: Optional[int] = None):
+    query = query.order_by(*columns)
+    if skip is not None:
+        return query.offset(skip).limit(limit)
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            query = query.where(columns[0] > values[0])
+        else:
+            query = query.where(tuple_(*columns) > tuple_(*values))
+    return query.limit(limit)
+
+
+# Курсор следующей страницы: None, если страница неполная или включен режим OFFSET
+def next_cursor(items, attributes: List[str], limit: int, skip: Optional[int] = None) -> Optional[str]:
+    if skip is not None or len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, attribute) for attribute in attributes])
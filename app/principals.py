@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.models import Reader
+
+
+# Кэш аутентифицированных пользователей с вытеснением по LRU и сроком жизни записи.
+# Ключ - (sub, iat) токена, поэтому новый токен того же читателя кэшируется отдельно.
+# Здесь же хранится список отзыва: отдельные токены и "все токены читателя, выпущенные
+# до момента T". Оба списка живут в памяти процесса.
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, Optional[int]], Tuple[object, float]]" = OrderedDict()
+        self._revoked_tokens: Dict[Tuple[str, Optional[int]], float] = {}
+        self._revoked_before: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, sub: str, iat: Optional[int]):
+        key = (sub, iat)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    # Запись не живет дольше самого токена
+    def put(self, sub: str, iat: Optional[int], principal, expires_at: Optional[float] = None):
+        ttl = self.ttl if expires_at is None else min(self.ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+        key = (sub, iat)
+        self._entries[key] = (principal, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, sub: Hashable):
+        sub = str(sub)
+        keys = [key for key in self._entries if key[0] == sub]
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += len(keys)
+
+    def is_revoked(self, sub: str, iat: Optional[int]) -> bool:
+        if (sub, iat) in self._revoked_tokens:
+            return True
+        before = self._revoked_before.get(sub)
+        return before is not None and (iat is None or iat <= before)
+
+    # Отзыв одного токена до истечения его срока действия
+    def revoke_token(self, sub: Hashable, iat: Optional[int], expires_at: float):
+        self._purge_revoked()
+        key = (str(sub), iat)
+        self._revoked_tokens[key] = expires_at
+        self._entries.pop(key, None)
+
+    # Отзыв всех токенов читателя, выпущенных до текущего момента. Время хранится с точностью
+    # iat токена (секунды), поэтому отзываются и токены, выпущенные в ту же секунду
+    def revoke_all(self, sub: Hashable):
+        self._revoked_before[str(sub)] = int(time.time())
+        self.invalidate(sub)
+
+    def _purge_revoked(self):
+        now = time.time()
+        for key in [key for key, expires_at in self._revoked_tokens.items() if expires_at <= now]:
+            del self._revoked_tokens[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "revoked_tokens": len(self._revoked_tokens),
+            "revoked_readers": len(self._revoked_before),
+        }
+
+
+# Сброс записей кэша после фиксации транзакции, изменившей или удалившей читателя через ORM.
+# При сбросе во время flush параллельный запрос мог снова закэшировать старое состояние
+# до фиксации; при откате сбрасывать нечего.
+def watch_readers(cache: PrincipalCache):
+    pending: "WeakKeyDictionary[Session, Set[int]]" = WeakKeyDictionary()
+
+    @event.listens_for(Reader, "after_update")
+    @event.listens_for(Reader, "after_delete")
+    def _collect(mapper, connection, target):
+        pending.setdefault(object_session(target), set()).add(target.id)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidate(session):
+        for reader_id in pending.pop(session, ()):
+            cache.invalidate(reader_id)
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        pending.pop(session, None)
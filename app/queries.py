@@ -0,0 +1,49 @@
+# Часто выполняемые запросы, построенные один раз при импорте.
+# SQLAlchemy запоминает ключ кэша у объекта запроса, поэтому для этих запросов на каждом
+# вызове не строится дерево выражения и не вычисляется ключ кэша: скомпилированный SQL
+# сразу берется из кэша движка (DB_QUERY_CACHE_SIZE). Значения передаются через именованные
+# параметры; списки id - через расширяемый параметр IN (expanding), раскрываемый при выполнении.
+from sqlalchemy import bindparam, update
+from sqlalchemy.future import select
+
+from app.models import Author, Book, Genre, Hold, Reader
+
+# Проверка авторов и жанров книги при создании и изменении: {"ids": [...]}
+AUTHORS_BY_IDS = select(Author).where(Author.id.in_(bindparam("ids", expanding=True)))
+GENRES_BY_IDS = select(Genre).where(Genre.id.in_(bindparam("ids", expanding=True)))
+
+# Проверки уникальности имен и email: возвращают id найденной записи или None
+AUTHOR_ID_BY_NAME = select(Author.id).where(Author.name == bindparam("name")).limit(1)
+GENRE_ID_BY_NAME = select(Genre.id).where(Genre.name == bindparam("name")).limit(1)
+# Другой жанр с таким же названием: {"name": ..., "genre_id": ...}
+OTHER_GENRE_ID_BY_NAME = (
+    select(Genre.id).where(Genre.name == bindparam("name"), Genre.id != bindparam("genre_id")).limit(1)
+)
+READER_ID_BY_EMAIL = select(Reader.id).where(Reader.email == bindparam("email")).limit(1)
+
+# Выдача книги (app.circulation.checkout).
+# Место для займа у читателя: {"reader_id": ..., "max_loans": ...}
+RESERVE_LOAN_SLOT = (
+    update(Reader)
+    .where(Reader.id == bindparam("reader_id"), Reader.active_loan_count < bindparam("max_loans"))
+    .values(active_loan_count=Reader.active_loan_count + 1)
+    .returning(Reader.id)
+    .execution_options(synchronize_session=False)
+)
+# Выдача по готовому бронированию: {"h_book_id", "h_reader_id", "ready", "fulfilled"}
+# (имена столбцов таблицы зарезервированы для параметров UPDATE)
+FULFILL_READY_HOLD = (
+    update(Hold)
+    .where(Hold.book_id == bindparam("h_book_id"), Hold.reader_id == bindparam("h_reader_id"), Hold.status == bindparam("ready"))
+    .values(status=bindparam("fulfilled"))
+    .returning(Hold.id)
+    .execution_options(synchronize_session=False)
+)
+# Списание свободного экземпляра: {"book_id": ...}
+TAKE_COPY = (
+    update(Book)
+    .where(Book.id == bindparam("book_id"), Book.available_copies > 0)
+    .values(available_copies=Book.available_copies - 1, version=Book.version + 1)
+    .returning(Book.id)
+    .execution_options(synchronize_session=False)
+)
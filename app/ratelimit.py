@@ -0,0 +1,166 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+
+# Сколько ключей проверяется на простой при каждом обращении к хранилищу
+EVICTION_SCAN = 2
+# Максимальное количество ключей в памяти процесса
+MAX_KEYS = 100_000
+
+# Пути, не входящие в группы и не ограничиваемые
+EXEMPT_PATHS = {"/", "/docs", "/redoc", "/openapi.json"}
+
+
+# Хранилище ведер в памяти процесса: ведро - [токены, время последнего обновления].
+# Обновление O(1); ведра упорядочены по времени последнего обращения, поэтому ведра,
+# которые успели полностью наполниться (эквивалентны новым), удаляются с начала очереди.
+class MemoryBackend:
+    def __init__(self, max_keys: int = MAX_KEYS, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.evictions = 0
+
+    # Списание токена; возвращает 0, если запрос разрешен, иначе время ожидания в секундах
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = self.clock()
+        self._evict_idle(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now, burst / rate]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / rate
+
+    def _evict_idle(self, now: float):
+        for _ in range(EVICTION_SCAN):
+            if not self._buckets:
+                return
+            key, (_, updated, refill) = next(iter(self._buckets.items()))
+            if now - updated < refill and len(self._buckets) < self.max_keys:
+                return
+            del self._buckets[key]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Общее хранилище в Redis для нескольких процессов; ведро обновляется атомарно скриптом Lua.
+# Пакет redis не входит в обязательные зависимости.
+class RedisBackend:
+    SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from e
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._script(keys=[self.prefix + key], args=[rate, burst, time.time()]))
+
+
+# Группа маршрутов - первый сегмент пути (/books/..., /loans/...)
+def route_group(path: str) -> str:
+    return path.strip("/").split("/", 1)[0]
+
+
+# Ключ клиента: читатель из JWT (sub) или IP-адрес.
+# Без secret_key подпись токена не проверяется (ключ не используется для доступа к данным).
+def client_key(scope, secret_key: Optional[str] = None, algorithm: str = "HS256") -> str:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    if secret_key is None:
+                        sub = jwt.get_unverified_claims(token).get("sub")
+                    else:
+                        sub = jwt.decode(token, secret_key, algorithms=[algorithm]).get("sub")
+                except JWTError:
+                    sub = None
+                if sub is not None:
+                    return f"reader:{sub}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+# ASGI middleware с ограничением частоты запросов по алгоритму token bucket.
+# limits: группа маршрутов -> (запросов в секунду, размер всплеска); группа "default"
+# применяется к остальным маршрутам.
+class RateLimitMiddleware:
+    def __init__(self, app, limits: Dict[str, Tuple[float, int]], backend=None, secret_key: str = "", algorithm: str = "HS256"):
+        self.app = app
+        self.limits = limits
+        self.backend = backend or MemoryBackend()
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.rejected = 0
+
+    def limit_for(self, path: str) -> Optional[Tuple[str, Tuple[float, int]]]:
+        if path in EXEMPT_PATHS:
+            return None
+        group = route_group(path)
+        if group in self.limits:
+            return group, self.limits[group]
+        if "default" in self.limits:
+            return "default", self.limits["default"]
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = self.limit_for(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        group, (rate, burst) = limit
+        key = f"{group}:{client_key(scope, self.secret_key, self.algorithm)}"
+        retry_after = await self.backend.take(key, rate, burst)
+        if not retry_after:
+            return await self.app(scope, receive, send)
+
+        self.rejected += 1
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Хранилище по настройкам приложения
+def make_backend(name: str, redis_url: Optional[str] = None):
+    if name == "redis":
+        return RedisBackend(redis_url)
+    return MemoryBackend()
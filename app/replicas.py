@@ -0,0 +1,126 @@
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import create_engine, engine, open_session
+from app.ratelimit import client_key
+from app.utils import logger
+
+# Методы, не изменяющие данные
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Максимальное количество клиентов, для которых помнится время последней записи
+MAX_STICKY_CLIENTS = 100_000
+
+# Отставание реплики PostgreSQL в секундах; 0, если все полученные изменения применены
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+# Выбор движка для чтения: реплики по кругу, основной сервер - если реплик нет,
+# все отстают больше max_lag или клиент недавно выполнял запись (read-your-writes).
+# Время записи клиентов хранится в памяти процесса.
+class ReplicaRouter:
+    def __init__(self, primary, replicas: List, max_lag: float, sticky_seconds: float, max_clients: int = MAX_STICKY_CLIENTS):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.max_clients = max_clients
+        # До первой проверки отставания реплики не используются
+        self.lag: List[Optional[float]] = [None] * len(replicas)
+        self._healthy: List = []
+        self._next = 0
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def note_write(self, client: str):
+        self._writes[client] = time.monotonic()
+        self._writes.move_to_end(client)
+        while len(self._writes) > self.max_clients:
+            self._writes.popitem(last=False)
+
+    def is_sticky(self, client: Optional[str]) -> bool:
+        written = self._writes.get(client) if client else None
+        if written is None:
+            return False
+        if time.monotonic() - written < self.sticky_seconds:
+            return True
+        del self._writes[client]
+        return False
+
+    def pick(self, client: Optional[str] = None):
+        if not self._healthy or self.is_sticky(client):
+            self.primary_reads += 1
+            return self.primary
+        self._next = (self._next + 1) % len(self._healthy)
+        self.replica_reads += 1
+        return self._healthy[self._next]
+
+    # Проверка отставания реплик; недоступные и отстающие реплики исключаются до следующей проверки
+    async def check_lag(self) -> dict:
+        healthy = []
+        for index, replica in enumerate(self.replicas):
+            try:
+                async with replica.connect() as conn:
+                    lag = float(await conn.scalar(REPLICA_LAG_SQL)) if replica.dialect.name == "postgresql" else 0.0
+            except Exception:
+                logger.exception(f"Replica {index} lag check failed")
+                lag = None
+            self.lag[index] = lag
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(replica)
+        self._healthy = healthy
+        return {"replicas": len(self.replicas), "healthy": len(healthy)}
+
+    def stats(self) -> dict:
+        return {
+            "replicas": [
+                {"url": replica.url.render_as_string(hide_password=True), "lag_seconds": lag, "healthy": replica in self._healthy}
+                for replica, lag in zip(self.replicas, self.lag)
+            ],
+            "max_lag_seconds": self.max_lag,
+            "sticky_seconds": self.sticky_seconds,
+            "sticky_clients": len(self._writes),
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+        }
+
+
+replica_router = ReplicaRouter(
+    engine,
+    [create_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    sticky_seconds=settings.READ_YOUR_WRITES_SECONDS,
+)
+
+
+# Dependency: сессия для обработчиков, которые только читают данные
+async def get_read_db(request: Request):
+    async with open_session(replica_router.pick(client_key(request.scope))) as session:
+        yield session
+
+
+# Запоминает клиентов, успешно выполнивших изменяющий запрос, чтобы их чтения
+# в течение READ_YOUR_WRITES_SECONDS шли на основной сервер
+class ReadYourWritesMiddleware:
+    def __init__(self, app, router: ReplicaRouter = replica_router):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not self.router.replicas:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                self.router.note_write(client_key(scope))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
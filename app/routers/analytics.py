@@ -0,0 +1,97 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models import BookCard, BookLoanDaily, Genre, GenreLoanDaily, ReaderWeekActivity
+from app.database import DBRoute
+from app.replicas import get_read_db
+from pydantic import BaseModel
+from datetime import date, timedelta
+from typing import List, Optional
+
+router = APIRouter(route_class=DBRoute)
+
+# Период отчетов по умолчанию и максимальная длина периода
+DEFAULT_PERIOD = timedelta(days=30)
+MAX_PERIOD = timedelta(days=366 * 2)
+
+# Pydantic schemas for analytics
+class BookLoans(BaseModel):
+    book_id: int
+    title: Optional[str]
+    loans: int
+
+class GenreDay(BaseModel):
+    day: date
+    genre_id: int
+    name: Optional[str]
+    loans: int
+
+class ReadersWeek(BaseModel):
+    week: date
+    active_readers: int
+
+# Период отчета: по умолчанию последние 30 дней
+def report_period(date_from: Optional[date] = None, date_to: Optional[date] = None):
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - DEFAULT_PERIOD
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if date_to - date_from > MAX_PERIOD:
+        raise HTTPException(status_code=400, detail="Period is too long")
+    return date_from, date_to
+
+# Все отчеты читаются из дневных агрегатов, а не из таблицы займов
+@router.get("/top-books", response_model=List[BookLoans])
+async def top_books(
+    period: tuple = Depends(report_period),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    loans = func.sum(BookLoanDaily.loans).label("loans")
+    top = (
+        select(BookLoanDaily.book_id, loans)
+        .where(BookLoanDaily.day.between(*period))
+        .group_by(BookLoanDaily.book_id)
+        .having(loans > 0)
+        .order_by(loans.desc(), BookLoanDaily.book_id)
+        .limit(limit)
+        .subquery()
+    )
+    result = await db.execute(
+        select(top.c.book_id, BookCard.title, top.c.loans)
+        .outerjoin(BookCard, BookCard.id == top.c.book_id)
+        .order_by(top.c.loans.desc(), top.c.book_id)
+    )
+    return result.mappings().all()
+
+@router.get("/genres/daily", response_model=List[GenreDay])
+async def genre_loans_daily(
+    period: tuple = Depends(report_period),
+    genre_id: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    query = (
+        select(GenreLoanDaily.day, GenreLoanDaily.genre_id, Genre.name, GenreLoanDaily.loans)
+        .outerjoin(Genre, Genre.id == GenreLoanDaily.genre_id)
+        .where(GenreLoanDaily.day.between(*period))
+        .order_by(GenreLoanDaily.day, GenreLoanDaily.genre_id)
+    )
+    if genre_id:
+        query = query.where(GenreLoanDaily.genre_id.in_(genre_id))
+    result = await db.execute(query)
+    return result.mappings().all()
+
+@router.get("/readers/weekly", response_model=List[ReadersWeek])
+async def active_readers_weekly(
+    period: tuple = Depends(report_period),
+    db: AsyncSession = Depends(get_read_db),
+):
+    date_from, date_to = period
+    result = await db.execute(
+        select(ReaderWeekActivity.week, func.count().label("active_readers"))
+        .where(ReaderWeekActivity.week.between(date_from - timedelta(days=date_from.weekday()), date_to))
+        .group_by(ReaderWeekActivity.week)
+        .order_by(ReaderWeekActivity.week)
+    )
+    return result.mappings().all()
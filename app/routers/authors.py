@@ -1,29 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Author
-from app.database import SessionLocal
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import Author, book_author
+from app.database import DBRoute, get_db
+from app.replicas import get_read_db
+from app.queries import AUTHOR_ID_BY_NAME
+from app.pagination import NEXT_CURSOR_HEADER, paginate, next_cursor
+from app.search import index_books
+from app.cards import refresh_cards
+from app.autocomplete import AUTHOR, autocomplete_index
+from app.etag import bump_book_versions, check_if_match, current_version, etag_matches, make_etag
+from datetime import date
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-router = APIRouter()
-
-# Dependency
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+router = APIRouter(route_class=DBRoute)
 
 # Pydantic schema for Author
 class AuthorCreate(BaseModel):
     name: str
     biography: str | None
-    birth_date: str | None
+    birth_date: date | None
 
 class AuthorRead(BaseModel):
     id: int
     name: str
     biography: str | None
-    birth_date: str | None
+    birth_date: date | None
 
     class Config:
         orm_mode = True
@@ -31,8 +36,7 @@ class AuthorRead(BaseModel):
 @router.post("/", response_model=AuthorRead)
 async def create_author(author: AuthorCreate, db: AsyncSession = Depends(get_db)):
     # Проверка, существует ли автор с таким же именем
-    existing_author = await db.execute(select(Author).where(Author.name == author.name))
-    if existing_author.scalars().first():
+    if await db.scalar(AUTHOR_ID_BY_NAME, {"name": author.name}) is not None:
         raise HTTPException(status_code=400, detail="Author already exists")
 
     # Создание нового автора
@@ -44,28 +48,57 @@ async def create_author(author: AuthorCreate, db: AsyncSession = Depends(get_db)
     db.add(new_author)
     await db.commit()
     await db.refresh(new_author)
+    autocomplete_index.add(AUTHOR, new_author.id, new_author.name)
     return new_author
 
 @router.get("/", response_model=List[AuthorRead])
-async def get_authors(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Author).offset(skip).limit(limit))
+async def get_authors(
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result = await db.execute(paginate(select(Author), [Author.id], cursor, limit, skip))
     authors = result.scalars().all()
+    cursor = next_cursor(authors, ["id"], limit, skip)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return authors
 
 @router.get("/{author_id}", response_model=AuthorRead)
-async def get_author(author_id: int, db: AsyncSession = Depends(get_db)):
+async def get_author(
+    author_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Условный запрос: при совпадении версии автор не загружается
+    if if_none_match:
+        version = await current_version(db, Author, author_id)
+        if version is not None and etag_matches(if_none_match, make_etag(version)):
+            return Response(status_code=304, headers={"ETag": make_etag(version)})
+
     # Получаем автора по ID
     author = await db.get(Author, author_id)
     if not author:
         raise HTTPException(status_code=404, detail="Author not found")
+    response.headers["ETag"] = make_etag(author.version)
     return author
 
 @router.put("/{author_id}", response_model=AuthorRead)
-async def update_author(author_id: int, author: AuthorCreate, db: AsyncSession = Depends(get_db)):
+async def update_author(
+    author_id: int,
+    author: AuthorCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
     # Получаем автора по ID
     db_author = await db.get(Author, author_id)
     if not db_author:
         raise HTTPException(status_code=404, detail="Author not found")
+    check_if_match(if_match, db_author.version)
 
     # Обновляем информацию об авторе
     db_author.name = author.name
@@ -73,18 +106,35 @@ async def update_author(author_id: int, author: AuthorCreate, db: AsyncSession =
     db_author.birth_date = author.birth_date
 
     db.add(db_author)
+    try:
+        await db.flush()
+    except StaleDataError:
+        raise HTTPException(status_code=412, detail="Precondition failed")
+    # Имя автора входит в карточки и поисковые данные его книг
+    book_ids = select(book_author.c.book_id).where(book_author.c.author_id == author_id)
+    await index_books(db, book_ids)
+    await bump_book_versions(db, book_ids)
+    await refresh_cards(db, book_ids)
     await db.commit()
     await db.refresh(db_author)
+    autocomplete_index.add(AUTHOR, author_id, db_author.name)
+    response.headers["ETag"] = make_etag(db_author.version)
     return db_author
 
 @router.delete("/{author_id}")
 async def delete_author(author_id: int, db: AsyncSession = Depends(get_db)):
-    # Получаем автора по ID
-    db_author = await db.get(Author, author_id)
+    # Получаем автора по ID вместе с его книгами
+    db_author = await db.get(Author, author_id, options=[selectinload(Author.books)])
     if not db_author:
         raise HTTPException(status_code=404, detail="Author not found")
+    book_ids = [book.id for book in db_author.books]
 
     # Удаляем автора
     await db.delete(db_author)
+    await db.flush()
+    await index_books(db, book_ids)
+    await bump_book_versions(db, book_ids)
+    await refresh_cards(db, book_ids)
     await db.commit()
+    autocomplete_index.remove(AUTHOR, author_id)
     return {"message": "Author deleted successfully"}
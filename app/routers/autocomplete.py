@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query
+from pydantic import BaseModel
+from typing import List, Optional
+from app.autocomplete import autocomplete_index
+
+router = APIRouter()
+
+# Pydantic schema for Suggestion
+class Suggestion(BaseModel):
+    type: str
+    id: int
+    text: str
+
+class IndexStats(BaseModel):
+    entities: int
+    keys: int
+    key_chars: int
+    ref_bytes: int
+    truncated: bool
+    built_at: Optional[float]
+    age_seconds: Optional[float]
+    last_update_seconds_ago: Optional[float]
+
+# Подсказки отдаются из памяти процесса, без обращения к базе данных
+@router.get("/", response_model=List[Suggestion])
+def autocomplete(prefix: str = Query(..., min_length=1, max_length=100), limit: int = Query(10, ge=1, le=50)):
+    return autocomplete_index.complete(prefix, limit)
+
+@router.get("/stats", response_model=IndexStats)
+def autocomplete_stats():
+    return autocomplete_index.stats()
@@ -1,23 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Book, Author, Genre
-from app.database import SessionLocal
-from pydantic import BaseModel
-from typing import List
-
-router = APIRouter()
-
-# Dependency
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import Book, BookCard
+from app.circulation import cancel_hold, place_hold
+from app.database import DBRoute, get_db
+from app.replicas import get_read_db
+from app import crud
+from app.crud import BOOK_READ_OPTIONS
+from app.queries import AUTHORS_BY_IDS, GENRES_BY_IDS
+from app.bulk import import_books, iter_lines
+from app.export import BOOKS_EXPORT_QUERY, export_response
+from app.cards import delete_cards, refresh_cards
+from app.autocomplete import BOOK, autocomplete_index
+from app.etag import check_if_match, current_version, etag_matches, make_etag
+from app.facets import book_filters, facet_counts, parse_facets
+from app.search import RANK, index_books, search_books, unindex_books
+from app.pagination import NEXT_CURSOR_HEADER, paginate, next_cursor, encode_cursor, decode_cursor
+from pydantic import BaseModel, field_validator
+from datetime import date, datetime
+from typing import List, Optional
+
+router = APIRouter(route_class=DBRoute)
 
 # Pydantic schema for Book
 class BookCreate(BaseModel):
     title: str
     description: str | None
-    publication_date: str
+    publication_date: date
     author_ids: List[int]
     genre_ids: List[int]
     available_copies: int
@@ -26,69 +37,159 @@ class BookRead(BaseModel):
     id: int
     title: str
     description: str | None
-    publication_date: str
+    publication_date: date
     authors: List[str]
     genres: List[str]
     available_copies: int
 
+    # Связанные авторы и жанры отдаются списком имен
+    @field_validator("authors", "genres", mode="before")
+    @classmethod
+    def names(cls, value):
+        return [getattr(item, "name", item) for item in value]
+
     class Config:
         orm_mode = True
 
-@router.post("/", response_model=BookRead)
-async def create_book(book: BookCreate, db: AsyncSession = Depends(get_db)):
-    authors = await db.execute(select(Author).where(Author.id.in_(book.author_ids)))
-    authors = authors.scalars().all()
-    if len(authors) != len(book.author_ids):
-        raise HTTPException(status_code=400, detail="One or more authors not found")
+class BulkImportError(BaseModel):
+    line: int
+    detail: str
 
-    genres = await db.execute(select(Genre).where(Genre.id.in_(book.genre_ids)))
-    genres = genres.scalars().all()
-    if len(genres) != len(book.genre_ids):
-        raise HTTPException(status_code=400, detail="One or more genres not found")
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
 
-    new_book = Book(
-        title=book.title,
-        description=book.description,
-        publication_date=book.publication_date,
-        available_copies=book.available_copies,
-    )
+@router.post("/", response_model=BookRead)
+async def create_book(book: BookCreate, db: AsyncSession = Depends(get_db)):
+    return await crud.create_book(book, db)
 
-    new_book.authors.extend(authors)
-    new_book.genres.extend(genres)
+class HoldCreate(BaseModel):
+    reader_id: int
 
-    db.add(new_book)
-    await db.commit()
-    await db.refresh(new_book)
+class HoldRead(BaseModel):
+    id: int
+    book_id: int
+    reader_id: int
+    status: str
+    created_at: datetime
+    ready_at: datetime | None
+    expires_at: datetime | None
+    position: Optional[int] = None
 
-    return new_book
+    class Config:
+        from_attributes = True
+
+# Допустимые ключи сортировки списка книг (первичный ключ добавляется для однозначности)
+BOOK_SORT_KEYS = {
+    "id": ["id"],
+    "title": ["title", "id"],
+    "publication_date": ["publication_date", "id"],
+}
+
+# Потоковый импорт книг в формате NDJSON или CSV (первая строка CSV - заголовок)
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    return await import_books(db, iter_lines(request.stream()), fmt)
 
 @router.get("/", response_model=List[BookRead])
-async def get_books(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Book).offset(skip).limit(limit))
+async def get_books(
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    sort: str = Query("id", pattern="^(id|title|publication_date)$"),
+    filters: list = Depends(book_filters),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Список читается из денормализованных карточек без соединений
+    attributes = BOOK_SORT_KEYS[sort]
+    columns = [getattr(BookCard, attribute) for attribute in attributes]
+    query = select(BookCard).where(*filters)
+    result = await db.execute(paginate(query, columns, cursor, limit, skip))
     books = result.scalars().all()
+    cursor = next_cursor(books, attributes, limit, skip)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return books
 
+# Количество книг по жанрам, авторам и годам с учетом тех же фильтров, что и у списка
+@router.get("/facets")
+async def get_facets(
+    facets: str = "genre,author,year",
+    filters: list = Depends(book_filters),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await facet_counts(db, filters, parse_facets(facets))
+
+# Потоковая выгрузка всего каталога
+@router.get("/export")
+async def export_books(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    columns = ["id", "title", "description", "publication_date", "available_copies", "authors", "genres"]
+    return export_response(BOOKS_EXPORT_QUERY, columns, format, "books")
+
+# Полнотекстовый поиск по названию, описанию и именам авторов с ранжированием
+@router.get("/search", response_model=List[BookRead])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    after = decode_cursor(cursor, [RANK, Book.id]) if cursor else None
+    hits = await search_books(db, q, limit, after)
+    if not hits:
+        return []
+    result = await db.execute(select(BookCard).where(BookCard.id.in_([book_id for _, book_id in hits])))
+    books = {book.id: book for book in result.scalars()}
+    if len(hits) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(list(hits[-1]))
+    return [books[book_id] for _, book_id in hits if book_id in books]
+
 @router.get("/{book_id}", response_model=BookRead)
-async def get_book(book_id: int, db: AsyncSession = Depends(get_db)):
-    book = await db.get(Book, book_id)
+async def get_book(
+    book_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Условный запрос: при совпадении версии книга не загружается и не сериализуется
+    if if_none_match:
+        version = await current_version(db, Book, book_id)
+        if version is not None and etag_matches(if_none_match, make_etag(version)):
+            return Response(status_code=304, headers={"ETag": make_etag(version)})
+
+    book = await db.get(BookCard, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    response.headers["ETag"] = make_etag(book.version)
     return book
 
 @router.put("/{book_id}", response_model=BookRead)
-async def update_book(book_id: int, book: BookCreate, db: AsyncSession = Depends(get_db)):
-    db_book = await db.get(Book, book_id)
+async def update_book(
+    book_id: int,
+    book: BookCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    db_book = await db.get(Book, book_id, options=BOOK_READ_OPTIONS)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
+    check_if_match(if_match, db_book.version)
 
-    authors = await db.execute(select(Author).where(Author.id.in_(book.author_ids)))
-    authors = authors.scalars().all()
+    authors = (await db.scalars(AUTHORS_BY_IDS, {"ids": book.author_ids})).all()
     if len(authors) != len(book.author_ids):
         raise HTTPException(status_code=400, detail="One or more authors not found")
 
-    genres = await db.execute(select(Genre).where(Genre.id.in_(book.genre_ids)))
-    genres = genres.scalars().all()
+    genres = (await db.scalars(GENRES_BY_IDS, {"ids": book.genre_ids})).all()
     if len(genres) != len(book.genre_ids):
         raise HTTPException(status_code=400, detail="One or more genres not found")
 
@@ -102,20 +203,43 @@ async def update_book(book_id: int, book: BookCreate, db: AsyncSession = Depends
 
     db_book.genres.clear()
     db_book.genres.extend(genres)
+    # Версия увеличивается, даже если изменились только связи
+    flag_modified(db_book, "title")
 
     db.add(db_book)
+    try:
+        await db.flush()
+    except StaleDataError:
+        raise HTTPException(status_code=412, detail="Precondition failed")
+    await index_books(db, [book_id])
+    await refresh_cards(db, [book_id])
     await db.commit()
-    await db.refresh(db_book)
+    autocomplete_index.add(BOOK, book_id, db_book.title)
 
+    response.headers["ETag"] = make_etag(db_book.version)
     return db_book
 
 @router.delete("/{book_id}")
 async def delete_book(book_id: int, db: AsyncSession = Depends(get_db)):
-    db_book = await db.get(Book, book_id)
+    db_book = await db.get(Book, book_id, options=BOOK_READ_OPTIONS)
     if not db_book:
         raise HTTPException(status_code=404, detail="Book not found")
 
+    await delete_cards(db, [book_id])
     await db.delete(db_book)
     await db.commit()
+    unindex_books([book_id])
+    autocomplete_index.remove(BOOK, book_id)
 
     return {"message": "Book deleted successfully"}
+
+# Бронирование книги без свободных экземпляров; о готовности читатель узнает
+# из потока событий GET /readers/{reader_id}/events
+@router.post("/{book_id}/holds", response_model=HoldRead, status_code=201)
+async def create_hold(book_id: int, hold: HoldCreate, db: AsyncSession = Depends(get_db)):
+    new_hold, position = await place_hold(db, book_id, hold.reader_id)
+    return HoldRead.model_validate(new_hold).model_copy(update={"position": position})
+
+@router.delete("/{book_id}/holds/{hold_id}", response_model=HoldRead)
+async def delete_hold(book_id: int, hold_id: int, db: AsyncSession = Depends(get_db)):
+    return await cancel_hold(db, book_id, hold_id)
@@ -0,0 +1,90 @@
+from fastapi import APIRouter
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from app.auth import password_hasher, principal_cache
+from app.database import pool_stats
+from app.replicas import replica_router
+
+router = APIRouter()
+
+# Pydantic schema for password hasher metrics
+class PasswordHasherStats(BaseModel):
+    workers: int
+    rounds: int
+    in_flight: int
+    queue_depth: int
+    max_queue_depth: int
+    max_queue: int
+    completed: int
+    rejected: int
+    avg_wait_ms: float
+    avg_hash_ms: float
+
+# Состояние пула хеширования паролей
+@router.get("/password-hasher", response_model=PasswordHasherStats)
+def password_hasher_stats():
+    return password_hasher.stats()
+
+class PrincipalCacheStats(BaseModel):
+    size: int
+    max_size: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+    revoked_tokens: int
+    revoked_readers: int
+
+# Счетчики кэша аутентифицированных пользователей
+@router.get("/principal-cache", response_model=PrincipalCacheStats)
+def principal_cache_stats():
+    return principal_cache.stats()
+
+class LatencyStats(BaseModel):
+    count: int
+    avg_ms: float
+    max_ms: float
+    buckets: Dict[str, int]
+
+class RequestStats(BaseModel):
+    count: int
+    avg_checkouts: float
+    hold: LatencyStats
+
+class PoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    timeout_seconds: float
+    timeouts: int
+    wait: LatencyStats
+    hold: LatencyStats
+    requests: RequestStats
+
+# Состояние пула соединений: занятые соединения, переполнение, гистограммы ожидания
+# соединения и времени его удержания, число соединений и время их удержания на запрос
+@router.get("/pool", response_model=PoolStats)
+def pool_statistics():
+    return pool_stats()
+
+class ReplicaState(BaseModel):
+    url: str
+    lag_seconds: Optional[float]
+    healthy: bool
+
+class ReplicaStats(BaseModel):
+    replicas: List[ReplicaState]
+    max_lag_seconds: float
+    sticky_seconds: float
+    sticky_clients: int
+    primary_reads: int
+    replica_reads: int
+
+# Отставание реплик и распределение чтений между основным сервером и репликами
+@router.get("/replicas", response_model=ReplicaStats)
+def replica_statistics():
+    return replica_router.stats()
@@ -1,17 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Genre
-from app.database import SessionLocal
+from app.models import Genre, book_genre
+from app.database import DBRoute, get_db
+from app.replicas import get_read_db
+from app.queries import GENRE_ID_BY_NAME, OTHER_GENRE_ID_BY_NAME
+from app.pagination import NEXT_CURSOR_HEADER, paginate, next_cursor
+from app.cards import refresh_cards
+from app.etag import bump_book_versions
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-router = APIRouter()
-
-# Dependency
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+router = APIRouter(route_class=DBRoute)
 
 # Pydantic schema for Genre
 class GenreCreate(BaseModel):
@@ -26,8 +26,7 @@ class GenreRead(BaseModel):
 
 @router.post("/", response_model=GenreRead)
 async def create_genre(genre: GenreCreate, db: AsyncSession = Depends(get_db)):
-    existing_genre = await db.execute(select(Genre).where(Genre.name == genre.name))
-    if existing_genre.scalars().first():
+    if await db.scalar(GENRE_ID_BY_NAME, {"name": genre.name}) is not None:
         raise HTTPException(status_code=400, detail="Genre already exists")
 
     new_genre = Genre(name=genre.name)
@@ -37,7 +36,34 @@ async def create_genre(genre: GenreCreate, db: AsyncSession = Depends(get_db)):
     return new_genre
 
 @router.get("/", response_model=List[GenreRead])
-async def get_genres(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Genre).offset(skip).limit(limit))
+async def get_genres(
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result = await db.execute(paginate(select(Genre), [Genre.id], cursor, limit, skip))
     genres = result.scalars().all()
+    cursor = next_cursor(genres, ["id"], limit, skip)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return genres
+
+@router.put("/{genre_id}", response_model=GenreRead)
+async def update_genre(genre_id: int, genre: GenreCreate, db: AsyncSession = Depends(get_db)):
+    db_genre = await db.get(Genre, genre_id)
+    if not db_genre:
+        raise HTTPException(status_code=404, detail="Genre not found")
+
+    if await db.scalar(OTHER_GENRE_ID_BY_NAME, {"name": genre.name, "genre_id": genre_id}) is not None:
+        raise HTTPException(status_code=400, detail="Genre already exists")
+
+    db_genre.name = genre.name
+    await db.flush()
+    # Название жанра входит в карточки его книг
+    book_ids = select(book_genre.c.book_id).where(book_genre.c.genre_id == genre_id)
+    await bump_book_versions(db, book_ids)
+    await refresh_cards(db, book_ids)
+    await db.commit()
+    return db_genre
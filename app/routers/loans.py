@@ -1,18 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import union_all
 from sqlalchemy.future import select
-from app.models import Loan, Book, Reader
-from app.database import SessionLocal
-from pydantic import BaseModel
-from datetime import date, timedelta
-from typing import List
-
-router = APIRouter()
-
-# Dependency
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+from app.models import Loan, LoanArchive
+from app.archive import ARCHIVE_COLUMNS
+from app.database import DBRoute, get_db
+from app.replicas import get_read_db
+from app.pagination import NEXT_CURSOR_HEADER, paginate, next_cursor
+from app.export import export_response
+from app.circulation import checkout, checkout_batch, return_batch
+from app.overdue import overdue_clauses
+from pydantic import BaseModel, Field
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+router = APIRouter(route_class=DBRoute)
 
 # Pydantic schema for Loan
 class LoanCreate(BaseModel):
@@ -24,70 +27,103 @@ class LoanRead(BaseModel):
     book_id: int
     reader_id: int
     loan_date: date
+    due_date: date | None
     return_date: date | None
+    fine: Decimal
 
     class Config:
         orm_mode = True
 
+class OverdueLoanRead(LoanRead):
+    days_overdue: int
+
+class BatchCheckout(BaseModel):
+    reader_id: int
+    book_ids: List[int] = Field(..., min_length=1, max_length=20)
+
+class BatchCheckoutItem(BaseModel):
+    book_id: int
+    loan: LoanRead | None
+    error: str | None
+
+class BatchReturn(BaseModel):
+    loan_ids: List[int] = Field(..., min_length=1, max_length=20)
+
+class BatchReturnItem(BaseModel):
+    loan_id: int
+    loan: LoanRead | None
+    error: str | None
+
 @router.post("/", response_model=LoanRead)
 async def create_loan(loan: LoanCreate, db: AsyncSession = Depends(get_db)):
-    # Проверка доступных экземпляров книги
-    book = await db.get(Book, loan.book_id)
-    if not book or book.available_copies < 1:
-        raise HTTPException(status_code=400, detail="Book is not available")
-
-    # Проверка лимита активных займов у читателя
-    active_loans_query = select(Loan).where(Loan.reader_id == loan.reader_id, Loan.return_date == None)
-    result = await db.execute(active_loans_query)
-    active_loans = result.scalars().all()
-    if len(active_loans) >= 5:
-        raise HTTPException(status_code=400, detail="Reader has reached the maximum number of active loans")
-
-    # Проверка существования читателя
-    reader = await db.get(Reader, loan.reader_id)
-    if not reader:
-        raise HTTPException(status_code=404, detail="Reader not found")
-
-    # Создание займа
-    new_loan = Loan(
-        book_id=loan.book_id,
-        reader_id=loan.reader_id,
-        loan_date=date.today(),
-        return_date=None,
-    )
-    book.available_copies -= 1
-    db.add(new_loan)
-    await db.commit()
-    await db.refresh(new_loan)
-
-    # Установка предполагаемой даты возврата книги через 14 дней
-    due_date = date.today() + timedelta(days=14)
-    new_loan.return_date = due_date
-
-    await db.commit()
-    await db.refresh(new_loan)
-
-    return new_loan
+    # Выдача выполняется одним условным UPDATE и одной фиксацией транзакции
+    return await checkout(db, loan.book_id, loan.reader_id)
 
 @router.post("/{loan_id}/return", response_model=LoanRead)
 async def return_loan(loan_id: int, db: AsyncSession = Depends(get_db)):
-    loan = await db.get(Loan, loan_id)
-    if not loan or loan.return_date is not None:
-        raise HTTPException(status_code=400, detail="Invalid loan ID or loan already returned")
+    [result] = await return_batch(db, [loan_id])
+    if result["error"]:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result["loan"]
 
-    # Возврат книги
-    loan.return_date = date.today()
-    book = await db.get(Book, loan.book_id)
-    if book:
-        book.available_copies += 1
+# Выдача нескольких книг читателю в одной транзакции с результатом по каждой книге
+@router.post("/batch", response_model=List[BatchCheckoutItem])
+async def create_loans_batch(batch: BatchCheckout, db: AsyncSession = Depends(get_db)):
+    return await checkout_batch(db, batch.reader_id, batch.book_ids)
 
-    await db.commit()
-    await db.refresh(loan)
-    return loan
+# Возврат нескольких займов в одной транзакции с результатом по каждому займу
+@router.post("/batch-return", response_model=List[BatchReturnItem])
+async def return_loans_batch(batch: BatchReturn, db: AsyncSession = Depends(get_db)):
+    return await return_batch(db, batch.loan_ids)
 
 @router.get("/", response_model=List[LoanRead])
-async def get_loans(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Loan).offset(skip).limit(limit))
-    loans = result.scalars().all()
+async def get_loans(
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    include_archived: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+):
+    # По умолчанию читается только основная таблица; архив подключается явно
+    if include_archived:
+        columns = [getattr(Loan, column) for column in ARCHIVE_COLUMNS]
+        archived = [getattr(LoanArchive, column) for column in ARCHIVE_COLUMNS]
+        loans_union = union_all(select(*columns), select(*archived)).subquery()
+        result = await db.execute(paginate(select(loans_union), [loans_union.c.id], cursor, limit, skip))
+        loans = result.all()
+    else:
+        result = await db.execute(paginate(select(Loan), [Loan.id], cursor, limit, skip))
+        loans = result.scalars().all()
+    cursor = next_cursor(loans, ["id"], limit, skip)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return loans
 
+# Просроченные невозвращенные займы в порядке срока возврата
+@router.get("/overdue", response_model=List[OverdueLoanRead])
+async def get_overdue_loans(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    today = date.today()
+    query = select(Loan).where(*overdue_clauses(today))
+    result = await db.execute(paginate(query, [Loan.due_date, Loan.id], cursor, limit))
+    loans = result.scalars().all()
+    cursor = next_cursor(loans, ["due_date", "id"], limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return [
+        {**LoanRead.model_validate(loan, from_attributes=True).model_dump(), "days_overdue": (today - loan.due_date).days}
+        for loan in loans
+    ]
+
+# Потоковая выгрузка займов
+LOANS_EXPORT_COLUMNS = ["id", "book_id", "reader_id", "loan_date", "due_date", "return_date", "fine"]
+
+@router.get("/export")
+async def export_loans(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    query = select(*[getattr(Loan, column) for column in LOANS_EXPORT_COLUMNS]).order_by(Loan.id)
+    return export_response(query, LOANS_EXPORT_COLUMNS, format, "loans")
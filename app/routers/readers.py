@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.models import Reader
-from app.database import SessionLocal
+from app.models import Hold, Reader
+from app.circulation import HOLD_READY, hold_ready_event
+from app.events import broker, sse_stream
+from app.auth import hash_password
+from app.database import DBRoute, get_db
+from app.replicas import get_read_db
+from app.queries import READER_ID_BY_EMAIL
+from app.pagination import NEXT_CURSOR_HEADER, paginate, next_cursor
+from app.export import export_response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-router = APIRouter()
-
-# Dependency
-async def get_db():
-    async with SessionLocal() as session:
-        yield session
+router = APIRouter(route_class=DBRoute)
 
 # Pydantic schema for Reader
 class ReaderCreate(BaseModel):
@@ -29,14 +32,13 @@ class ReaderRead(BaseModel):
 
 @router.post("/", response_model=ReaderRead)
 async def create_reader(reader: ReaderCreate, db: AsyncSession = Depends(get_db)):
-    existing_reader = await db.execute(select(Reader).where(Reader.email == reader.email))
-    if existing_reader.scalars().first():
+    if await db.scalar(READER_ID_BY_EMAIL, {"email": reader.email}) is not None:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     new_reader = Reader(
         name=reader.name,
         email=reader.email,
-        hashed_password=reader.password  # In production, hash this password
+        hashed_password=await hash_password(reader.password)
     )
     db.add(new_reader)
     await db.commit()
@@ -44,7 +46,46 @@ async def create_reader(reader: ReaderCreate, db: AsyncSession = Depends(get_db)
     return new_reader
 
 @router.get("/", response_model=List[ReaderRead])
-async def get_readers(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Reader).offset(skip).limit(limit))
+async def get_readers(
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result = await db.execute(paginate(select(Reader), [Reader.id], cursor, limit, skip))
     readers = result.scalars().all()
+    cursor = next_cursor(readers, ["id"], limit, skip)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return readers
+
+# Потоковая выгрузка читателей
+READERS_EXPORT_COLUMNS = ["id", "name", "email"]
+
+@router.get("/export")
+async def export_readers(format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    query = select(*[getattr(Reader, column) for column in READERS_EXPORT_COLUMNS]).order_by(Reader.id)
+    return export_response(query, READERS_EXPORT_COLUMNS, format, "readers")
+
+# Поток событий читателя (Server-Sent Events): готовность бронирований.
+# При подключении отправляются все уже готовые бронирования, затем новые события.
+# Подписка оформляется до чтения готовых бронирований, чтобы не пропустить событие между ними.
+@router.get("/{reader_id}/events")
+async def reader_events(reader_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    if await db.get(Reader, reader_id) is None:
+        raise HTTPException(status_code=404, detail="Reader not found")
+    queue = broker.subscribe(reader_id)
+    try:
+        result = await db.execute(
+            select(Hold).where(Hold.reader_id == reader_id, Hold.status == HOLD_READY).order_by(Hold.id)
+        )
+        initial = [hold_ready_event(hold) for hold in result.scalars()]
+    except BaseException:
+        broker.unsubscribe(reader_id, queue)
+        raise
+    return StreamingResponse(
+        sse_stream(reader_id, queue, initial, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from datetime import date
 from typing import List, Optional
 
@@ -34,6 +34,12 @@ class BookRead(BaseModel):
     authors: List[str]
     genres: List[str]
 
+    # Связанные авторы и жанры отдаются списком имен
+    @field_validator("authors", "genres", mode="before")
+    @classmethod
+    def names(cls, value):
+        return [getattr(item, "name", item) for item in value]
+
     class Config:
         orm_mode = True
 
@@ -0,0 +1,164 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Float, and_, column, func, literal_column, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Author, Book, book_author
+
+# Конфигурация полнотекстового поиска PostgreSQL (без стемминга, годится для любых языков)
+TS_CONFIG = literal_column("'simple'::regconfig")
+
+# Веса полей для встроенного индекса: название важнее авторов, авторы важнее описания
+TITLE_WEIGHT = 3
+AUTHOR_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+# Колонка релевантности, используемая для курсоров поиска
+RANK = column("rank", Float)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# Разбиение текста на нормализованные токены
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+# Встроенный инвертированный индекс для баз данных без tsvector (например, SQLite)
+class SearchIndex:
+    def __init__(self):
+        self.ready = False
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._tokens: Dict[int, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def add(self, book_id: int, title: str, description: Optional[str], author_names: Iterable[str]):
+        self.remove(book_id)
+        weights: Dict[str, int] = defaultdict(int)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for name in author_names:
+            for token in tokenize(name):
+                weights[token] += AUTHOR_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings[token][book_id] = weight
+        self._tokens[book_id] = set(weights)
+
+    def remove(self, book_id: int):
+        for token in self._tokens.pop(book_id, ()):
+            postings = self._postings[token]
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def clear(self):
+        self._postings.clear()
+        self._tokens.clear()
+        self.ready = False
+
+    # Поиск книг, содержащих все слова запроса; результат упорядочен по (релевантность desc, id)
+    def search(self, query: str, limit: int = 10, after: Optional[Tuple[float, int]] = None) -> List[Tuple[float, int]]:
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        postings = sorted((self._postings.get(token, {}) for token in tokens), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        hits = [(float(sum(posting[book_id] for posting in postings)), book_id) for book_id in candidates]
+        if after is not None:
+            score, last_id = after
+            hits = [hit for hit in hits if hit[0] < score or (hit[0] == score and hit[1] > last_id)]
+        hits.sort(key=lambda hit: (-hit[0], hit[1]))
+        return hits[:limit]
+
+
+# Глобальный экземпляр встроенного индекса
+search_index = SearchIndex()
+
+
+def is_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+# Выражение tsvector книги: название (A), имена авторов (B), описание (C)
+def search_document():
+    author_names = (
+        select(func.string_agg(Author.name, literal_column("' '")))
+        .join(book_author, book_author.c.author_id == Author.id)
+        .where(book_author.c.book_id == Book.id)
+        .scalar_subquery()
+    )
+    return (
+        func.setweight(func.to_tsvector(TS_CONFIG, func.coalesce(Book.title, "")), "A")
+        .op("||")(func.setweight(func.to_tsvector(TS_CONFIG, func.coalesce(author_names, "")), "B"))
+        .op("||")(func.setweight(func.to_tsvector(TS_CONFIG, func.coalesce(Book.description, "")), "C"))
+    )
+
+
+# Загрузка названий, описаний и имен авторов книг для встроенного индекса
+async def _load_documents(db: AsyncSession, book_ids=None):
+    books = select(Book.id, Book.title, Book.description)
+    names = select(book_author.c.book_id, Author.name).join(Author, Author.id == book_author.c.author_id)
+    if book_ids is not None:
+        books = books.where(Book.id.in_(book_ids))
+        names = names.where(book_author.c.book_id.in_(book_ids))
+    author_names = defaultdict(list)
+    for book_id, name in await db.execute(names):
+        author_names[book_id].append(name)
+    return [(row.id, row.title, row.description, author_names[row.id]) for row in await db.execute(books)]
+
+
+# Построение встроенного индекса одним проходом по каталогу
+async def build_search_index(db: AsyncSession):
+    search_index.clear()
+    for document in await _load_documents(db):
+        search_index.add(*document)
+    search_index.ready = True
+
+
+# Обновление поисковых данных книг в текущей транзакции.
+# book_ids - список идентификаторов или подзапрос, возвращающий их.
+async def index_books(db: AsyncSession, book_ids):
+    if is_postgres(db):
+        await db.execute(
+            update(Book)
+            .where(Book.id.in_(book_ids))
+            .values(search_vector=search_document())
+            .execution_options(synchronize_session=False)
+        )
+    elif search_index.ready:
+        for document in await _load_documents(db, book_ids):
+            search_index.add(*document)
+
+
+# Удаление книг из встроенного индекса
+def unindex_books(book_ids: Iterable[int]):
+    for book_id in book_ids:
+        search_index.remove(book_id)
+
+
+# Поиск книг с ранжированием; возвращает список пар (релевантность, id книги)
+async def search_books(db: AsyncSession, q: str, limit: int = 10, after: Optional[Tuple[float, int]] = None):
+    if not is_postgres(db):
+        if not search_index.ready:
+            await build_search_index(db)
+        return search_index.search(q, limit, after)
+
+    tsquery = func.websearch_to_tsquery(TS_CONFIG, q)
+    rank = func.ts_rank(Book.search_vector, tsquery, type_=Float)
+    query = select(rank.label("rank"), Book.id).where(Book.search_vector.op("@@")(tsquery))
+    if after is not None:
+        score, last_id = after
+        query = query.where(or_(rank < score, and_(rank == score, Book.id > last_id)))
+    result = await db.execute(query.order_by(rank.desc(), Book.id).limit(limit))
+    return [(row.rank, row.id) for row in result]
@@ -0,0 +1,380 @@
+# Генерация синтетической библиотеки для нагрузочных тестов и разработки:
+#   python -m app.seed --scale large --seed 42 --workers 8
+# Данные детерминированы: строки каждой порции зависят только от seed, таблицы и номера
+# порции, поэтому результат не зависит от числа процессов. Таблицы заполняются по фазам
+# в порядке внешних ключей (жанры, авторы -> книги и их связи -> читатели и их активные
+# займы -> история займов); порции одной фазы загружаются параллельно в отдельных
+# процессах: в PostgreSQL через COPY, в других базах - пакетными INSERT (executemany).
+# Популярность книг распределена по закону Ципфа: немногие книги выдаются часто.
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import lru_cache
+from multiprocessing import get_context
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import func, insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.analytics import BACKFILL_WORKERS, backfill
+from app.archive import ensure_partitions
+from app.auth import get_password_hash
+from app.cards import rebuild_cards
+from app.circulation import LOAN_PERIOD, MAX_ACTIVE_LOANS
+from app.config import settings
+from app.models import Author, Base, Book, Genre, Loan, Reader
+from app.search import index_books
+
+# Размеры наборов данных
+SCALES = {
+    "tiny": {"genres": 20, "authors": 200, "books": 2_000, "readers": 1_000, "loans": 10_000},
+    "small": {"genres": 50, "authors": 5_000, "books": 50_000, "readers": 20_000, "loans": 200_000},
+    "medium": {"genres": 100, "authors": 20_000, "books": 200_000, "readers": 100_000, "loans": 1_000_000},
+    "large": {"genres": 100, "authors": 100_000, "books": 1_000_000, "readers": 500_000, "loans": 10_000_000},
+}
+# Фазы загрузки в порядке внешних ключей
+PHASES = ("genres", "authors", "books", "readers", "loans")
+# Строк основной таблицы в одной порции (одна транзакция одного процесса)
+CHUNK_SIZE = 50_000
+# Строк в одном пакетном INSERT (не PostgreSQL)
+INSERT_BATCH_SIZE = 5_000
+# Показатель распределения Ципфа для популярности книг
+ZIPF_EXPONENT = 1.1
+# Глубина истории займов в днях
+HISTORY_DAYS = 730
+# Доля читателей с невозвращенными книгами
+ACTIVE_READERS_SHARE = 0.3
+# Пароль всех сгенерированных читателей (хешируется один раз)
+PASSWORD = "password"
+
+WORDS = np.array((
+    "river night garden stone winter shadow city glass silver empire storm house memory "
+    "light road forest war island song fire letter sea secret queen north time dream"
+).split())
+FIRST_NAMES = np.array("Anna Boris Clara David Elena Fedor Greta Hugo Irina Jonas Katya Leon Maria Nikolai Olga Pavel".split())
+LAST_NAMES = np.array("Adams Belov Carter Dumas Evans Frolov Grant Hardy Ivanov Jensen Kuznetsov Lewis Morozov Novak".split())
+
+BOOK_COLUMNS = ("id", "title", "description", "publication_date", "available_copies")
+READER_COLUMNS = ("id", "name", "email", "hashed_password", "active_loan_count")
+LOAN_COLUMNS = ("book_id", "reader_id", "loan_date", "due_date", "return_date")
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _engine(url: str):
+    return create_async_engine(url, poolclass=NullPool)
+
+
+def _rng(seed: int, phase: str, chunk: int) -> np.random.Generator:
+    return np.random.default_rng([seed, PHASES.index(phase), chunk])
+
+
+def _chunks(total: int, start: int = 1):
+    return [(first, min(first + CHUNK_SIZE, start + total)) for first in range(start, start + total, CHUNK_SIZE)]
+
+
+def _dates(today: date, days_ago: np.ndarray) -> list:
+    return (np.datetime64(today, "D") - days_ago.astype("timedelta64[D]")).tolist()
+
+
+def _phrases(rng: np.random.Generator, count: int, min_words: int, max_words: int) -> list:
+    words = WORDS[rng.integers(0, len(WORDS), size=(count, max_words))]
+    lengths = rng.integers(min_words, max_words + 1, size=count)
+    return [" ".join(row[:length]) for row, length in zip(words.tolist(), lengths.tolist())]
+
+
+# Накопленные вероятности Ципфа по рангам и соответствие ранга id книги
+# (перестановка, чтобы популярные книги не совпадали с первыми id)
+@lru_cache(maxsize=4)
+def book_popularity(seed: int, books: int):
+    weights = 1.0 / np.arange(1, books + 1, dtype=np.float64) ** ZIPF_EXPONENT
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    return cdf, np.random.default_rng([seed, len(PHASES)]).permutation(books) + 1
+
+
+def popular_books(rng: np.random.Generator, seed: int, books: int, count: int) -> np.ndarray:
+    cdf, book_ids = book_popularity(seed, books)
+    ranks = np.minimum(np.searchsorted(cdf, rng.random(count)), books - 1)
+    return book_ids[ranks]
+
+
+# Число экземпляров книг (по индексу id - 1); общее для всех порций
+@lru_cache(maxsize=4)
+def book_copies(seed: int, books: int) -> np.ndarray:
+    return np.random.default_rng([seed, len(PHASES) + 1]).integers(1, 6, books)
+
+
+# Невозвращенные займы всех читателей строятся один раз для всей базы, чтобы не нарушать
+# запас книг: пары (читатель, книга) не повторяются, и у книги займов не больше, чем
+# экземпляров. Возвращает id читателей (по возрастанию) и книг займов и число
+# невозвращенных займов по книгам (по индексу id - 1).
+@lru_cache(maxsize=4)
+def open_loans(seed: int, books: int, readers: int):
+    rng = np.random.default_rng([seed, len(PHASES) + 2])
+    active = np.where(rng.random(readers) < ACTIVE_READERS_SHARE, rng.integers(1, MAX_ACTIVE_LOANS, readers), 0)
+    reader_ids = np.repeat(np.arange(1, readers + 1, dtype=np.int64), active)
+    pairs = np.unique(reader_ids * (books + 1) + popular_books(rng, seed, books, len(reader_ids)))
+    reader_ids, book_ids = pairs // (books + 1), pairs % (books + 1)
+    # Займы книги сверх ее экземпляров отбрасываются (первыми займы получают читатели с меньшим id)
+    order = np.argsort(book_ids, kind="stable")
+    by_book = book_ids[order]
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order)) - np.searchsorted(by_book, by_book)
+    keep = rank < book_copies(seed, books)[book_ids - 1]
+    return reader_ids[keep], book_ids[keep], np.bincount(book_ids[keep] - 1, minlength=books)
+
+
+# Генераторы порций: {таблица: (столбцы, строки)} для id из [start, stop)
+def generate_genres(rng, start: int, stop: int, params: dict) -> dict:
+    return {"genres": (("id", "name"), [(i, f"Genre {i}") for i in range(start, stop)])}
+
+
+def generate_authors(rng, start: int, stop: int, params: dict) -> dict:
+    count = stop - start
+    first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), count)].tolist()
+    last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), count)].tolist()
+    return {"authors": (("id", "name"), [(i, f"{f} {l}") for i, f, l in zip(range(start, stop), first, last)])}
+
+
+def generate_books(rng, start: int, stop: int, params: dict) -> dict:
+    sizes = params["sizes"]
+    count = stop - start
+    ids = range(start, stop)
+    titles = [title.capitalize() for title in _phrases(rng, count, 2, 4)]
+    descriptions = _phrases(rng, count, 10, 20)
+    published = (np.datetime64("1950-01-01") + rng.integers(0, 365 * 75, count).astype("timedelta64[D]")).tolist()
+    # Свободные экземпляры - за вычетом невозвращенных займов, загружаемых с читателями
+    _, _, loaned = open_loans(params["seed"], sizes["books"], sizes["readers"])
+    available = (book_copies(params["seed"], sizes["books"])[start - 1:stop - 1] - loaned[start - 1:stop - 1]).tolist()
+    books = list(zip(ids, titles, descriptions, published, available))
+
+    # Один-два автора и один-три жанра на книгу
+    authors = rng.integers(1, sizes["authors"] + 1, size=(count, 2)).tolist()
+    author_counts = np.where(rng.random(count) < 0.2, 2, 1).tolist()
+    genres = rng.integers(1, sizes["genres"] + 1, size=(count, 3)).tolist()
+    genre_counts = rng.integers(1, 4, count).tolist()
+    book_authors = [
+        (book_id, author_id)
+        for book_id, row, n in zip(ids, authors, author_counts)
+        for author_id in sorted(set(row[:n]))
+    ]
+    book_genres = [
+        (book_id, genre_id)
+        for book_id, row, n in zip(ids, genres, genre_counts)
+        for genre_id in sorted(set(row[:n]))
+    ]
+    return {
+        "books": (BOOK_COLUMNS, books),
+        "book_author": (("book_id", "author_id"), book_authors),
+        "book_genre": (("book_id", "genre_id"), book_genres),
+    }
+
+
+# Читатели вместе с их невозвращенными займами (см. open_loans; не больше MAX_ACTIVE_LOANS - 1,
+# чтобы выдачи под нагрузкой были возможны); часть займов уже просрочена
+def generate_readers(rng, start: int, stop: int, params: dict) -> dict:
+    count = stop - start
+    ids = range(start, stop)
+    reader_ids, book_ids, _ = open_loans(params["seed"], params["sizes"]["books"], params["sizes"]["readers"])
+    first, last = np.searchsorted(reader_ids, [start, stop])
+    reader_ids, book_ids = reader_ids[first:last], book_ids[first:last]
+    active = np.bincount(reader_ids - start, minlength=count)
+    readers = [
+        (i, f"Reader {i}", f"reader{i}@example.com", params["hashed_password"], n)
+        for i, n in zip(ids, active.tolist())
+    ]
+    total = len(reader_ids)
+    days_ago = rng.integers(0, 2 * LOAN_PERIOD.days, total)
+    loans = list(zip(
+        book_ids.tolist(), reader_ids.tolist(),
+        _dates(params["today"], days_ago),
+        _dates(params["today"], days_ago - LOAN_PERIOD.days),
+        [None] * total,
+    ))
+    return {"readers": (READER_COLUMNS, readers), "loans": (LOAN_COLUMNS, loans)}
+
+
+# История возвращенных займов; start и stop - номера займов, а не id
+def generate_loans(rng, start: int, stop: int, params: dict) -> dict:
+    count = stop - start
+    sizes = params["sizes"]
+    book_ids = popular_books(rng, params["seed"], sizes["books"], count).tolist()
+    reader_ids = rng.integers(1, sizes["readers"] + 1, count).tolist()
+    days_ago = rng.integers(0, HISTORY_DAYS, count)
+    returned_ago = np.maximum(days_ago - rng.integers(1, 29, count), 0)
+    loans = list(zip(
+        book_ids, reader_ids,
+        _dates(params["today"], days_ago),
+        _dates(params["today"], days_ago - LOAN_PERIOD.days),
+        _dates(params["today"], returned_ago),
+    ))
+    return {"loans": (LOAN_COLUMNS, loans)}
+
+
+GENERATORS = {
+    "genres": generate_genres,
+    "authors": generate_authors,
+    "books": generate_books,
+    "readers": generate_readers,
+    "loans": generate_loans,
+}
+
+
+async def _write(url: str, tables: dict):
+    engine = _engine(url)
+    try:
+        async with engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                raw = (await conn.get_raw_connection()).driver_connection
+                async with raw.transaction():
+                    for name, (columns, rows) in tables.items():
+                        await raw.copy_records_to_table(name, records=rows, columns=list(columns))
+            else:
+                for name, (columns, rows) in tables.items():
+                    table = Base.metadata.tables[name]
+                    for first in range(0, len(rows), INSERT_BATCH_SIZE):
+                        batch = rows[first:first + INSERT_BATCH_SIZE]
+                        await conn.execute(insert(table), [dict(zip(columns, row)) for row in batch])
+                await conn.commit()
+    finally:
+        await engine.dispose()
+
+
+# Генерация и запись одной порции (выполняется в процессе-исполнителе)
+def load_chunk(url: str, phase: str, chunk: int, start: int, stop: int, params: dict) -> dict:
+    tables = GENERATORS[phase](_rng(params["seed"], phase, chunk), start, stop, params)
+    asyncio.run(_write(url, tables))
+    return {name: len(rows) for name, (_, rows) in tables.items()}
+
+
+async def _prepare(url: str, reset: bool) -> dict:
+    engine = _engine(url)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with engine.begin() as conn:
+            if reset:
+                await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with session_factory() as db:
+            # Годовые секции займов на всю глубину истории
+            today = date.today()
+            for year in range((today - timedelta(days=HISTORY_DAYS)).year, today.year + 1):
+                await ensure_partitions(db, date(year, 1, 1))
+            return {
+                model.__tablename__: await db.scalar(select(func.count()).select_from(model))
+                for model in (Genre, Author, Book, Reader, Loan)
+            }
+    finally:
+        await engine.dispose()
+
+
+# Создание схемы (при reset - после удаления всех таблиц) и текущее число строк в таблицах
+def prepare_database(url: str, reset: bool = False) -> dict:
+    return asyncio.run(_prepare(url, reset))
+
+
+# Производные данные: последовательности id после явно заданных ключей, статистика
+# планировщика, карточки книг, поисковые векторы и агрегаты аналитики
+async def _finish(url: str):
+    engine = _engine(url)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        if engine.dialect.name == "postgresql":
+            async with session_factory() as db:
+                for model in (Genre, Author, Book, Reader):
+                    table = model.__tablename__
+                    await db.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                    ))
+                await db.commit()
+        await rebuild_cards(session_factory)
+        if engine.dialect.name == "postgresql":
+            async with session_factory() as db:
+                last_id = 0
+                while True:
+                    ids = list(await db.scalars(select(Book.id).where(Book.id > last_id).order_by(Book.id).limit(CHUNK_SIZE)))
+                    if not ids:
+                        break
+                    await index_books(db, ids)
+                    await db.commit()
+                    last_id = ids[-1]
+        # SQLite не допускает параллельных писателей
+        await backfill(session_factory, BACKFILL_WORKERS if engine.dialect.name != "sqlite" else 1)
+        if engine.dialect.name == "postgresql":
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text("ANALYZE"))
+    finally:
+        await engine.dispose()
+
+
+# Заполнение пустой схемы (см. prepare_database). Возвращает число строк и время фаз.
+# SQLite допускает одного писателя, поэтому для нее порции загружаются в текущем процессе.
+def seed_database(url: str, sizes: dict, seed: int = 42, workers: Optional[int] = None, today: Optional[date] = None) -> dict:
+    workers = 1 if is_sqlite(url) else (workers or os.cpu_count())
+    params = {
+        "seed": seed,
+        "sizes": sizes,
+        "today": today or date.today(),
+        "hashed_password": get_password_hash(PASSWORD),
+    }
+    counts = {}
+    timings = {}
+    executor = ProcessPoolExecutor(workers, mp_context=get_context("spawn")) if workers > 1 else None
+    try:
+        for phase in PHASES:
+            started = time.perf_counter()
+            # Число займов включает невозвращенные, созданные вместе с читателями
+            total = sizes[phase] - counts.get("loans", 0) if phase == "loans" else sizes[phase]
+            tasks = [
+                (url, phase, chunk, start, stop, params)
+                for chunk, (start, stop) in enumerate(_chunks(max(total, 0)))
+            ]
+            if executor:
+                results = [future.result() for future in [executor.submit(load_chunk, *task) for task in tasks]]
+            else:
+                results = [load_chunk(*task) for task in tasks]
+            for result in results:
+                for name, rows in result.items():
+                    counts[name] = counts.get(name, 0) + rows
+            timings[phase] = round(time.perf_counter() - started, 2)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    started = time.perf_counter()
+    asyncio.run(_finish(url))
+    timings["derived"] = round(time.perf_counter() - started, 2)
+    return {"seed": seed, "workers": workers, "rows": counts, "seconds": timings}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Заполнение базы синтетической библиотекой")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--sizes", default="", help="переопределение размеров: books=1000,loans=5000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--reset", action="store_true", help="удалить все таблицы и данные перед заполнением")
+    args = parser.parse_args()
+
+    sizes = {**SCALES[args.scale], **{
+        name.strip(): int(count) for name, _, count in (item.partition("=") for item in args.sizes.split(",") if item)
+    }}
+    existing = prepare_database(args.database_url, args.reset)
+    if any(existing.values()):
+        raise SystemExit(f"Database is not empty ({existing}); use --reset to recreate it")
+    print(json.dumps(seed_database(args.database_url, sizes, args.seed, args.workers), indent=2))
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 # Настройка логгера
@@ -10,3 +11,16 @@ logger.addHandler(ch)
 
 def log_event(message: str):
     logger.info(message)
+
+
+# Периодический запуск фоновой задачи; ошибки записываются в лог и не останавливают цикл.
+# verbose=False - результат не записывается в лог (для частых задач)
+async def run_periodically(job, interval: float, name: str, verbose: bool = True):
+    while True:
+        try:
+            result = await job()
+            if verbose:
+                log_event(f"{name}: {result}")
+        except Exception:
+            logger.exception(f"{name} failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,92 @@
+"""Конкурентная выдача одной книги: проверка отсутствия перепродажи экземпляров.
+
+Запуск (нужна база PostgreSQL из app.database):
+    python -m benchmarks.checkout_contention --copies 200 --requests 2000 --rate 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.circulation import checkout
+from app.database import SessionLocal, init_db
+from app.models import Book, Loan, Reader
+
+
+async def prepare(copies: int, readers: int):
+    async with SessionLocal() as db:
+        book = Book(title="Contention benchmark", publication_date=date(2000, 1, 1), available_copies=copies)
+        suffix = int(time.time() * 1000)
+        reader_rows = [
+            Reader(name=f"Bench {i}", email=f"bench-{suffix}-{i}@example.com", hashed_password="x")
+            for i in range(readers)
+        ]
+        db.add(book)
+        db.add_all(reader_rows)
+        await db.commit()
+        return book.id, [reader.id for reader in reader_rows]
+
+
+async def one_checkout(book_id: int, reader_id: int, stats: dict):
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        try:
+            await checkout(db, book_id, reader_id)
+            stats["ok"] += 1
+        except HTTPException:
+            stats["rejected"] += 1
+        except Exception:
+            stats["errors"] += 1
+    stats["latencies"].append(time.perf_counter() - started)
+
+
+async def main(copies: int, requests: int, rate: float):
+    await init_db()
+    # Каждый читатель берет не больше одной книги, чтобы лимит займов не влиял на результат
+    book_id, reader_ids = await prepare(copies, requests)
+    stats = {"ok": 0, "rejected": 0, "errors": 0, "latencies": []}
+
+    started = time.perf_counter()
+    tasks = []
+    for i, reader_id in enumerate(reader_ids):
+        # Равномерная подача запросов с заданной частотой
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one_checkout(book_id, reader_id, stats)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    async with SessionLocal() as db:
+        available = await db.scalar(select(Book.available_copies).where(Book.id == book_id))
+        loans = await db.scalar(select(func.count()).select_from(Loan).where(Loan.book_id == book_id))
+
+    latencies = sorted(stats.pop("latencies"))
+    report = {
+        **stats,
+        "copies": copies,
+        "loans": loans,
+        "available_copies": available,
+        "oversold": loans > copies or available < 0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+    print(json.dumps(report, indent=2))
+    if report["oversold"] or loans != copies - available:
+        raise SystemExit("Inconsistent stock after concurrent checkouts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.copies, args.requests, args.rate))
@@ -0,0 +1,276 @@
+"""Сквозной нагрузочный тест HTTP API на синтетической библиотеке.
+
+База из DATABASE_URL заполняется детерминированным набором данных (app.seed),
+если в ней еще нет книг; существующие данные используются повторно (--reset пересоздает
+схему и данные). Затем несколько параллельных клиентов в течение заданного времени
+выполняют смесь операций:
+  browse   - GET /books/ (страницы каталога, переход по курсору),
+  detail   - GET /books/{id},
+  checkout - POST /loans/,
+  return   - POST /loans/{id}/return (займы, выданные во время теста),
+  signup   - POST /readers/.
+Без --base-url приложение вызывается в том же процессе через ASGI (без ограничения
+частоты запросов и фоновых задач), иначе - запущенный сервер по HTTP (база сервера
+должна совпадать с DATABASE_URL). Результат - JSON с пропускной способностью и
+p50/p95/p99 по каждому маршруту и метаданными (коммит, масштаб, seed, база), чтобы
+результаты разных коммитов можно было сравнивать.
+
+Запуск:
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m benchmarks.http_load --scale tiny --duration 20
+    python -m benchmarks.http_load --scale large --concurrency 64 --duration 120 --output results.json
+    python -m benchmarks.http_load --base-url http://localhost:8000 --mix browse=5,detail=5,checkout=1,return=1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+# Доли операций по умолчанию
+DEFAULT_MIX = "browse=40,detail=40,checkout=8,return=7,signup=5"
+OPERATIONS = ("browse", "detail", "checkout", "return", "signup")
+# Вероятность перехода на следующую страницу каталога вместо первой страницы
+NEXT_PAGE_PROBABILITY = 0.7
+PAGE_SIZE = 20
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name.strip()] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("Mix weights must be positive")
+    return mix
+
+
+def parse_sizes(value: str) -> dict:
+    return {name.strip(): int(count) for name, _, count in (item.partition("=") for item in value.split(","))}
+
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+class Recorder:
+    def __init__(self, record_after: float):
+        self.record_after = record_after
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def add(self, route: str, started: float, status):
+        if started >= self.record_after:
+            self.latencies[route].append(time.perf_counter() - started)
+            self.statuses[route][str(status)] += 1
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route, latencies in sorted(self.latencies.items()):
+            statuses = self.statuses[route]
+            routes[route] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / elapsed, 1),
+                **{outcome: sum(count for status, count in statuses.items() if classify(status) == outcome)
+                   for outcome in ("ok", "rejected", "errors")},
+                "statuses": dict(sorted(statuses.items())),
+                **latency_stats(latencies),
+            }
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        total = {
+            "requests": len(everything),
+            "rps": round(len(everything) / elapsed, 1),
+            "errors": sum(route["errors"] for route in routes.values()),
+            **latency_stats(everything),
+        }
+        return {"total": total, "routes": routes}
+
+
+# Ответы 4xx - ожидаемые отказы (нет экземпляров, лимит займов), 5xx и исключения - ошибки
+def classify(status: str) -> str:
+    if not status.isdigit() or int(status) >= 500:
+        return "errors"
+    return "rejected" if int(status) >= 400 else "ok"
+
+
+def latency_stats(latencies: list) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+    }
+
+
+class Worker:
+    def __init__(self, client, number: int, sizes: dict, recorder: Recorder, loans: list, seed: int, run_id: str):
+        self.client = client
+        self.number = number
+        self.sizes = sizes
+        self.recorder = recorder
+        # Займы, выданные во время теста, общие для всех клиентов (для возвратов)
+        self.loans = loans
+        self.rng = random.Random(f"{seed}-{number}")
+        self.run_id = run_id
+        self.cursor = None
+        self.signups = 0
+
+    async def call(self, route: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception as error:
+            self.recorder.add(route, started, type(error).__name__)
+            return None
+        self.recorder.add(route, started, response.status_code)
+        return response
+
+    async def browse(self):
+        params = {"limit": PAGE_SIZE}
+        if self.cursor and self.rng.random() < NEXT_PAGE_PROBABILITY:
+            params["cursor"] = self.cursor
+        response = await self.call("GET /books/", "GET", "/books/", params=params)
+        self.cursor = response.headers.get("x-next-cursor") if response is not None else None
+
+    async def detail(self):
+        await self.call("GET /books/{id}", "GET", f"/books/{self.rng.randint(1, self.sizes['books'])}")
+
+    async def checkout(self):
+        payload = {"book_id": self.rng.randint(1, self.sizes["books"]), "reader_id": self.rng.randint(1, self.sizes["readers"])}
+        response = await self.call("POST /loans/", "POST", "/loans/", json=payload)
+        if response is not None and response.status_code == 200:
+            self.loans.append(response.json()["id"])
+
+    async def return_loan(self):
+        if not self.loans:
+            return await self.checkout()
+        loan_id = self.loans.pop(self.rng.randrange(len(self.loans)))
+        await self.call("POST /loans/{id}/return", "POST", f"/loans/{loan_id}/return")
+
+    async def signup(self):
+        self.signups += 1
+        name = f"bench-{self.run_id}-{self.number}-{self.signups}"
+        await self.call("POST /readers/", "POST", "/readers/",
+                        json={"name": name, "email": f"{name}@example.com", "password": "password"})
+
+    async def run(self, mix: dict, deadline: float):
+        operations = {
+            "browse": self.browse, "detail": self.detail, "checkout": self.checkout,
+            "return": self.return_loan, "signup": self.signup,
+        }
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await operations[self.rng.choices(names, weights)[0]]()
+
+
+# Заполнение базы, если в ней еще нет книг (или при --reset); возвращает число строк
+def prepare(args) -> dict:
+    from app.config import settings
+    from app.seed import prepare_database, seed_database
+
+    counts = prepare_database(settings.DATABASE_URL, args.reset)
+    if counts["books"] == 0:
+        report = seed_database(settings.DATABASE_URL, args.sizes, args.seed, args.workers)
+        print(f"Seeded {report['rows']} in {sum(report['seconds'].values()):.1f}s", flush=True)
+        counts = prepare_database(settings.DATABASE_URL)
+    return counts
+
+
+async def main(args, counts: dict) -> dict:
+    import httpx
+
+    from app.database import engine
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    else:
+        from app.auth import password_hasher
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+
+    # Запросы выбирают id из фактических размеров таблиц
+    sizes = {"books": counts["books"], "readers": counts["readers"]}
+    started = time.perf_counter()
+    recorder = Recorder(started + args.warmup)
+    deadline = started + args.warmup + args.duration
+    loans = []
+    run_id = str(int(time.time()))
+    async with client:
+        workers = [Worker(client, number, sizes, recorder, loans, args.seed, run_id) for number in range(args.concurrency)]
+        await asyncio.gather(*(worker.run(args.mix, deadline) for worker in workers))
+    elapsed = time.perf_counter() - started - args.warmup
+
+    if not args.base_url:
+        password_hasher.shutdown()
+    dialect = engine.dialect.name
+    await engine.dispose()
+    return {
+        "meta": {
+            **git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "target": args.base_url or "in-process",
+            "database": dialect,
+            "scale": args.scale,
+            "seed": args.seed,
+            "dataset": counts,
+            "concurrency": args.concurrency,
+            "warmup_s": args.warmup,
+            "duration_s": round(elapsed, 2),
+            "mix": args.mix,
+        },
+        **recorder.report(elapsed),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="tiny", help="tiny, small, medium или large")
+    parser.add_argument("--sizes", type=parse_sizes, default={}, help="переопределение размеров: books=1000,loans=5000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="удалить схему и данные перед заполнением")
+    parser.add_argument("--workers", type=int, help="процессов заполнения (по умолчанию - число ядер)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--base-url", help="адрес запущенного сервера; без него приложение вызывается в процессе")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="файл для JSON-результата")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Настройки приложения читаются при импорте, поэтому окружение задается до него
+    if not args.base_url:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from app.seed import SCALES
+
+    if args.scale not in SCALES:
+        raise SystemExit(f"Unknown scale: {args.scale}")
+    args.sizes = {**SCALES[args.scale], **args.sizes}
+    report = asyncio.run(main(args, prepare(args)))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
@@ -0,0 +1,73 @@
+"""Задержка цикла событий во время всплеска регистраций.
+
+Параллельно с N операциями хеширования работает проба, которая каждые 10 мс
+засыпает и измеряет, насколько позже запланированного она проснулась.
+Режим sync вызывает bcrypt прямо в цикле событий (как раньше), режим pool -
+через пул потоков app.auth.password_hasher. База данных не нужна.
+
+Запуск:
+    python -m benchmarks.password_hashing --signups 20 --mode pool
+    python -m benchmarks.password_hashing --signups 20 --mode sync
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.auth import get_password_hash, hash_password, password_hasher
+
+PROBE_INTERVAL = 0.01
+
+
+async def probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def signup_sync(password: str):
+    get_password_hash(password)
+    await asyncio.sleep(0)
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def main(signups: int, mode: str):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 5)
+
+    signup = hash_password if mode == "pool" else signup_sync
+    started = time.perf_counter()
+    await asyncio.gather(*(signup(f"password-{i}") for i in range(signups)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe_task
+    password_hasher.shutdown()
+    return {
+        "mode": mode,
+        "signups": signups,
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 0.5) * 1000, 2),
+            "p99": round(percentile(lags, 0.99) * 1000, 2),
+            "max": round(max(lags) * 1000, 2),
+            "mean": round(statistics.mean(lags) * 1000, 2),
+        },
+        "hasher": password_hasher.stats() if mode == "pool" else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signups", type=int, default=20)
+    parser.add_argument("--mode", choices=["pool", "sync"], default="pool")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.signups, args.mode)), indent=2))
@@ -0,0 +1,103 @@
+"""Стоимость построения и компиляции частых запросов на стороне Python.
+
+Для каждого запроса из app/queries.py сравниваются три варианта:
+  inline          - запрос строится заново на каждом вызове (как в обработчиках раньше),
+  inline_nocache  - то же без кэша скомпилированных выражений (query_cache_size=0),
+  cached          - готовый объект из app.queries с параметрами.
+Запросы выполняются через ORM-сессию на пустой SQLite в памяти, поэтому время
+выполнения в базе одинаково и мало, а разница - это работа Python на один запрос.
+
+Запуск:
+    python -m benchmarks.statement_cache --iterations 5000
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+from app import queries
+from app.circulation import HOLD_FULFILLED, HOLD_READY, MAX_ACTIVE_LOANS
+from app.models import Author, Base, Book, Genre, Hold, Reader
+
+IDS = [1, 2, 3]
+
+# Тот же запрос, построенный на месте с литералами, и готовый запрос из app.queries с параметрами;
+# оба варианта выбирают одинаковые столбцы, чтобы разница была только в построении
+CASES = {
+    "authors_by_ids": (
+        lambda: select(Author).where(Author.id.in_(IDS)),
+        queries.AUTHORS_BY_IDS, {"ids": IDS},
+    ),
+    "genre_by_name": (
+        lambda: select(Genre.id).where(Genre.name == "Fantasy").limit(1),
+        queries.GENRE_ID_BY_NAME, {"name": "Fantasy"},
+    ),
+    "reader_by_email": (
+        lambda: select(Reader.id).where(Reader.email == "reader@example.com").limit(1),
+        queries.READER_ID_BY_EMAIL, {"email": "reader@example.com"},
+    ),
+    "reserve_loan_slot": (
+        lambda: update(Reader)
+        .where(Reader.id == 1, Reader.active_loan_count < MAX_ACTIVE_LOANS)
+        .values(active_loan_count=Reader.active_loan_count + 1)
+        .returning(Reader.id)
+        .execution_options(synchronize_session=False),
+        queries.RESERVE_LOAN_SLOT, {"reader_id": 1, "max_loans": MAX_ACTIVE_LOANS},
+    ),
+    "fulfill_ready_hold": (
+        lambda: update(Hold)
+        .where(Hold.book_id == 1, Hold.reader_id == 1, Hold.status == HOLD_READY)
+        .values(status=HOLD_FULFILLED)
+        .returning(Hold.id)
+        .execution_options(synchronize_session=False),
+        queries.FULFILL_READY_HOLD, {"h_book_id": 1, "h_reader_id": 1, "ready": HOLD_READY, "fulfilled": HOLD_FULFILLED},
+    ),
+    "take_copy": (
+        lambda: update(Book)
+        .where(Book.id == 1, Book.available_copies > 0)
+        .values(available_copies=Book.available_copies - 1, version=Book.version + 1)
+        .returning(Book.id)
+        .execution_options(synchronize_session=False),
+        queries.TAKE_COPY, {"book_id": 1},
+    ),
+}
+
+
+def measure(engine, make_statement, iterations: int) -> float:
+    with Session(engine) as session:
+        for _ in range(100):
+            session.execute(*make_statement()).all()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            session.execute(*make_statement()).all()
+        elapsed = time.perf_counter() - started
+        session.rollback()
+    return elapsed / iterations * 1e6
+
+
+def main(iterations: int) -> dict:
+    engine = create_engine("sqlite://")
+    nocache = create_engine("sqlite://", query_cache_size=0)
+    for target in (engine, nocache):
+        Base.metadata.create_all(target)
+
+    results = {}
+    for name, (build, statement, params) in CASES.items():
+        inline = measure(engine, lambda: (build(),), iterations)
+        results[name] = {
+            "inline_nocache_us": round(measure(nocache, lambda: (build(),), iterations), 1),
+            "inline_us": round(inline, 1),
+            "cached_us": round(measure(engine, lambda: (statement, params), iterations), 1),
+        }
+        results[name]["saved_us"] = round(inline - results[name]["cached_us"], 1)
+    return {"iterations": iterations, "statements": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    print(json.dumps(main(args.iterations), indent=2))
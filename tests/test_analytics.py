@@ -0,0 +1,126 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.analytics import _insert, backfill_ranges, week_start
+from app.models import Base, Book, BookLoanDaily, Genre, GenreLoanDaily, Reader, ReaderWeekActivity
+from app.replicas import replica_router
+
+
+def test_week_start():
+    assert week_start(date(2024, 3, 4)) == date(2024, 3, 4)
+    assert week_start(date(2024, 3, 10)) == date(2024, 3, 4)
+
+
+# Тест на разбиение истории на диапазоны, выровненные по неделям
+def test_backfill_ranges():
+    ranges = backfill_ranges(date(2024, 3, 6), date(2024, 4, 2), chunk_days=14)
+
+    assert ranges == [
+        (date(2024, 3, 4), date(2024, 3, 18)),
+        (date(2024, 3, 18), date(2024, 4, 1)),
+        (date(2024, 4, 1), date(2024, 4, 15)),
+    ]
+    with pytest.raises(ValueError):
+        backfill_ranges(date(2024, 3, 6), date(2024, 4, 2), chunk_days=10)
+
+
+
+# Тест на выбор INSERT ... ON CONFLICT по СУБД: другие СУБД не поддерживаются
+def test_insert_dialects():
+    def session(dialect):
+        return SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=SimpleNamespace(name=dialect)))
+
+    assert isinstance(_insert(session("postgresql"), BookLoanDaily), postgresql.Insert)
+    assert isinstance(_insert(session("sqlite"), BookLoanDaily), sqlite.Insert)
+    with pytest.raises(NotImplementedError):
+        _insert(session("mysql"), BookLoanDaily)
+
+
+# Временная база SQLite: отчеты читают с основного сервера маршрутизатора реплик
+@pytest_asyncio.fixture
+async def session_factory(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(replica_router, "primary", engine)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def rollups(db) -> dict:
+    return {
+        model.__tablename__: sorted(tuple(row) for row in (await db.execute(select(model.__table__))).all())
+        for model in (BookLoanDaily, GenreLoanDaily, ReaderWeekActivity)
+    }
+
+
+# Тест на учет выдач и возвратов в агрегатах, отчеты по ним и восстановление агрегатов по истории
+@pytest.mark.asyncio
+async def test_rollups_reports_and_backfill(session_factory):
+    from app.analytics import backfill
+    from app.cards import refresh_cards
+    from app.circulation import checkout, return_batch
+    from app.routers import analytics
+
+    async with session_factory() as db:
+        fiction, poetry = Genre(name="Fiction"), Genre(name="Poetry")
+        popular = Book(title="Popular", publication_date=date(2020, 1, 1), available_copies=3, genres=[fiction, poetry])
+        quiet = Book(title="Quiet", publication_date=date(2020, 1, 1), available_copies=2, genres=[fiction])
+        first = Reader(name="First", email="first@example.com", hashed_password="x")
+        second = Reader(name="Second", email="second@example.com", hashed_password="x")
+        db.add_all([popular, quiet, first, second])
+        await db.flush()
+        await refresh_cards(db, [popular.id, quiet.id])
+        await db.commit()
+
+        returned = (await checkout(db, popular.id, first.id)).id
+        await checkout(db, popular.id, second.id)
+        await checkout(db, quiet.id, first.id)
+        await return_batch(db, [returned])
+
+        today = date.today()
+        recorded = await rollups(db)
+        assert recorded == {
+            "book_loan_daily": sorted([(today, popular.id, 2, 1), (today, quiet.id, 1, 0)]),
+            "genre_loan_daily": sorted([(today, fiction.id, 3), (today, poetry.id, 2)]),
+            "reader_week_activity": sorted([(week_start(today), first.id), (week_start(today), second.id)]),
+        }
+
+    app = FastAPI()
+    app.include_router(analytics.router, prefix="/analytics")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        top = (await client.get("/analytics/top-books")).json()
+        top_one = (await client.get("/analytics/top-books", params={"limit": 1})).json()
+        genres = (await client.get("/analytics/genres/daily", params={"genre_id": poetry.id})).json()
+        weekly = (await client.get("/analytics/readers/weekly")).json()
+        invalid = await client.get("/analytics/top-books", params={"date_from": "2024-02-01", "date_to": "2024-01-01"})
+        empty = (await client.get("/analytics/top-books", params={"date_from": "2001-01-01", "date_to": "2001-01-31"})).json()
+
+    assert top == [
+        {"book_id": popular.id, "title": "Popular", "loans": 2},
+        {"book_id": quiet.id, "title": "Quiet", "loans": 1},
+    ]
+    assert top_one == top[:1]
+    assert genres == [{"day": today.isoformat(), "genre_id": poetry.id, "name": "Poetry", "loans": 2}]
+    assert weekly == [{"week": week_start(today).isoformat(), "active_readers": 2}]
+    assert invalid.status_code == 400
+    assert empty == []
+
+    # Восстановление по таблице займов дает те же агрегаты
+    async with session_factory() as db:
+        for model in (BookLoanDaily, GenreLoanDaily, ReaderWeekActivity):
+            await db.execute(delete(model))
+        await db.commit()
+    assert (await backfill(session_factory, workers=1))["ranges"] == 1
+    async with session_factory() as db:
+        assert await rollups(db) == recorded
@@ -81,3 +81,34 @@ async def test_get_current_user_invalid_token(db_session):
 
     with pytest.raises(HTTPException):
         await get_current_user(token=invalid_token, db=db_session)
+
+
+# Тест на хеширование и проверку пароля в пуле потоков
+@pytest.mark.asyncio
+async def test_password_hasher_roundtrip():
+    from passlib.context import CryptContext
+    from app.auth import PasswordHasher
+
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), workers=2, max_queue=10)
+    hashed = await hasher.hash("secret")
+
+    assert await hasher.verify("secret", hashed)
+    assert not await hasher.verify("wrong", hashed)
+    assert hasher.stats()["completed"] == 3
+    hasher.shutdown()
+
+
+# Тест на отказ при переполненной очереди пула
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_full():
+    from fastapi import HTTPException as FastAPIHTTPException
+    from passlib.context import CryptContext
+    from app.auth import PasswordHasher
+
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), workers=1, max_queue=0)
+    hasher.in_flight = 1
+
+    with pytest.raises(FastAPIHTTPException) as error:
+        await hasher.hash("secret")
+    assert error.value.status_code == 503
+    assert hasher.stats()["rejected"] == 1
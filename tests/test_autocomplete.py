@@ -0,0 +1,109 @@
+import random
+
+import app.autocomplete
+from app.autocomplete import AUTHOR, BOOK, PrefixIndex, keys_for, normalize
+
+
+# Фикстура-функция для заполнения индекса
+def make_index():
+    index = PrefixIndex()
+    index.build([
+        (BOOK, 1, "War and Peace"),
+        (BOOK, 2, "Warlock"),
+        (AUTHOR, 1, "Lév Tolstoy"),
+    ])
+    return index
+
+
+# Тест на нормализацию строк
+def test_normalize():
+    assert normalize("  Lév   TOLSTOY! ") == "lev tolstoy"
+    assert keys_for("War and Peace") == ["war and peace", "and peace", "peace"]
+
+
+# Тест на поиск по началу строки и по началу слов
+def test_complete():
+    index = make_index()
+    assert [(s["type"], s["id"]) for s in index.complete("war")] == [("book", 1), ("book", 2)]
+    assert index.complete("tol") == [{"type": "author", "id": 1, "text": "Lév Tolstoy"}]
+    assert index.complete("pea")[0]["id"] == 1
+    assert index.complete("xyz") == []
+
+
+# Тест на инкрементальное обновление индекса
+def test_incremental_updates():
+    index = make_index()
+    index.add(BOOK, 2, "Peace Talks")
+    assert [s["id"] for s in index.complete("war")] == [1]
+    assert [s["id"] for s in index.complete("peace")] == [1, 2]
+    index.remove(BOOK, 1)
+    assert [s["id"] for s in index.complete("peace")] == [2]
+    assert index.stats()["entities"] == 2
+
+
+# Тест на ограничение размера индекса
+def test_max_keys():
+    index = PrefixIndex(max_keys=3)
+    index.build([(BOOK, 1, "War and Peace"), (BOOK, 2, "Warlock")])
+    assert index.stats()["truncated"]
+    assert index.stats()["keys"] == 3
+
+
+# Тест на добавление пачки: результат совпадает с построением индекса целиком
+def test_add_many():
+    index = make_index()
+    index.add_many(BOOK, [(3, "Peace Talks"), (2, "Warrior"), (4, "")])
+    expected = PrefixIndex()
+    expected.build([(BOOK, 1, "War and Peace"), (BOOK, 2, "Warrior"), (AUTHOR, 1, "Lév Tolstoy"), (BOOK, 3, "Peace Talks")])
+
+    assert index._keys == expected._keys
+    assert sorted(zip(index._keys, index._refs)) == sorted(zip(expected._keys, expected._refs))
+    assert [s["id"] for s in index.complete("war")] == [1, 2]
+    assert index.stats()["key_chars"] == expected.stats()["key_chars"]
+    index.remove_many(BOOK, [1, 3])
+    assert [s["id"] for s in index.complete("peace")] == []
+    assert index.stats()["entities"] == 3
+
+
+# Тест на то, что одиночные изменения не сдвигают основной массив до слияния буфера
+def test_single_writes_are_buffered():
+    index = make_index()
+    keys = index._keys
+    index.add(BOOK, 3, "Peace Talks")
+    index.add(BOOK, 2, "Warrior")
+    index.remove(AUTHOR, 1)
+
+    assert index._keys is keys
+    assert [s["id"] for s in index.complete("war")] == [1, 2]
+    assert [s["text"] for s in index.complete("peace")] == ["War and Peace", "Peace Talks"]
+    assert index.complete("tol") == []
+    assert index.stats()["keys"] == 6
+    assert index.stats()["pending_changes"] > 0
+
+
+# Тест на случайную последовательность изменений: результат совпадает с построением индекса целиком
+def test_random_updates_match_build(monkeypatch):
+    monkeypatch.setattr(app.autocomplete, "MAX_PENDING", 7)
+    words = ["war", "peace", "anna", "karenina", "warlock", "talks", "ann"]
+    generator = random.Random(42)
+    index = make_index()
+    texts = {(BOOK, 1): "War and Peace", (BOOK, 2): "Warlock", (AUTHOR, 1): "Lév Tolstoy"}
+    for _ in range(300):
+        kind, entity_id = generator.choice([BOOK, AUTHOR]), generator.randint(1, 12)
+        if generator.random() < 0.3:
+            index.remove(kind, entity_id)
+            texts.pop((kind, entity_id), None)
+        else:
+            text = " ".join(generator.choices(words, k=generator.randint(1, 4)))
+            index.add(kind, entity_id, text)
+            texts[kind, entity_id] = text
+    expected = PrefixIndex()
+    expected.build([(kind, entity_id, text) for (kind, entity_id), text in texts.items()])
+
+    # Порядок подсказок с одинаковым ключом не определен, поэтому сравниваются наборы
+    for prefix in words + ["a", "w", "peace war"]:
+        assert sorted(map(str, index.complete(prefix, limit=50))) == sorted(map(str, expected.complete(prefix, limit=50)))
+    assert index.stats()["keys"] == expected.stats()["keys"]
+    assert index.stats()["key_chars"] == expected.stats()["key_chars"]
+    index._compact()
+    assert sorted(zip(index._keys, index._refs)) == sorted(zip(expected._keys, expected._refs))
@@ -2,6 +2,7 @@ import pytest
 from datetime import date
 from app.models import Book, Author, Genre
 from app.database import SessionLocal
+from app.schemas import BookRead
 from sqlalchemy.future import select
 
 
@@ -128,3 +129,19 @@ async def test_create_book_without_publication_date(db_session):
         assert False, "Should raise an error due to missing required field"
     except Exception as e:
         assert "publication_date" in str(e)  # Проверяем, что ошибка связана с отсутствием обязательного поля
+
+
+# Тест на сборку BookRead с именами авторов и жанров
+def test_book_read_names():
+    book = Book(
+        id=1,
+        title="Book with Names",
+        description=None,
+        publication_date=date(2023, 5, 10),
+        available_copies=1,
+        authors=[Author(name="Author Test")],
+        genres=[Genre(name="Fiction")]
+    )
+    book_read = BookRead.model_validate(book, from_attributes=True)
+    assert book_read.authors == ["Author Test"]
+    assert book_read.genres == ["Fiction"]
@@ -0,0 +1,111 @@
+import pytest
+import pytest_asyncio
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+from app.bulk import BookImportRow, CSV_COLUMNS, import_books, iter_lines, iter_records, parse_line
+from app.models import Author, Base, Book, BookCard, Genre, book_author, book_genre
+
+
+# Сессия временной базы SQLite с автором 1 и жанром 1
+@pytest_asyncio.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        session.add_all([Author(name="Author"), Genre(name="Genre")])
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+# Тест на разбиение потока на строки по границам чанков
+@pytest.mark.asyncio
+async def test_iter_lines():
+    lines = [line async for line in iter_lines(chunks(b'{"a": 1}\r\n{"b"', b': 2}\n', b'{"c": 3}'))]
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+# Тест на сборку записи CSV с переводом строки внутри поля в кавычках и на ошибку кодировки
+@pytest.mark.asyncio
+async def test_iter_records():
+    body = chunks(b'title\n"Two\nlines ""quoted""",x\n', b'bad \xff\nlast')
+    records = [record async for record in iter_records(iter_lines(body), "csv")]
+    assert records[:2] == [(1, "title", None), (2, '"Two\nlines ""quoted""",x', None)]
+    assert records[2][0] == 4 and records[2][2] == "Invalid UTF-8 at byte 4"
+    assert records[3] == (5, "last", None)
+
+
+# Тест на разбор строки NDJSON
+def test_parse_ndjson():
+    row = BookImportRow.model_validate(parse_line(
+        '{"title": "Book", "publication_date": "2020-01-01", "author_ids": [1, 2]}', "ndjson", None
+    ))
+    assert row.publication_date == date(2020, 1, 1)
+    assert row.author_ids == [1, 2]
+    assert row.genre_ids == []
+    assert row.available_copies == 0
+
+
+# Тест на разбор строки CSV со списками идентификаторов
+def test_parse_csv():
+    data = parse_line('Book,"A, description",2020-01-01,3,1;2,', "csv", CSV_COLUMNS)
+    row = BookImportRow.model_validate(data)
+    assert row.description == "A, description"
+    assert row.available_copies == 3
+    assert row.author_ids == [1, 2]
+    assert row.genre_ids == []
+
+
+# Тест на отклонение строки, не являющейся JSON-объектом
+def test_parse_ndjson_not_object():
+    with pytest.raises(ValueError):
+        parse_line("[1, 2]", "ndjson", None)
+
+
+# Тест на импорт CSV в базу: многострочное поле, ошибки кодировки, разбора и ссылок по строкам
+@pytest.mark.asyncio
+async def test_import_csv(db_session):
+    body = (
+        b"title,description,publication_date,available_copies,author_ids,genre_ids\n"
+        b'First,"Line one\nline two, ""quoted""",2020-01-01,2,1,1\n'
+        b"Caf\xe9,latin-1,2020-01-01,1,,\n"
+        b'Broken,"unterminated"x,2020-01-01,1,,\n'
+        b"Orphan,,2020-01-01,1,99,\n"
+        b"\xd0\x9a\xd0\xbd\xd0\xb8\xd0\xb3\xd0\xb0,,2021-05-05,1,,1\n"
+    )
+    report = await import_books(db_session, iter_lines(chunks(body[:70], body[70:])), "csv")
+
+    assert report["inserted"] == 2
+    assert [error["line"] for error in report["errors"]] == [4, 5, 6]
+    assert report["errors"][0]["detail"].startswith("Invalid UTF-8")
+    assert report["errors"][1]["detail"].startswith("Invalid CSV")
+    assert report["errors"][2]["detail"] == "One or more authors not found"
+
+    books = {book.title: book for book in await db_session.scalars(select(Book))}
+    assert set(books) == {"First", "Книга"}
+    assert books["First"].description == 'Line one\nline two, "quoted"'
+    assert list(await db_session.execute(select(book_author))) == [(books["First"].id, 1)]
+    assert set(await db_session.execute(select(book_genre))) == {(books["First"].id, 1), (books["Книга"].id, 1)}
+    card = await db_session.get(BookCard, books["First"].id)
+    assert card.authors == ["Author"] and card.available_copies == 2
+
+
+# Тест на импорт NDJSON в базу с пакетами меньше числа строк
+@pytest.mark.asyncio
+async def test_import_ndjson(db_session, monkeypatch):
+    monkeypatch.setattr("app.bulk.BATCH_SIZE", 2)
+    lines = [f'{{"title": "Book {i}", "publication_date": "2020-01-0{i}", "genre_ids": [1]}}' for i in range(1, 6)]
+    body = "\n".join(lines[:2] + ["not json", "[1]"] + lines[2:]).encode()
+    report = await import_books(db_session, iter_lines(chunks(body)), "ndjson")
+
+    assert report["inserted"] == 5
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert sorted(await db_session.scalars(select(Book.title))) == [f"Book {i}" for i in range(1, 6)]
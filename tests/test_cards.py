@@ -0,0 +1,156 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.cards import delete_cards, rebuild_cards, refresh_cards, sync_card_stock
+from app.database import get_db
+from app.models import Author, Base, Book, BookCard, Genre
+
+
+# Временная база SQLite с двумя книгами: у первой два автора и жанр, у второй - один автор
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        tolstoy, chekhov = Author(name="Tolstoy"), Author(name="Chekhov")
+        novel = Genre(name="Novel")
+        db.add_all([
+            Book(title="First", publication_date=date(2020, 1, 1), available_copies=2, authors=[tolstoy, chekhov], genres=[novel]),
+            Book(title="Second", publication_date=date(2021, 1, 1), available_copies=1, authors=[chekhov]),
+        ])
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+async def cards(db) -> dict:
+    return {
+        card.id: (card.title, card.authors, card.genres, card.available_copies)
+        for card in await db.scalars(select(BookCard).execution_options(populate_existing=True))
+    }
+
+
+# Тест на сборку карточек, перенос количества экземпляров и удаление карточек
+@pytest.mark.asyncio
+async def test_refresh_sync_and_delete_cards(session_factory):
+    async with session_factory() as db:
+        await refresh_cards(db, select(Book.id))
+        await db.commit()
+        assert await cards(db) == {
+            1: ("First", ["Chekhov", "Tolstoy"], ["Novel"], 2),
+            2: ("Second", ["Chekhov"], [], 1),
+        }
+
+        await db.execute(update(Book).where(Book.id == 1).values(available_copies=0, version=Book.version + 1))
+        await sync_card_stock(db, [1])
+        await db.commit()
+        card = await db.get(BookCard, 1, populate_existing=True)
+        assert (card.available_copies, card.version) == (0, await db.scalar(select(Book.version).where(Book.id == 1)))
+
+        await delete_cards(db, [2])
+        await db.commit()
+        assert list(await cards(db)) == [1]
+
+
+# Тест на полную перестройку карточек пустой таблицы пакетами с удалением карточек удаленных книг
+@pytest.mark.asyncio
+async def test_rebuild_cards(session_factory):
+    async with session_factory() as db:
+        db.add(BookCard(id=99, title="Orphan", publication_date=date(2000, 1, 1), available_copies=0, version=1))
+        await db.commit()
+
+    assert await rebuild_cards(session_factory, batch_size=1) == 2
+    async with session_factory() as db:
+        assert await cards(db) == {
+            1: ("First", ["Chekhov", "Tolstoy"], ["Novel"], 2),
+            2: ("Second", ["Chekhov"], [], 1),
+        }
+
+
+# Тест на перестройку карточек из командной строки (python -m app.cards)
+def test_cards_cli(tmp_path):
+    import asyncio
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'cli.db'}"
+
+    async def prepare():
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(Book.__table__.insert(), [
+                {"id": 1, "title": "Only", "publication_date": date(2020, 1, 1), "available_copies": 1, "version": 1},
+            ])
+        await engine.dispose()
+
+    asyncio.run(prepare())
+    result = subprocess.run(
+        [sys.executable, "-m", "app.cards"], env={**os.environ, "DATABASE_URL": url},
+        capture_output=True, text=True, check=True, timeout=60,
+    )
+    assert result.stdout.strip() == "Rebuilt 1 book cards"
+
+
+# Приложение с роутерами авторов и жанров на временной базе
+def make_app(session_factory):
+    from app.routers import authors, genres
+
+    async def get_test_db():
+        async with session_factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(authors.router, prefix="/authors")
+    app.include_router(genres.router, prefix="/genres")
+    app.dependency_overrides[get_db] = get_test_db
+    return app
+
+
+# Тест на обновление карточек при переименовании автора и жанра и удалении автора
+@pytest.mark.asyncio
+async def test_author_and_genre_changes_update_cards(session_factory):
+    async with session_factory() as db:
+        await refresh_cards(db, select(Book.id))
+        await db.commit()
+
+    async with AsyncClient(transport=ASGITransport(app=make_app(session_factory)), base_url="http://test") as client:
+        author = {"name": "Anton Chekhov", "biography": None, "birth_date": None}
+        assert (await client.put("/authors/2", json=author)).status_code == 200
+        assert (await client.put("/genres/1", json={"name": "Classic novel"})).status_code == 200
+        async with session_factory() as db:
+            assert await cards(db) == {
+                1: ("First", ["Anton Chekhov", "Tolstoy"], ["Classic novel"], 2),
+                2: ("Second", ["Anton Chekhov"], [], 1),
+            }
+
+        assert (await client.delete("/authors/1")).status_code == 200
+        async with session_factory() as db:
+            assert (await cards(db))[1][1] == ["Anton Chekhov"]
+
+
+# Тест на атомарность: если карточки не обновились, переименование автора откатывается
+@pytest.mark.asyncio
+async def test_author_rename_rolls_back_with_cards(session_factory, monkeypatch):
+    async def broken_refresh(db, book_ids):
+        raise RuntimeError("card refresh failed")
+
+    monkeypatch.setattr("app.routers.authors.refresh_cards", broken_refresh)
+    transport = ASGITransport(app=make_app(session_factory), raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.put("/authors/2", json={"name": "Renamed", "biography": None, "birth_date": None})
+
+    assert response.status_code == 500
+    async with session_factory() as db:
+        assert await db.scalar(select(Author.name).where(Author.id == 2)) == "Chekhov"
@@ -0,0 +1,260 @@
+import pytest
+import pytest_asyncio
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Book, Loan, LoanArchive, Reader
+
+
+# Фабрика сессий временной базы SQLite со всеми таблицами
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db_session(session_factory):
+    async with session_factory() as session:
+        yield session
+
+
+# Тест на перенос старых возвращенных займов в архив
+@pytest.mark.asyncio
+async def test_archive_loans(session_factory, db_session):
+    from app.archive import archive_loans
+
+    book = Book(title="Archived Book", publication_date=date(2000, 1, 1), available_copies=1)
+    reader = Reader(name="Archive", email="archivereader@example.com", hashed_password="fakehashed")
+    db_session.add_all([book, reader])
+    await db_session.commit()
+    old = Loan(book_id=book.id, reader_id=reader.id, loan_date=date(2001, 1, 1), return_date=date(2001, 1, 10))
+    recent = Loan(book_id=book.id, reader_id=reader.id, loan_date=date(2001, 1, 1), return_date=date(2002, 6, 1))
+    active = Loan(book_id=book.id, reader_id=reader.id, loan_date=date(2001, 1, 1))
+    db_session.add_all([old, recent, active])
+    await db_session.commit()
+
+    report = await archive_loans(session_factory, cutoff=date(2002, 1, 1), batch_size=1)
+
+    remaining = set(await db_session.scalars(select(Loan.id)))
+    archived = list(await db_session.execute(select(LoanArchive.id, LoanArchive.return_date)))
+    assert report["archived"] == 1
+    assert archived == [(old.id, date(2001, 1, 10))]
+    assert remaining == {recent.id, active.id}
+
+
+# Тест на выдачу: срок возврата хранится в due_date, return_date остается пустым до возврата;
+# открытые займы учитываются в лимите, а возврат освобождает место
+@pytest.mark.asyncio
+async def test_checkout(db_session):
+    from fastapi import HTTPException
+    from app.circulation import LOAN_PERIOD, MAX_ACTIVE_LOANS, checkout, return_batch
+
+    book = Book(title="Loaned Book", publication_date=date(2022, 1, 1), available_copies=MAX_ACTIVE_LOANS + 1)
+    reader = Reader(name="Checkout", email="checkoutreader@example.com", hashed_password="fakehashed")
+    db_session.add_all([book, reader])
+    await db_session.commit()
+    book_id, reader_id = book.id, reader.id
+
+    loans = [await checkout(db_session, book_id, reader_id) for _ in range(MAX_ACTIVE_LOANS)]
+    assert all(loan.return_date is None for loan in loans)
+    assert all(loan.due_date == loan.loan_date + LOAN_PERIOD for loan in loans)
+    open_loans = await db_session.scalars(select(Loan.id).where(Loan.reader_id == reader_id, Loan.return_date.is_(None)))
+    loan_ids = [loan.id for loan in loans]
+    assert sorted(open_loans) == loan_ids
+
+    with pytest.raises(HTTPException) as error:
+        await checkout(db_session, book_id, reader_id)
+    assert error.value.detail == "Reader has reached the maximum number of active loans"
+
+    [result] = await return_batch(db_session, [loan_ids[0]])
+    assert result["loan"].return_date == date.today()
+    assert result["loan"].fine == 0
+    assert (await checkout(db_session, book_id, reader_id)).return_date is None
+    await db_session.refresh(reader)
+    await db_session.refresh(book)
+    assert reader.active_loan_count == MAX_ACTIVE_LOANS
+    assert book.available_copies == 1
+
+
+# Тест на пакетную выдачу: результат по каждой книге и общий лимит займов
+@pytest.mark.asyncio
+async def test_checkout_batch(db_session):
+    from app.circulation import LOAN_PERIOD, MAX_ACTIVE_LOANS, checkout_batch
+
+    book = Book(title="Batch Book", publication_date=date(2022, 1, 1), available_copies=MAX_ACTIVE_LOANS + 2)
+    other = Book(title="Last Copy", publication_date=date(2022, 1, 1), available_copies=1)
+    reader = Reader(name="Batch", email="batchreader@example.com", hashed_password="fakehashed")
+    db_session.add_all([book, other, reader])
+    await db_session.commit()
+
+    results = await checkout_batch(db_session, reader.id, [other.id, other.id] + [book.id] * MAX_ACTIVE_LOANS)
+
+    assert [item["error"] for item in results[:2]] == [None, "Book is not available"]
+    assert sum(item["loan"] is not None for item in results) == MAX_ACTIVE_LOANS
+    assert results[-1]["error"] == "Reader has reached the maximum number of active loans"
+    loans = [item["loan"] for item in results if item["loan"] is not None]
+    assert all(loan.return_date is None and loan.due_date == loan.loan_date + LOAN_PERIOD for loan in loans)
+    await db_session.refresh(reader)
+    assert reader.active_loan_count == MAX_ACTIVE_LOANS
+
+
+
+# Тест на сверку счетчиков активных займов пачками: возвращенные займы не учитываются
+@pytest.mark.asyncio
+async def test_reconcile_loan_counts(session_factory, db_session):
+    from app.circulation import reconcile_loan_counts
+
+    book = Book(title="Counted Book", publication_date=date(2022, 1, 1), available_copies=1)
+    drifted = Reader(name="Drift", email="driftreader@example.com", hashed_password="fakehashed")
+    stale = Reader(name="Stale", email="stalereader@example.com", hashed_password="fakehashed", active_loan_count=2)
+    exact = Reader(name="Exact", email="exactreader@example.com", hashed_password="fakehashed", active_loan_count=1)
+    db_session.add_all([book, drifted, stale, exact])
+    await db_session.commit()
+    db_session.add_all([
+        Loan(book_id=book.id, reader_id=drifted.id, loan_date=date(2023, 5, 15)),
+        Loan(book_id=book.id, reader_id=stale.id, loan_date=date(2023, 5, 15), return_date=date(2023, 5, 20)),
+        Loan(book_id=book.id, reader_id=exact.id, loan_date=date(2023, 5, 15)),
+    ])
+    await db_session.commit()
+
+    report = await reconcile_loan_counts(session_factory, batch_size=2)
+
+    assert report["readers"] == 3
+    assert report["drift"] == [
+        {"reader_id": drifted.id, "stored": 0, "actual": 1},
+        {"reader_id": stale.id, "stored": 2, "actual": 0},
+    ]
+    counts = dict((await db_session.execute(select(Reader.id, Reader.active_loan_count))).all())
+    assert counts == {drifted.id: 1, stale.id: 0, exact.id: 1}
+
+
+# Книга с карточкой каталога и несколько читателей; возвращает их id
+async def add_book_and_readers(db_session, copies: int, names):
+    from app.cards import refresh_cards
+
+    book = Book(title="Held Book", publication_date=date(2022, 1, 1), available_copies=copies)
+    readers = [Reader(name=name, email=f"{name.lower()}@example.com", hashed_password="fakehashed") for name in names]
+    db_session.add_all([book, *readers])
+    await db_session.flush()
+    await refresh_cards(db_session, [book.id])
+    await db_session.commit()
+    return book.id, [reader.id for reader in readers]
+
+
+async def stock(db_session, book_id: int):
+    from app.models import BookCard
+
+    row = (await db_session.execute(
+        select(Book.available_copies, BookCard.available_copies).join(BookCard, BookCard.id == Book.id).where(Book.id == book_id)
+    )).one()
+    return tuple(row)
+
+
+# Тест на очередь бронирований: возврат откладывает экземпляр для самого раннего бронирования
+# в той же транзакции, другой читатель его не получает, а владелец бронирования получает
+# событие и забирает книгу по бронированию
+@pytest.mark.asyncio
+async def test_return_allocates_copy_to_oldest_hold(db_session):
+    from fastapi import HTTPException
+    from app.circulation import HOLD_FULFILLED, HOLD_READY, HOLD_WAITING, checkout, place_hold, return_batch
+    from app.events import broker
+    from app.models import Hold
+
+    book_id, (owner, first, second) = await add_book_and_readers(db_session, 1, ["Owner", "First", "Second"])
+    loan_id = (await checkout(db_session, book_id, owner)).id
+
+    first_hold, first_position = await place_hold(db_session, book_id, first)
+    second_hold, second_position = await place_hold(db_session, book_id, second)
+    first_id, second_id = first_hold.id, second_hold.id
+    assert (first_position, second_position) == (1, 2)
+    with pytest.raises(HTTPException) as error:
+        await place_hold(db_session, book_id, first)
+    assert error.value.detail == "Hold already exists"
+
+    queue = broker.subscribe(first)
+    try:
+        await return_batch(db_session, [loan_id])
+        event = queue.get_nowait()
+    finally:
+        broker.unsubscribe(first, queue)
+
+    statuses = dict((await db_session.execute(select(Hold.id, Hold.status))).all())
+    assert statuses == {first_id: HOLD_READY, second_id: HOLD_WAITING}
+    assert event["type"] == "hold_ready" and event["hold_id"] == first_id
+    assert await stock(db_session, book_id) == (0, 0)
+
+    with pytest.raises(HTTPException) as error:
+        await checkout(db_session, book_id, second)
+    assert error.value.detail == "Book is not available"
+
+    loan = await checkout(db_session, book_id, first)
+    assert loan.reader_id == first and loan.return_date is None
+    assert await db_session.scalar(select(Hold.status).where(Hold.id == first_id)) == HOLD_FULFILLED
+    assert await stock(db_session, book_id) == (0, 0)
+
+
+# Тест на отмену готового бронирования: экземпляр переходит следующему в очереди,
+# а если очередь пуста - возвращается в фонд вместе с карточкой книги
+@pytest.mark.asyncio
+async def test_cancel_ready_hold_releases_copy(db_session):
+    from fastapi import HTTPException
+    from app.circulation import HOLD_CANCELLED, HOLD_READY, cancel_hold, checkout, place_hold, return_batch
+    from app.models import Hold
+
+    book_id, (owner, first, second) = await add_book_and_readers(db_session, 1, ["Keeper", "Early", "Late"])
+    loan_id = (await checkout(db_session, book_id, owner)).id
+    first_id = (await place_hold(db_session, book_id, first))[0].id
+    second_id = (await place_hold(db_session, book_id, second))[0].id
+    await return_batch(db_session, [loan_id])
+
+    await cancel_hold(db_session, book_id, first_id)
+    statuses = dict((await db_session.execute(select(Hold.id, Hold.status))).all())
+    assert statuses == {first_id: HOLD_CANCELLED, second_id: HOLD_READY}
+    assert await stock(db_session, book_id) == (0, 0)
+
+    await cancel_hold(db_session, book_id, second_id)
+    assert await db_session.scalar(select(Hold.status).where(Hold.id == second_id)) == HOLD_CANCELLED
+    assert await stock(db_session, book_id) == (1, 1)
+
+    with pytest.raises(HTTPException) as error:
+        await cancel_hold(db_session, book_id, second_id)
+    assert error.value.status_code == 404
+    with pytest.raises(HTTPException) as error:
+        await place_hold(db_session, book_id, first)
+    assert error.value.detail == "Book is available"
+
+
+# Тест на снятие бронирований, не полученных в срок: экземпляр переходит следующему
+# в очереди с новым сроком, а после истечения последнего - возвращается в фонд
+@pytest.mark.asyncio
+async def test_expire_holds(session_factory, db_session):
+    from datetime import timedelta
+    from app.circulation import HOLD_EXPIRED, HOLD_PICKUP_PERIOD, HOLD_READY, checkout, expire_holds, place_hold, return_batch
+    from app.models import Hold
+
+    book_id, (owner, first, second) = await add_book_and_readers(db_session, 1, ["Lender", "Absent", "Patient"])
+    loan_id = (await checkout(db_session, book_id, owner)).id
+    first_id = (await place_hold(db_session, book_id, first))[0].id
+    second_id = (await place_hold(db_session, book_id, second))[0].id
+    await return_batch(db_session, [loan_id])
+
+    ready = await db_session.get(Hold, first_id)
+    assert ready.expires_at == ready.ready_at + HOLD_PICKUP_PERIOD
+    assert await expire_holds(session_factory, ready.expires_at - timedelta(seconds=1)) == {"expired": 0}
+
+    assert await expire_holds(session_factory, ready.expires_at) == {"expired": 1}
+    db_session.expire_all()
+    holds = {hold.id: hold for hold in await db_session.scalars(select(Hold))}
+    assert holds[first_id].status == HOLD_EXPIRED
+    assert holds[second_id].status == HOLD_READY and holds[second_id].expires_at is not None
+    assert await stock(db_session, book_id) == (0, 0)
+
+    assert await expire_holds(session_factory, holds[second_id].expires_at) == {"expired": 1}
+    assert await db_session.scalar(select(Hold.status).where(Hold.id == second_id)) == HOLD_EXPIRED
+    assert await stock(db_session, book_id) == (1, 1)
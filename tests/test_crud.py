@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+import app.crud
+import app.search
+from app.autocomplete import PrefixIndex
+from app.crud import create_book
+from app.models import Author, Base, Book, BookCard, Genre
+from app.routers.books import BookCreate
+from app.search import SearchIndex
+
+
+# Временная база SQLite с одним автором и жанром; индексы поиска и подсказок - свежие
+@pytest_asyncio.fixture
+async def db_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(app.crud, "autocomplete_index", PrefixIndex())
+    search_index = SearchIndex()
+    search_index.ready = True
+    monkeypatch.setattr(app.search, "search_index", search_index)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        db.add_all([Author(name="Tolstoy"), Genre(name="Novel")])
+        await db.commit()
+        yield db
+    await engine.dispose()
+
+
+def book_create(**fields) -> BookCreate:
+    return BookCreate(**{
+        "title": "Anna Karenina",
+        "description": None,
+        "publication_date": date(1878, 1, 1),
+        "author_ids": [1],
+        "genre_ids": [1],
+        "available_copies": 2,
+        **fields,
+    })
+
+
+# Создание книги обновляет карточку, поиск и автодополнение
+@pytest.mark.asyncio
+async def test_create_book_indexes_book(db_session):
+    book = await create_book(book_create(), db_session)
+
+    assert [author.name for author in book.authors] == ["Tolstoy"]
+    assert [genre.name for genre in book.genres] == ["Novel"]
+    card = await db_session.get(BookCard, book.id)
+    assert (card.title, card.authors, card.genres, card.available_copies) == ("Anna Karenina", ["Tolstoy"], ["Novel"], 2)
+    assert [book_id for _, book_id in app.search.search_index.search("karenina")] == [book.id]
+    assert app.crud.autocomplete_index.complete("anna") == [{"type": "book", "id": book.id, "text": "Anna Karenina"}]
+
+
+# Неизвестные авторы и жанры отклоняются, как и в POST /books
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fields, detail", [
+    ({"author_ids": [1, 99]}, "One or more authors not found"),
+    ({"genre_ids": [99]}, "One or more genres not found"),
+])
+async def test_create_book_rejects_unknown_links(db_session, fields, detail):
+    with pytest.raises(HTTPException) as error:
+        await create_book(book_create(**fields), db_session)
+
+    assert (error.value.status_code, error.value.detail) == (400, detail)
+    assert await db_session.scalar(select(func.count()).select_from(Book)) == 0
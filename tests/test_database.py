@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import text
+
+from app.database import InstrumentedPool, LatencyHistogram, create_engine
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(bounds=(1, 10))
+    for ms in (0.5, 1, 3, 50):
+        histogram.observe(ms)
+    stats = histogram.stats()
+    assert stats["buckets"] == {"1": 2, "10": 1, "+Inf": 1}
+    assert stats["count"] == 4
+    assert stats["max_ms"] == 50
+
+
+# Тест на учет ожидания и удержания соединений пулом
+@pytest.mark.asyncio
+async def test_instrumented_pool():
+    engine = create_engine("sqlite+aiosqlite://")
+    assert isinstance(engine.pool, InstrumentedPool)
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert engine.pool.stats()["checked_out"] == 1
+    stats = engine.pool.stats()
+    await engine.dispose()
+
+    assert stats["checked_out"] == 0
+    assert stats["wait"]["count"] == 1
+    assert stats["hold"]["count"] == 1
+
+
+# Тест на возврат соединения в пул до сериализации ответа и учет соединений запроса
+@pytest.mark.asyncio
+async def test_db_route_releases_connection():
+    from fastapi import APIRouter, Depends, FastAPI
+    from httpx import ASGITransport, AsyncClient
+    from pydantic import BaseModel, field_validator
+
+    from app.database import DBRoute, open_session, request_metrics
+
+    engine = create_engine("sqlite+aiosqlite://")
+
+    async def get_test_db():
+        async with open_session(engine) as session:
+            yield session
+
+    class Answer(BaseModel):
+        value: int
+
+        @field_validator("value")
+        @classmethod
+        def released(cls, value):
+            assert engine.pool.checkedout() == 0
+            return value
+
+    router = APIRouter(route_class=DBRoute)
+
+    @router.get("/answer", response_model=Answer)
+    async def answer(db=Depends(get_test_db)):
+        return {"value": await db.scalar(text("SELECT 42"))}
+
+    app = FastAPI()
+    app.include_router(router)
+    requests = request_metrics.requests
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/answer")
+    finally:
+        await engine.dispose()
+
+    assert response.json() == {"value": 42}
+    assert request_metrics.requests == requests + 1
+
+
+# Тест на маршрут DBRoute, подключенный через include_router с префиксом (в том числе вложенно):
+# маршрут создается заново, но обработчик оборачивается только один раз
+@pytest.mark.asyncio
+async def test_db_route_include_router_prefix():
+    from fastapi import APIRouter, Depends, FastAPI
+    from httpx import ASGITransport, AsyncClient
+
+    from app.database import DBRoute, open_session
+
+    engine = create_engine("sqlite+aiosqlite://")
+
+    async def get_test_db():
+        async with open_session(engine) as session:
+            yield session
+
+    router = APIRouter(route_class=DBRoute)
+
+    @router.get("/answer")
+    async def answer(db=Depends(get_test_db)):
+        return {"value": await db.scalar(text("SELECT 42")), "checked_out": engine.pool.checkedout()}
+
+    parent = APIRouter(route_class=DBRoute)
+    parent.include_router(router, prefix="/inner")
+    app = FastAPI()
+    app.include_router(router, prefix="/x")
+    app.include_router(parent, prefix="/outer")
+    routes = {route.path: route for route in app.routes}
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            responses = [await client.get(path) for path in ("/x/answer", "/outer/inner/answer")]
+        checked_out = engine.pool.checkedout()
+    finally:
+        await engine.dispose()
+
+    for path in ("/x/answer", "/outer/inner/answer"):
+        assert routes[path].endpoint.__db_route__
+        assert routes[path].endpoint.__wrapped__ is answer
+    assert [response.json() for response in responses] == [{"value": 42, "checked_out": 1}] * 2
+    assert checked_out == 0
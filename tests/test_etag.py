@@ -0,0 +1,25 @@
+import pytest
+from fastapi import HTTPException
+from app.etag import check_if_match, etag_matches, make_etag
+
+
+# Тест на формат строгого ETag
+def test_make_etag():
+    assert make_etag(3) == '"3"'
+
+
+# Тест на сравнение со списком ETag из заголовка
+def test_etag_matches():
+    assert etag_matches('"1", "3"', make_etag(3))
+    assert etag_matches("*", make_etag(3))
+    assert not etag_matches('"2"', make_etag(3))
+    assert not etag_matches(None, make_etag(3))
+
+
+# Тест на предусловие If-Match
+def test_check_if_match():
+    check_if_match(None, 1)
+    check_if_match('"1"', 1)
+    with pytest.raises(HTTPException) as exc:
+        check_if_match('"1"', 2)
+    assert exc.value.status_code == 412
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app.events import EventBroker, broker, format_sse, sse_stream
+
+
+# Тест на доставку событий только подписчикам нужного читателя
+def test_broker_publish():
+    events = EventBroker(queue_size=2)
+    first = events.subscribe(1)
+    other = events.subscribe(2)
+
+    events.publish(1, {"type": "hold_ready", "hold_id": 1})
+    events.publish(1, {"type": "hold_ready", "hold_id": 2})
+    events.publish(1, {"type": "hold_ready", "hold_id": 3})
+
+    # При переполнении очереди отбрасываются самые старые события
+    assert [first.get_nowait()["hold_id"] for _ in range(first.qsize())] == [2, 3]
+    assert other.empty()
+
+    events.unsubscribe(1, first)
+    events.unsubscribe(2, other)
+    assert events.subscriber_count() == 0
+
+
+def test_format_sse():
+    assert format_sse({"type": "hold_ready", "hold_id": 7}) == 'event: hold_ready\ndata: {"type": "hold_ready", "hold_id": 7}\n\n'
+
+
+# Тест на поток событий: сначала начальное состояние, затем опубликованные события
+@pytest.mark.asyncio
+async def test_sse_stream():
+    disconnected = False
+
+    async def is_disconnected():
+        return disconnected
+
+    stream = sse_stream(42, broker.subscribe(42), [{"type": "hold_ready", "hold_id": 1}], is_disconnected)
+    assert '"hold_id": 1' in await stream.__anext__()
+
+    next_event = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    broker.publish(42, {"type": "hold_ready", "hold_id": 2})
+    assert '"hold_id": 2' in await next_event
+
+    disconnected = True
+    await stream.aclose()
+    assert broker.subscriber_count() == 0
+
+
+# Тест на событие, опубликованное между подпиской и чтением начального состояния:
+# оно не теряется, а если уже вошло в начальные события - не повторяется
+@pytest.mark.asyncio
+async def test_sse_stream_subscribed_before_initial():
+    async def is_disconnected():
+        return False
+
+    queue = broker.subscribe(7)
+    broker.publish(7, {"type": "hold_ready", "hold_id": 1})
+    broker.publish(7, {"type": "hold_ready", "hold_id": 2})
+    stream = sse_stream(7, queue, [{"type": "hold_ready", "hold_id": 1}], is_disconnected)
+
+    assert '"hold_id": 1' in await stream.__anext__()
+    assert '"hold_id": 2' in await stream.__anext__()
+    assert queue.empty()
+
+    await stream.aclose()
+    assert broker.subscriber_count() == 0
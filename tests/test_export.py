@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import pytest
+import pytest_asyncio
+from datetime import date
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.future import select
+
+from app.export import BOOKS_EXPORT_QUERY, CHUNK_SIZE, export_response, stream_chunks
+from app.models import Base, BookCard, Reader
+from app.replicas import replica_router
+
+READERS = CHUNK_SIZE * 2 + 5
+COLUMNS = ["id", "name", "email"]
+READERS_QUERY = select(Reader.id, Reader.name, Reader.email).order_by(Reader.id)
+
+
+# Временная база SQLite с читателями на несколько пачек выгрузки; выгрузка читает
+# с основного сервера маршрутизатора реплик
+@pytest_asyncio.fixture
+async def engine(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Reader), [
+            {"id": i, "name": f"Reader {i}", "email": f"reader{i}@example.com", "hashed_password": "x"}
+            for i in range(1, READERS + 1)
+        ])
+        # Поля с запятой, кавычками и переводом строки
+        await conn.execute(Reader.__table__.update().where(Reader.id == 1).values(name='Smith, "Jr."\nline'))
+        await conn.execute(insert(BookCard), [{
+            "id": 1, "title": "Book, one", "publication_date": date(2020, 1, 1), "available_copies": 2,
+            "version": 1, "author_names": ["A", "B"], "genre_names": ["G"],
+        }])
+    monkeypatch.setattr(replica_router, "primary", engine)
+    yield engine
+    await engine.dispose()
+
+
+async def read_body(response) -> str:
+    return b"".join([chunk async for chunk in response.body_iterator]).decode()
+
+
+# Тест на чтение результата пачками заданного размера
+@pytest.mark.asyncio
+async def test_stream_chunks(engine):
+    sizes = [len(partition) async for partition in stream_chunks(READERS_QUERY, chunk_size=1000)]
+    assert sizes == [1000, 1000, 5]
+
+
+# Тест на выгрузку CSV: один заголовок на несколько пачек и экранирование полей
+@pytest.mark.asyncio
+async def test_export_csv(engine):
+    response = export_response(READERS_QUERY, COLUMNS, "csv", "readers")
+    rows = list(csv.reader(io.StringIO(await read_body(response), newline="")))
+
+    assert response.media_type == "text/csv"
+    assert rows[0] == COLUMNS
+    assert len(rows) == READERS + 1
+    assert rows[1] == ["1", 'Smith, "Jr."\nline', "reader1@example.com"]
+    assert [int(row[0]) for row in rows[1:]] == list(range(1, READERS + 1))
+
+
+# Тест на выгрузку NDJSON: одна строка JSON на запись
+@pytest.mark.asyncio
+async def test_export_ndjson(engine):
+    response = export_response(READERS_QUERY, COLUMNS, "ndjson", "readers")
+    lines = (await read_body(response)).splitlines()
+
+    assert len(lines) == READERS
+    assert json.loads(lines[0]) == {"id": 1, "name": 'Smith, "Jr."\nline', "email": "reader1@example.com"}
+
+
+# Тест на выгрузку карточек книг: списки имен в CSV через ";", в NDJSON - массивом
+@pytest.mark.asyncio
+async def test_export_books(engine):
+    columns = ["id", "title", "publication_date", "authors", "genres"]
+    rows = list(csv.reader(io.StringIO(await read_body(export_response(BOOKS_EXPORT_QUERY, columns, "csv", "books")))))
+    assert rows == [columns, ["1", "Book, one", "2020-01-01", "A;B", "G"]]
+
+    body = await read_body(export_response(BOOKS_EXPORT_QUERY, columns, "ndjson", "books"))
+    assert json.loads(body) == {"id": 1, "title": "Book, one", "publication_date": "2020-01-01", "authors": ["A", "B"], "genres": ["G"]}
+
+
+# Тест на пустую выгрузку CSV: только заголовок
+@pytest.mark.asyncio
+async def test_export_empty_csv(engine):
+    empty_query = READERS_QUERY.where(Reader.id < 0)
+    assert await read_body(export_response(empty_query, COLUMNS, "csv", "readers")) == "id,name,email\r\n"
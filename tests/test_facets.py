@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.future import select
+from app.facets import book_filters, parse_facets
+from app.models import BookCard
+
+
+def compile_filters(**kwargs):
+    params = dict(genre_id=None, author_id=None, year_from=None, year_to=None, available=None)
+    params.update(kwargs)
+    query = select(BookCard.id).where(*book_filters(**params))
+    return str(query.compile(compile_kwargs={"literal_binds": True}))
+
+
+# Тест на фильтры по жанрам и авторам через таблицы связей
+def test_book_filters_links():
+    sql = compile_filters(genre_id=[1, 2], author_id=[3])
+    assert "book_genre.genre_id IN (1, 2)" in sql
+    assert "book_author.author_id IN (3)" in sql
+
+
+# Тест на фильтр по годам в виде диапазона дат и по наличию экземпляров
+def test_book_filters_year_and_availability():
+    sql = compile_filters(year_from=2000, year_to=2005, available=True)
+    assert "book_cards.publication_date >= '2000-01-01'" in sql
+    assert "book_cards.publication_date <= '2005-12-31'" in sql
+    assert "book_cards.available_copies > 0" in sql
+
+
+# Тест на разбор списка фасетов
+def test_parse_facets():
+    assert parse_facets("genre, year") == ["genre", "year"]
+    with pytest.raises(HTTPException):
+        parse_facets("genre,publisher")
@@ -0,0 +1,18 @@
+from datetime import date, timedelta
+
+from app.overdue import FINE_PER_DAY_CENTS, MAX_FINE_CENTS, calculate_fines, cents_to_amount
+
+
+# Тест на расчет дней просрочки и штрафов с ограничением сверху
+def test_calculate_fines():
+    today = date(2024, 3, 1)
+    due_dates = [today + timedelta(days=2), today, today - timedelta(days=3), today - timedelta(days=1000)]
+
+    days, fines = calculate_fines(due_dates, today)
+
+    assert days.tolist() == [0, 0, 3, 1000]
+    assert fines.tolist() == [0, 0, 3 * FINE_PER_DAY_CENTS, MAX_FINE_CENTS]
+
+
+def test_cents_to_amount():
+    assert str(cents_to_amount(1234)) == "12.34"
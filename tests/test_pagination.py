@@ -0,0 +1,75 @@
+import pytest
+from datetime import date
+from fastapi import HTTPException
+from sqlalchemy.future import select
+from app.models import Book, Reader
+from app.pagination import encode_cursor, decode_cursor, paginate, next_cursor
+from app.search import RANK
+
+
+# Тест на кодирование и декодирование курсора
+def test_cursor_roundtrip():
+    cursor = encode_cursor([date(2023, 5, 10), 42])
+    values = decode_cursor(cursor, [Book.publication_date, Book.id])
+    assert values == [date(2023, 5, 10), 42]
+
+
+# Тест на отклонение поврежденного курсора
+def test_invalid_cursor():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not-a-cursor", [Book.id])
+    assert exc.value.status_code == 400
+
+
+# Тест на несовпадение количества ключей в курсоре
+def test_cursor_arity_mismatch():
+    cursor = encode_cursor(["Title", 1])
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor, [Book.id])
+
+
+# Тест на отклонение значений курсора, не совпадающих с типом колонки
+@pytest.mark.parametrize("values, columns", [
+    (["x"], [Book.id]),
+    ([True], [Book.id]),
+    ([1.5], [Book.id]),
+    ([7, 1], [Book.title, Book.id]),
+    ([20230510, 1], [Book.publication_date, Book.id]),
+    ([[1]], [Book.id]),
+])
+def test_cursor_value_type_mismatch(values, columns):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(encode_cursor(values), columns)
+    assert exc.value.status_code == 400
+
+
+# Тест на допустимые значения: NULL и целое число для вещественной колонки
+def test_cursor_value_coercion():
+    assert decode_cursor(encode_cursor([None, 3]), [Book.description, Book.id]) == [None, 3]
+    values = decode_cursor(encode_cursor([2, 5]), [RANK, Book.id])
+    assert values == [2.0, 5] and isinstance(values[0], float)
+
+
+# Тест на построение keyset-запроса без OFFSET
+def test_paginate_keyset():
+    cursor = encode_cursor([10])
+    query = paginate(select(Reader), [Reader.id], cursor=cursor, limit=5)
+    sql = str(query.compile(compile_kwargs={"literal_binds": True}))
+    assert "readers.id > 10" in sql
+    assert "OFFSET" not in sql
+
+
+# Тест на устаревший режим OFFSET
+def test_paginate_offset():
+    query = paginate(select(Reader), [Reader.id], skip=20, limit=5)
+    sql = str(query.compile(compile_kwargs={"literal_binds": True}))
+    assert "OFFSET 20" in sql
+
+
+# Тест на вычисление курсора следующей страницы
+def test_next_cursor():
+    readers = [Reader(id=i, name="r", email=f"r{i}@example.com") for i in range(1, 4)]
+    assert next_cursor(readers, ["id"], limit=5) is None
+    assert next_cursor(readers, ["id"], limit=3, skip=0) is None
+    cursor = next_cursor(readers, ["id"], limit=3)
+    assert decode_cursor(cursor, [Reader.id]) == [3]
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Reader
+from app.principals import PrincipalCache, watch_readers
+
+
+# Тест на попадания, промахи и вытеснение по LRU
+def test_principal_cache_lru():
+    cache = PrincipalCache(max_size=2, ttl=60)
+    cache.put("1", 100, "first")
+    cache.put("2", 100, "second")
+    assert cache.get("1", 100) == "first"
+
+    cache.put("3", 100, "third")
+
+    assert cache.get("2", 100) is None
+    assert cache.get("1", 100) == "first"
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_principal_cache_expiry():
+    cache = PrincipalCache(max_size=10, ttl=60)
+    cache.put("1", 100, "expired", expires_at=time.time() - 1)
+    assert cache.get("1", 100) is None
+
+
+# Тест на сброс записей читателя и отзыв токенов
+def test_principal_cache_revocation():
+    cache = PrincipalCache(max_size=10, ttl=60)
+    cache.put("1", 100, "user")
+    cache.put("1", 200, "user")
+    cache.invalidate(1)
+    assert cache.get("1", 100) is None and cache.get("1", 200) is None
+
+    cache.revoke_token(1, 100, expires_at=time.time() + 60)
+    assert cache.is_revoked("1", 100)
+    assert not cache.is_revoked("1", 200)
+
+    cache.revoke_all(1)
+    assert cache.is_revoked("1", int(time.time()) - 1)
+    # Токен, выпущенный в ту же секунду, что и отзыв, тоже отозван
+    assert cache.is_revoked("1", int(time.time()))
+    assert not cache.is_revoked("2", 100)
+
+
+@pytest_asyncio.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+# Тест на сброс записей читателя только после фиксации изменения, но не после flush и отката
+@pytest.mark.asyncio
+async def test_watch_readers_after_commit(db_session):
+    cache = PrincipalCache(max_size=10, ttl=60)
+    watch_readers(cache)
+    reader = Reader(name="Cached", email="cached@example.com", hashed_password="x")
+    db_session.add(reader)
+    await db_session.commit()
+    sub = str(reader.id)
+
+    cache.put(sub, 100, "old")
+    reader.name = "Rolled back"
+    await db_session.flush()
+    assert cache.get(sub, 100) == "old"
+    await db_session.rollback()
+    assert cache.get(sub, 100) == "old"
+
+    reader.name = "Renamed"
+    await db_session.flush()
+    assert cache.get(sub, 100) == "old"
+    await db_session.commit()
+    assert cache.get(sub, 100) is None
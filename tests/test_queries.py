@@ -0,0 +1,24 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import queries
+from app.models import Author, Base, Reader
+
+
+# Тест на готовые запросы: расширяемый IN и условные UPDATE с параметрами
+def test_cached_statements():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([Author(name=f"Author {i}") for i in range(3)])
+        db.add(Reader(name="Reader", email="reader@example.com", hashed_password="x", active_loan_count=4))
+        db.commit()
+
+        assert [author.name for author in db.scalars(queries.AUTHORS_BY_IDS, {"ids": [1, 3]})] == ["Author 0", "Author 2"]
+        assert len(db.scalars(queries.AUTHORS_BY_IDS, {"ids": [1, 2, 3, 4]}).all()) == 3
+        assert db.scalar(queries.AUTHOR_ID_BY_NAME, {"name": "Author 1"}) == 2
+        assert db.scalar(queries.READER_ID_BY_EMAIL, {"email": "other@example.com"}) is None
+
+        reserve = {"reader_id": 1, "max_loans": 5}
+        assert db.execute(queries.RESERVE_LOAN_SLOT, reserve).first() is not None
+        assert db.execute(queries.RESERVE_LOAN_SLOT, reserve).first() is None
@@ -0,0 +1,76 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from jose import jwt
+
+from app.ratelimit import MemoryBackend, RateLimitMiddleware, client_key, route_group
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+# Тест на списание и пополнение токенов
+@pytest.mark.asyncio
+async def test_memory_backend_refill():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    assert [await backend.take("k", rate=1, burst=2) for _ in range(2)] == [0, 0]
+    assert await backend.take("k", rate=1, burst=2) == pytest.approx(1.0)
+
+    clock.now = 0.5
+    assert await backend.take("k", rate=1, burst=2) == pytest.approx(0.5)
+    clock.now = 1.0
+    assert await backend.take("k", rate=1, burst=2) == 0
+
+
+# Тест на удаление простаивающих ведер и ограничение числа ключей
+@pytest.mark.asyncio
+async def test_memory_backend_eviction():
+    clock = FakeClock()
+    backend = MemoryBackend(max_keys=3, clock=clock)
+    for key in "abc":
+        await backend.take(key, rate=1, burst=2)
+    await backend.take("d", rate=1, burst=2)
+    assert len(backend) == 3
+
+    # Через burst / rate секунд ведра полны и удаляются при следующих обращениях
+    clock.now = 2.0
+    await backend.take("e", rate=1, burst=2)
+    await backend.take("e", rate=1, burst=2)
+    assert len(backend) == 1
+    assert backend.evictions == 4
+
+
+def test_client_key():
+    token = jwt.encode({"sub": "7"}, "secret", algorithm="HS256")
+    scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 1234)}
+    assert client_key(scope, "secret", "HS256") == "reader:7"
+    # Токен с чужой подписью не дает собственного ведра
+    assert client_key(scope, "other", "HS256") == "ip:10.0.0.1"
+    assert route_group("/books/1/holds") == "books"
+
+
+# Тест на ответ 429 с Retry-After и раздельные ведра групп маршрутов
+@pytest.mark.asyncio
+async def test_rate_limit_middleware():
+    app = RateLimitMiddleware(ok_app, limits={"loans": (0.5, 2), "default": (100, 100)}, backend=MemoryBackend(clock=FakeClock()))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        statuses = [(await client.post("/loans/")).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+        response = await client.post("/loans/")
+        assert response.json() == {"detail": "Too many requests"}
+        assert response.headers["retry-after"] == "2"
+
+        assert (await client.get("/books/")).status_code == 200
+        assert (await client.get("/")).status_code == 200
+    assert app.rejected == 2
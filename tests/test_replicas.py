@@ -0,0 +1,48 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.database import create_engine
+from app.replicas import ReadYourWritesMiddleware, ReplicaRouter
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+# Тест на выбор реплик по кругу и переход на основной сервер
+@pytest.mark.asyncio
+async def test_replica_router_pick():
+    primary, replicas = create_engine("sqlite+aiosqlite://"), [create_engine("sqlite+aiosqlite://") for _ in range(2)]
+    router = ReplicaRouter(primary, replicas, max_lag=1, sticky_seconds=60)
+    # До проверки отставания реплики не используются
+    assert router.pick("ip:1") is primary
+
+    assert await router.check_lag() == {"replicas": 2, "healthy": 2}
+    assert {router.pick("ip:1"), router.pick("ip:1")} == set(replicas)
+
+    router.note_write("ip:1")
+    assert router.pick("ip:1") is primary
+    assert router.pick("ip:2") in replicas
+
+    router.lag = [None, None]
+    router._healthy = []
+    assert router.pick("ip:2") is primary
+    for engine in [primary, *replicas]:
+        await engine.dispose()
+
+
+# Тест на запоминание клиентов после успешных изменяющих запросов
+@pytest.mark.asyncio
+async def test_read_your_writes_middleware():
+    router = ReplicaRouter(None, [object()], max_lag=1, sticky_seconds=60)
+    app = ReadYourWritesMiddleware(ok_app, router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/books/")
+        assert not router.is_sticky("ip:127.0.0.1")
+        await client.post("/loans/")
+        assert router.is_sticky("ip:127.0.0.1")
+
+    router.sticky_seconds = 0
+    assert not router.is_sticky("ip:127.0.0.1")
+    assert len(router._writes) == 0
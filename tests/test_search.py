@@ -0,0 +1,48 @@
+from app.search import SearchIndex, tokenize
+
+
+# Фикстура-функция для заполнения встроенного индекса
+def make_index():
+    index = SearchIndex()
+    index.add(1, "War and Peace", "A novel about Napoleon", ["Leo Tolstoy"])
+    index.add(2, "Anna Karenina", "Tolstoy novel", ["Leo Tolstoy"])
+    index.add(3, "Peace Talks", None, ["Jim Butcher"])
+    return index
+
+
+# Тест на нормализацию токенов
+def test_tokenize():
+    assert tokenize("War, and PEACE!") == ["war", "and", "peace"]
+    assert tokenize(None) == []
+
+
+# Тест на ранжирование: совпадение в названии весит больше, чем в авторах и описании
+def test_search_ranking():
+    index = make_index()
+    hits = index.search("tolstoy")
+    assert [book_id for _, book_id in hits] == [2, 1]
+
+
+# Тест на поиск по всем словам запроса
+def test_search_all_terms():
+    index = make_index()
+    assert [book_id for _, book_id in index.search("peace tolstoy")] == [1]
+    assert index.search("peace missing") == []
+
+
+# Тест на постраничный обход результатов по курсору
+def test_search_keyset():
+    index = make_index()
+    first = index.search("peace", limit=1)
+    second = index.search("peace", limit=1, after=first[-1])
+    assert [book_id for _, book_id in first + second] == [1, 3]
+
+
+# Тест на обновление и удаление документов
+def test_search_update_and_remove():
+    index = make_index()
+    index.add(3, "Storm Front", None, ["Jim Butcher"])
+    assert [book_id for _, book_id in index.search("peace")] == [1]
+    index.remove(1)
+    assert index.search("peace") == []
+    assert len(index) == 2
@@ -0,0 +1,77 @@
+from collections import Counter
+from datetime import date
+
+from app.circulation import MAX_ACTIVE_LOANS
+from app.seed import CHUNK_SIZE, SCALES, _chunks, _rng, book_copies, generate_books, generate_loans, generate_readers
+
+TODAY = date(2024, 3, 1)
+PARAMS = {"seed": 7, "sizes": SCALES["tiny"], "today": TODAY, "hashed_password": "hash"}
+
+
+# Порция зависит только от seed, таблицы и номера порции
+def test_chunks_are_deterministic():
+    first = generate_books(_rng(7, "books", 3), 1, 101, PARAMS)
+    second = generate_books(_rng(7, "books", 3), 1, 101, PARAMS)
+    other = generate_books(_rng(7, "books", 4), 1, 101, PARAMS)
+
+    assert first == second
+    assert first["books"][1] != other["books"][1]
+
+
+def test_chunks_cover_range():
+    chunks = _chunks(2 * CHUNK_SIZE + 5)
+
+    assert chunks[0] == (1, CHUNK_SIZE + 1)
+    assert chunks[-1] == (2 * CHUNK_SIZE + 1, 2 * CHUNK_SIZE + 6)
+    assert sum(stop - start for start, stop in chunks) == 2 * CHUNK_SIZE + 5
+
+
+# Связи книг ссылаются только на существующих авторов и жанры, без повторов
+def test_book_links_respect_foreign_keys():
+    tables = generate_books(_rng(7, "books", 0), 1, 501, PARAMS)
+    book_ids = {row[0] for row in tables["books"][1]}
+
+    for name, limit in (("book_author", PARAMS["sizes"]["authors"]), ("book_genre", PARAMS["sizes"]["genres"])):
+        links = tables[name][1]
+        assert len(links) == len(set(links))
+        assert all(book_id in book_ids and 1 <= other_id <= limit for book_id, other_id in links)
+
+
+# Невозвращенные займы читателя совпадают с его счетчиком и не достигают лимита
+def test_reader_active_loans_match_counters():
+    tables = generate_readers(_rng(7, "readers", 0), 1, 501, PARAMS)
+    counters = {row[0]: row[4] for row in tables["readers"][1]}
+    loans = tables["loans"][1]
+
+    assert max(counters.values()) < MAX_ACTIVE_LOANS
+    assert Counter(loan[1] for loan in loans) == {reader_id: n for reader_id, n in counters.items() if n}
+    assert all(loan[4] is None and loan[2] <= TODAY for loan in loans)
+
+
+# История займов возвращена не позже сегодняшнего дня; популярность книг неравномерна
+def test_loan_history_is_returned_and_skewed():
+    loans = generate_loans(_rng(7, "loans", 0), 1, 20_001, PARAMS)["loans"][1]
+
+    assert all(loan[2] <= loan[4] <= TODAY for loan in loans)
+    assert all(1 <= loan[0] <= PARAMS["sizes"]["books"] for loan in loans)
+    top = Counter(loan[0] for loan in loans).most_common(PARAMS["sizes"]["books"] // 100)
+    assert sum(count for _, count in top) > 0.3 * len(loans)
+
+
+# Невозвращенные займы всех порций не превышают экземпляров книг: свободные экземпляры
+# неотрицательны и вместе с займами дают число экземпляров; пары (читатель, книга) не повторяются
+def test_open_loans_respect_stock():
+    sizes = PARAMS["sizes"]
+    books = generate_books(_rng(7, "books", 0), 1, sizes["books"] + 1, PARAMS)["books"][1]
+    loans = [
+        loan
+        for start, stop in ((1, 301), (301, sizes["readers"] + 1))
+        for loan in generate_readers(_rng(7, "readers", start), start, stop, PARAMS)["loans"][1]
+    ]
+    loaned = Counter(loan[0] for loan in loans)
+    copies = book_copies(7, sizes["books"])
+
+    assert loans and max(loaned.values()) > 1
+    assert all(row[4] >= 0 for row in books)
+    assert all(row[4] + loaned[row[0]] == copies[row[0] - 1] for row in books)
+    assert len({(loan[0], loan[1]) for loan in loans}) == len(loans)